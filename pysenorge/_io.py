@@ -23,128 +23,17 @@ except ImportError:
 from pysenorge.set_environment import UintFillValue, IntFillValue, FloatFillValue #@UnresolvedImport
 from pysenorge.converters import date2epoch #@UnresolvedImport
 
-class BILdata(object):
-    '''
-    Class for reading, writing and displaying BIL format files for U{www.senorge.no}.
-    
-    The seNorge array has a standard size of height=1550, width=1195.
-    The standard data-type is "uint16" with a no-data-value of 65535.
-    The standard file name is of type "themename_YYYY_MM_DD.bil"  
-    '''
+# Deprecated: import BILdata from pysenorge.io.bil
+from pysenorge.io.bil import BILdata #@UnusedImport
 
 
-    def __init__(self, filename):
-        '''
-        Initializes defaults.
-        '''
-        self.nrows = 1550
-        self.ncols = 1195
-        self.datatype = uint16
-        self.nodata = 65535
-        self.data = zeros((self.nrows, self.ncols), self.datatype)
-        self.filename = filename
-        
-        
-    def set_dimension(self, nrows, ncols):
-        '''
-        Override standard dimensions.
-        
-        @param nrows: Number of new rows.
-        @param ncols: Number of new columns.  
-        '''
-        self.nrows = nrows
-        self.ncols = ncols
-        
-    
-    def read(self):
-        """
-        Reads data from BIL file.
-        """
-        self._read_hdr()
-        tmpdata = fromfile(self.filename, self.datatype)
-        tmpdata.shape = (self.nrows, self.ncols)
-        self.data[:] = tmpdata
-
-
-    def _read_hdr(self):
-        """
-        Reads header information from I{.hdr} file (if existent).
-        """
-        hdr = os.path.splitext(self.filename)[0] + '.hdr'
-        if os.path.exists(hdr):
-            # Verify the information
-            pass
-        else:
-            print "No header data found! Using default..."
-            
-            
-    def write(self, data, dt=uint16, lsd=None):
-        '''
-        Writes data to BIL file.
-        
-        @param data: input numpy array to be stored
-        @param dt: data-type, default is I{uint16}  
-        @param lsd: Least significant digit
-        @type lsd: integer 
-        '''
-        from types import IntType
-        if type(lsd)==IntType:
-            # Move the least significant digit before the dot.
-            data = data * 10**lsd
-        # Make sure data is appropriate format
-        dt_data = dt(data)
-        # Open and write to file
-        fid = open(self.filename, 'wb')
-        fid.write(dt_data)
-        fid.flush()
-        fid.close()
-    
-    
-    def _write_hdr(self):
-        ''' 
-        Creates a I{.hdr} file to the corresponding I{.bil} file.
-        
-        NOT IMPLEMENTED YET!
-         
-        Example content of .hdr file
-        BYTEORDER      I
-        LAYOUT       BIL
-        NROWS         1550
-        NCOLS         1195
-        NBANDS        1
-        NBITS         16
-        BANDROWBYTES         2390
-        TOTALROWBYTES        2390
-        BANDGAPBYTES         0
-        '''
-        pass    
-        
-        
-    def _view(self):
-        """
-        Plot the data contained in the BIL file.
-        @requires: I{Matplotlib} module
-        """
-        try:
-            from matplotlib.pyplot import imshow, grid, colorbar, show
-            from matplotlib.cm import jet
-            
-            imshow(self.data, interpolation='bilinear', cmap=jet, alpha=1.0)
-            grid(False)
-            colorbar()
-            show()
-            
-        except ImportError:
-            print '''Required plotting module "matplotlib" not found!\nVisit www.matplotlib.sf.net'''
-            
-            
 def _test_bildata():
     '''
     BILdata test function.
     '''
     bd = BILdata(r'Z:\metdata\metno_obs_v1.1\tm\2006\tm_2006_01_04.bil')
     bd.read()
-    bd.view()        
+    bd._view()        
 
 
 class NCdata():
@@ -0,0 +1,11 @@
+__docformat__ = 'reStructuredText'
+'''
+Performance benchmarks for the hot paths of *pysenorge*.
+
+The benchmarks run on synthetic, full-size seNorge grids and UM4-shaped
+netCDF files generated locally by *benchmark.fixtures*, so no access to the
+data archive is required. See *benchmark.run_benchmarks*.
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
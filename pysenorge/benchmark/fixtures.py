@@ -0,0 +1,142 @@
+__docformat__ = 'reStructuredText'
+'''
+Synthetic seNorge and UM4 test data.
+
+All arrays are generated from a fixed random seed so that repeated benchmark
+runs work on identical data.
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+
+# Additional
+from numpy import arange, float32, uint16, flipud
+from numpy.random import RandomState
+
+# Own
+from pysenorge.set_environment import default_senorge_width, \
+    default_senorge_height, default_UM4_width, default_UM4_height, \
+    UintFillValue, timeunit
+from pysenorge.grid import senorge_mask
+
+# Lower left corner and spacing of the synthetic UM4 grid [m]. The grid
+# covers the seNorge grid completely, as required by grid.interpolate().
+UM4_x0 = -600000.0
+UM4_y0 = 6000000.0
+UM4_dx = 4000.0
+
+# Start of the synthetic UM4 prognosis [seconds since 1970-01-01]
+UM4_t0 = 1296518400.0 # 2011-02-01 00:00:00
+
+
+def senorge_field(low=0.0, high=1.0, dtype=float32, seed=0):
+    '''
+    Returns a seNorge sized array with uniform random values in [low, high).
+    '''
+    rs = RandomState(seed)
+    A = rs.uniform(low, high, (default_senorge_height, default_senorge_width))
+    return A.astype(dtype)
+
+
+def senorge_bil_field(low=0, high=1000, dtype=uint16, seed=0):
+    '''
+    Returns a seNorge sized integer array as stored in BIL files, i.e. with
+    the no-data value outside Norway.
+    '''
+    A = senorge_field(low, high, float32, seed).astype(dtype)
+    A[senorge_mask()] = UintFillValue if dtype == uint16 else 255
+    return A
+
+
+def um4_grid():
+    '''
+    Returns the rlon, rlat coordinates of the synthetic UM4 grid.
+    '''
+    rlon = UM4_x0 + arange(default_UM4_width, dtype=float32) * UM4_dx
+    rlat = UM4_y0 + arange(default_UM4_height, dtype=float32) * UM4_dx
+    return rlon, rlat
+
+
+def um4_field(nt=24, low=-20.0, high=20.0, seed=0):
+    '''
+    Returns a UM4 sized (time, rlat, rlon) array with random values.
+    '''
+    rs = RandomState(seed)
+    A = rs.uniform(low, high, (nt, default_UM4_height, default_UM4_width))
+    return A.astype(float32)
+
+
+def write_bil(filename, data):
+    '''
+    Writes *data* as BIL file (flipped upside-down as in production).
+    '''
+    fid = open(filename, 'wb')
+    fid.write(flipud(data).tostring())
+    fid.close()
+    return filename
+
+
+def write_um4(filename, nt=66,
+              variables=('x_wind', 'y_wind', 'net_sw_surface',
+                         'net_lw_surface', 'sensible_heat_surface',
+                         'latent_heat_surface')):
+    '''
+    Writes a UM4-shaped prognosis file with hourly data.
+
+    :Parameters:
+        - filename: Output netCDF file
+        - nt: Number of hourly time steps (a UM4 prognosis covers 66 h)
+        - variables: Names of the (time, rlat, rlon) variables
+    '''
+    from netCDF4 import Dataset
+
+    ds = Dataset(filename, 'w', format='NETCDF3_CLASSIC')
+    ds.createDimension('time', nt)
+    ds.createDimension('rlat', default_UM4_height)
+    ds.createDimension('rlon', default_UM4_width)
+
+    times = ds.createVariable('time', 'f8', ('time',))
+    times.units = timeunit
+    times[:] = UM4_t0 + arange(nt) * 3600.0
+    rlon, rlat = um4_grid()
+    ds.createVariable('rlon', 'f4', ('rlon',))[:] = rlon
+    ds.createVariable('rlat', 'f4', ('rlat',))[:] = rlat
+
+    for n, var in enumerate(variables):
+        v = ds.createVariable(var, 'f4', ('time', 'rlat', 'rlon'))
+        v[:] = um4_field(nt, seed=n)
+    ds.close()
+    return filename
+
+
+def write_clt(filename, low=0.0, high=30.0, ncolors=10):
+    '''
+    Writes a colour look-up table with *ncolors* equal classes.
+    '''
+    from pysenorge.io.png import CLT, HDR, CLTitem
+
+    step = (high - low) / ncolors
+    cltlist = []
+    for n in xrange(ncolors):
+        c = int(255 * n / max(ncolors-1, 1))
+        cltlist.append(CLTitem(low+n*step, low+(n+1)*step, (c, 0, 255-c),
+                               'class %i' % n))
+    clt = CLT()
+    clt.new(HDR(255, 8, 'Benchmark', 'Benchmark - synthetic data', 'Value'),
+            cltlist)
+    clt.write(filename)
+    return filename
+
+
+def fixture_dir(basedir=None):
+    '''
+    Returns (and creates) the folder holding the fixture files.
+    '''
+    if basedir is None:
+        import tempfile
+        basedir = os.path.join(tempfile.gettempdir(), 'pysenorge_benchmark')
+    if not os.path.exists(basedir):
+        os.makedirs(basedir)
+    return basedir
@@ -0,0 +1,485 @@
+__docformat__ = 'reStructuredText'
+'''
+Runs the *pysenorge* benchmarks and writes the results as JSON.
+
+Each benchmark runs in its own process so that the reported peak memory
+(maximum resident set size) belongs to that benchmark only. The peak memory
+is not available on Windows and reported as *null* there. A benchmark whose
+process dies or exceeds the time limit (*-t*) is reported with an error.
+The progress is printed to stderr, so that the JSON on stdout (without *-o*)
+can be piped to other tools.
+
+Command line usage::
+
+    python run_benchmarks.py [options] [benchmark names]
+
+Example::
+
+    python run_benchmarks.py -r 5 -o bench.json interpolate bil_read bil_write
+
+*bil_write_direct* writes the grid without the atomic rename of *BILdata*
+and serves as reference for the other *bil_write* benchmarks.
+
+Output (one record per benchmark)::
+
+    {"name": "bil_read", "seconds": 0.004, "cpu_seconds": 0.004,
+     "items": 3704500, "unit": "bytes", "throughput": 9.3e8,
+     "peak_rss_mb": 41.2, "repeat": 3, "error": null}
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import sys
+import time
+import json
+import traceback
+import subprocess
+from optparse import OptionParser
+from multiprocessing import Process, Queue
+from Queue import Empty
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH - its
+# message goes to stderr to keep stdout for the JSON report
+_stdout, sys.stdout = sys.stdout, sys.stderr
+try:
+    execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "themes", "set_pysenorge_path.py"))
+finally:
+    sys.stdout = _stdout
+# Own
+from pysenorge.set_environment import default_senorge_width, \
+    default_senorge_height, default_UM4_width, default_UM4_height
+from pysenorge.benchmark import fixtures
+
+# Number of cells in the seNorge and UM4 grids
+SENORGE_CELLS = default_senorge_width * default_senorge_height
+UM4_CELLS = default_UM4_width * default_UM4_height
+
+
+def load_theme(name):
+    '''
+    Imports the theme module *name* from *pysenorge.themes*.
+
+    Some themes locate *set_pysenorge_path.py* relative to the current
+    directory, hence the import is done from within the themes folder.
+    '''
+    from pysenorge.set_environment import pysenorgedir
+    cwd = os.getcwd()
+    os.chdir(os.path.join(pysenorgedir, 'themes'))
+    try:
+        module = __import__('pysenorge.themes.%s' % name, fromlist=['model'])
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+def peak_rss_mb():
+    '''
+    Returns the peak resident set size of this process in MB or *None*.
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss / 1048576.0 # bytes on Mac OS
+    return rss / 1024.0 # kB on Linux
+
+
+def cpu_time():
+    '''
+    Returns user + system time of this process [s].
+    '''
+    t = os.times()
+    return t[0] + t[1]
+
+
+#===============================================================================
+# Benchmark definitions
+#
+# Each setup function returns a tuple (function, args, items, unit). The
+# function is timed when called with *args; items/unit give the amount of
+# work done per call, used for the throughput.
+#===============================================================================
+
+def setup_interpolate(wdir):
+    from pysenorge.grid import interpolate
+    rlon, rlat = fixtures.um4_grid()
+    z = fixtures.um4_field(1)[0]
+    return interpolate, (rlon, rlat, z), SENORGE_CELLS, 'cells'
+
+
+def _setup_regrid(scheme):
+    def setup(wdir):
+        from pysenorge.regrid import regrid
+        rlon, rlat = fixtures.um4_grid()
+        z = fixtures.um4_field(24)
+        regrid(rlon, rlat, z[0], scheme) # matrix is computed once
+        return regrid, (rlon, rlat, z, scheme), 24*SENORGE_CELLS, 'cells'
+    return setup
+
+
+def setup_bil_write(wdir):
+    from pysenorge.io.bil import BILdata
+    data = fixtures.senorge_bil_field()
+    filename = os.path.join(wdir, 'bench_write.bil')
+    def run(data):
+        BILdata(filename, 'uint16').write(data)
+    return run, (data,), data.nbytes, 'bytes'
+
+
+def setup_bil_write_nosync(wdir):
+    from pysenorge.io.bil import BILdata
+    data = fixtures.senorge_bil_field()
+    filename = os.path.join(wdir, 'bench_write.bil')
+    def run(data):
+        BILdata(filename, 'uint16').write(data, fsync=False)
+    return run, (data,), data.nbytes, 'bytes'
+
+
+def setup_bil_write_legacy(wdir):
+    # call style of the former pysenorge._io.BILdata
+    from numpy import uint16
+    from pysenorge.io.bil import BILdata
+    data = fixtures.senorge_field(0.0, 30.0)
+    filename = os.path.join(wdir, 'bench_write.bil')
+    def run(data):
+        BILdata(filename).write(data, uint16, lsd=1)
+    return run, (data,), SENORGE_CELLS*2, 'bytes'
+
+
+def setup_bil_write_direct(wdir):
+    # reference: plain write as done by both former BILdata classes
+    data = fixtures.senorge_bil_field()
+    filename = os.path.join(wdir, 'bench_write.bil')
+    def run(data):
+        fid = open(filename, 'wb')
+        fid.write(data)
+        fid.flush()
+        fid.close()
+    return run, (data,), data.nbytes, 'bytes'
+
+
+def setup_bil_read(wdir):
+    from pysenorge.io.bil import BILdata
+    data = fixtures.senorge_bil_field()
+    filename = fixtures.write_bil(os.path.join(wdir, 'bench_read.bil'), data)
+    def run():
+        BILdata(filename, 'uint16').read()
+    return run, (), data.nbytes, 'bytes'
+
+
+def setup_nc_read(wdir):
+    # the UM4 read of the wind scripts: two variables of the window [7,31]
+    from pysenorge.io.nc import open_dataset
+    filename = os.path.join(wdir, 'bench_read.nc')
+    if not os.path.exists(filename):
+        fixtures.write_um4(filename, variables=('x_wind', 'y_wind'))
+    def run():
+        ds = open_dataset(filename, 'r')
+        ds.variables['x_wind'][7:31,:,:]
+        ds.variables['y_wind'][7:31,:,:]
+        ds.close()
+    return run, (), 2*24*UM4_CELLS*4, 'bytes'
+
+
+def setup_nc_write(wdir):
+    from pysenorge.io.nc import NCdata
+    data = fixtures.senorge_field(0.0, 30.0)
+    filename = os.path.join(wdir, 'bench_write.nc')
+    def run(data):
+        ncfile = NCdata(filename)
+        ncfile.new(fixtures.UM4_t0)
+        ncfile.add_variable('bench', data.dtype.str, 'm s-1', 'Benchmark',
+                            data)
+        ncfile.close()
+    return run, (data,), data.nbytes, 'bytes'
+
+
+def setup_png_write(wdir):
+    # writePNG only prints a message without matplotlib - fail instead of
+    # timing that
+    import matplotlib.pyplot
+    from pysenorge.io.png import writePNG
+    data = fixtures.senorge_field(0.0, 30.0)
+    cltfile = fixtures.write_clt(os.path.join(wdir, 'bench.clt'))
+    outname = os.path.join(wdir, 'bench_png')
+    def run(data):
+        writePNG(data, outname, cltfile=cltfile)
+    return run, (data,), SENORGE_CELLS, 'cells'
+
+
+def _setup_wind(name, nt):
+    def setup(wdir):
+        model = load_theme(name).model
+        x_wind = fixtures.um4_field(nt, seed=0)
+        y_wind = fixtures.um4_field(nt, seed=1)
+        return model, (x_wind, y_wind), nt*UM4_CELLS, 'cells'
+    return setup
+
+
+def setup_depth_hoar_index_1(wdir):
+    model = load_theme('depth_hoar_index_1').model
+    tm = fixtures.senorge_field(-20.0, 5.0, seed=0)
+    sd = fixtures.senorge_field(0.0, 2.0, seed=1)
+    def run(tm, sd):
+        model(tm, sd, None)
+    return run, (tm, sd), SENORGE_CELLS, 'cells'
+
+
+def setup_depth_hoar_index_2(wdir):
+    model = load_theme('depth_hoar_index_2').model
+    tm = fixtures.senorge_field(-20.0, 5.0, seed=0)
+    sd = fixtures.senorge_field(0.0, 2.0, seed=1)
+    def run(tm, sd):
+        model(tm, sd, None)
+    return run, (tm, sd), SENORGE_CELLS, 'cells'
+
+
+def _setup_snow_depth_wind(name):
+    def setup(wdir):
+        model = load_theme(name).model
+        u = fixtures.senorge_field(0.0, 25.0, seed=0)
+        nsd = fixtures.senorge_field(0.0, 300.0, seed=1)
+        lwc = fixtures.senorge_field(0.0, 12.0, seed=2)
+        age = fixtures.senorge_field(0.0, 10.0, seed=3)
+        return model, (u, nsd, lwc, age), SENORGE_CELLS, 'cells'
+    return setup
+
+
+def setup_net_radiative_flux(wdir):
+    model = load_theme('net_radiative_flux').model
+    args = tuple([fixtures.um4_field(24, -200.0, 400.0, seed=n)
+                  for n in xrange(4)])
+    return model, args, 24*UM4_CELLS, 'cells'
+
+
+def setup_energy_balance_daily(wdir):
+    model = load_theme('energy_balance_daily').model
+    args = tuple([fixtures.um4_field(24, -200.0, 400.0, seed=n)
+                  for n in xrange(6)])
+    return model, args, 24*UM4_CELLS, 'cells'
+
+
+def setup_temperature_gradient_daily(wdir):
+    model = load_theme('temperature_gradient_daily').model
+    today = fixtures.senorge_field(-20.0, 5.0, seed=0)
+    yesterday = fixtures.senorge_field(-20.0, 5.0, seed=1)
+    return model, (today, yesterday), SENORGE_CELLS, 'cells'
+
+
+def setup_temperature_stability_index(wdir):
+    from pysenorge.grid import senorge_mask
+    model = load_theme('temperature_stability_index').model
+    tm = fixtures.senorge_field(-20.0, 5.0, seed=0)
+    tmgr = fixtures.senorge_field(-15.0, 15.0, seed=1)
+    return model, (tm, tmgr, senorge_mask()), SENORGE_CELLS, 'cells'
+
+
+def _setup_startup(name):
+    '''
+    Times the start of a theme script, i.e. importing it in a fresh
+    interpreter. This is paid once per date when runs are launched by
+    *run_period.py*.
+    '''
+    def setup(wdir):
+        from pysenorge.set_environment import pysenorgedir
+        themedir = os.path.join(pysenorgedir, 'themes')
+        cmd = [sys.executable, '-c', 'import %s' % name]
+        def run():
+            devnull = open(os.devnull, 'w')
+            try:
+                returncode = subprocess.call(cmd, cwd=themedir,
+                                             stdout=devnull, stderr=devnull)
+            finally:
+                devnull.close()
+            if returncode != 0:
+                raise RuntimeError("Importing %s failed" % name)
+        return run, (), 1, 'starts'
+    return setup
+
+
+BENCHMARKS = [
+    ('interpolate', setup_interpolate),
+    ('regrid_nearest', _setup_regrid('nearest')),
+    ('regrid_area', _setup_regrid('area')),
+    ('bil_write', setup_bil_write),
+    ('bil_write_nosync', setup_bil_write_nosync),
+    ('bil_write_legacy', setup_bil_write_legacy),
+    ('bil_write_direct', setup_bil_write_direct),
+    ('bil_read', setup_bil_read),
+    ('nc_read', setup_nc_read),
+    ('nc_write', setup_nc_write),
+    ('png_write', setup_png_write),
+    ('model_wind_10m_daily', _setup_wind('wind_10m_daily', 24)),
+    ('model_wind_600m_daily', _setup_wind('wind_600m_daily', 6)),
+    ('model_wind_1500m_daily', _setup_wind('wind_1500m_daily', 6)),
+    ('model_max_wind_speed_daily', _setup_wind('max_wind_speed_daily', 24)),
+    ('model_depth_hoar_index_1', setup_depth_hoar_index_1),
+    ('model_depth_hoar_index_2', setup_depth_hoar_index_2),
+    ('model_additional_snow_depth_wind',
+     _setup_snow_depth_wind('additional_snow_depth_wind')),
+    ('model_additional_snow_depth_wind_varexp',
+     _setup_snow_depth_wind('additional_snow_depth_wind_varexp')),
+    ('model_net_radiative_flux', setup_net_radiative_flux),
+    ('model_energy_balance_daily', setup_energy_balance_daily),
+    ('model_temperature_gradient_daily', setup_temperature_gradient_daily),
+    ('model_temperature_stability_index', setup_temperature_stability_index),
+    ('startup_wind_10m_daily', _setup_startup('wind_10m_daily')),
+    ('startup_depth_hoar_index_2', _setup_startup('depth_hoar_index_2')),
+    ('startup_additional_snow_depth_wind',
+     _setup_startup('additional_snow_depth_wind')),
+    ]
+
+
+#===============================================================================
+# Runner
+#===============================================================================
+
+def _run(name, wdir, repeat, queue):
+    '''
+    Runs one benchmark and puts the result record into *queue*.
+    '''
+    setup = dict(BENCHMARKS)[name]
+    record = {'name': name, 'seconds': None, 'cpu_seconds': None,
+              'items': None, 'unit': None, 'throughput': None,
+              'peak_rss_mb': None, 'repeat': repeat, 'error': None}
+    try:
+        # silence the print statements of the benchmarked code
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            func, args, items, unit = setup(wdir)
+            best = None
+            bestcpu = None
+            for n in xrange(repeat):
+                c0 = cpu_time()
+                t0 = time.time()
+                func(*args)
+                secs = time.time() - t0
+                cpu = cpu_time() - c0
+                if best is None or secs < best:
+                    best = secs
+                    bestcpu = cpu
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        record['seconds'] = best
+        record['cpu_seconds'] = bestcpu
+        record['items'] = items
+        record['unit'] = unit
+        if best > 0:
+            record['throughput'] = items / best
+    except Exception:
+        record['error'] = traceback.format_exc().strip().splitlines()[-1]
+    record['peak_rss_mb'] = peak_rss_mb()
+    queue.put(record)
+
+
+def _wait(p, queue, timeout):
+    '''
+    Returns the record of the benchmark process *p* or an error message if
+    the process exited without one or did not finish within *timeout*
+    seconds (*None* for no limit).
+    '''
+    t0 = time.time()
+    while True:
+        try:
+            return queue.get(timeout=1.0)
+        except Empty:
+            pass
+        if not p.is_alive():
+            try:
+                # the record may have been put just before the exit
+                return queue.get(timeout=1.0)
+            except Empty:
+                p.join()
+                return "Process exited with code %s" % p.exitcode
+        if timeout is not None and time.time() - t0 > timeout:
+            p.terminate()
+            p.join()
+            return "Timeout after %i s" % timeout
+
+
+def run_benchmarks(names=None, repeat=3, wdir=None, timeout=None):
+    '''
+    Runs the benchmarks in *names* (default: all), each in its own process.
+
+    :Parameters:
+        - timeout: Time limit per benchmark [s] or *None*
+
+    :Returns:
+        - List of result records (dictionaries)
+    '''
+    wdir = fixtures.fixture_dir(wdir)
+    results = []
+    for name, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        queue = Queue()
+        p = Process(target=_run, args=(name, wdir, repeat, queue))
+        p.start()
+        record = _wait(p, queue, timeout)
+        p.join()
+        if not isinstance(record, dict):
+            record = {'name': name, 'seconds': None, 'cpu_seconds': None,
+                      'items': None, 'unit': None, 'throughput': None,
+                      'peak_rss_mb': None, 'repeat': repeat, 'error': record}
+        if record['error'] is None:
+            print >>sys.stderr, "%-42s %10.4f s  %12.4g %s/s  %8.1f MB" % \
+                (name, record['seconds'], record['throughput'] or 0,
+                 record['unit'], record['peak_rss_mb'] or 0)
+        else:
+            print >>sys.stderr, "%-42s FAILED: %s" % (name, record['error'])
+        results.append(record)
+    return results
+
+
+def main():
+    usage = "usage: python run_benchmarks.py [options] [benchmark names]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-r", "--repeat",
+                      action="store", dest="repeat", type="int", default=3,
+                      help="Number of repetitions; the best time is reported (default=3)")
+    parser.add_option("-o", "--output",
+                      action="store", dest="output", type="string",
+                      metavar="FILE", default=None,
+                      help="JSON file for the results - default: stdout")
+    parser.add_option("-d", "--dir",
+                      action="store", dest="wdir", type="string",
+                      metavar="DIR", default=None,
+                      help="Folder for the fixture files - default: temp folder")
+    parser.add_option("-t", "--timeout",
+                      action="store", dest="timeout", type="float", default=None,
+                      help="Time limit per benchmark in seconds - default: none")
+    parser.add_option("-l", "--list",
+                      action="store_true", dest="list", default=False,
+                      help="List the available benchmarks")
+
+    (options, args) = parser.parse_args()
+
+    if options.list:
+        for name, setup in BENCHMARKS:
+            print name
+        return
+
+    results = run_benchmarks(args, options.repeat, options.wdir,
+                             options.timeout)
+    report = {'python': sys.version.split()[0], 'platform': sys.platform,
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': results}
+    if options.output is None:
+        print json.dumps(report, indent=1)
+    else:
+        fid = open(options.output, 'w')
+        json.dump(report, fid, indent=1)
+        fid.close()
+        print >>sys.stderr, "Results written to %s" % options.output
+
+
+if __name__ == "__main__":
+    main()
@@ -15,9 +15,31 @@ from numpy import arange, meshgrid, ones, where, load, nan
 
 # Own
 from pysenorge.set_environment import pysenorgedir
+from pysenorge.tools.instrumentation import timed
+
+# Grids and masks computed once per process (see senorge_grid and interpolate).
+# The cached arrays are shared - do not modify them in place.
+_GRIDCACHE = {}
+
+def _utm33():
+    """
+    Returns the UTM zone 33 projection - created once per process.
+    """
+    if 'proj' not in _GRIDCACHE:
+        from pyproj import Proj
+        _GRIDCACHE['proj'] = Proj('+proj=utm +zone=33 +ellps=WGS84 +datum=WGS84 +units=m +no_defs')
+    return _GRIDCACHE['proj']
+
+def interpolate_mask():
+    """
+    Returns the mask of the cells outside Norway in the order of
+    L{interpolate} (south up) - loaded once per process.
+    """
+    if 'interpolate_mask' not in _GRIDCACHE:
+        _GRIDCACHE['interpolate_mask'] = np.flipud(np.load(os.path.join(pysenorgedir, 'resources/norway_mask.npy')))
+    return _GRIDCACHE['interpolate_mask']
 
 def senorge_grid(meshed=False):
-    from pyproj import Proj
     '''
     Creates the seNorge grid.
     
@@ -40,14 +62,70 @@ def senorge_grid(meshed=False):
     y = arange(LowerLeftNorth, UpperRightNorth, dy)
     
     if meshed:
-        xgrid, ygrid = meshgrid(x, y)
-        p = Proj('+proj=utm +zone=33 +ellps=WGS84 +datum=WGS84 +units=m +no_defs')
-        lon, lat = p(xgrid, ygrid, inverse=True)
+        if 'meshed' not in _GRIDCACHE:
+            xgrid, ygrid = meshgrid(x, y)
+            lon, lat = _utm33()(xgrid, ygrid, inverse=True)
+            _GRIDCACHE['meshed'] = (xgrid, ygrid, lon, lat)
         
-        return xgrid, ygrid, lon, lat
+        return _GRIDCACHE['meshed']
     else:
         return x, y
 
+def utm_to_index(x, y, flipped=True):
+    """
+    Returns the indices of the seNorge cells containing the points I{x}, I{y}.
+    
+    @param x, y: Scalars or arrays of UTM zone 33 coordinates in m.
+    @param flipped: If I{True} row 0 is the northernmost row as in the BIL
+        files, else the southernmost as returned by L{interpolate}.
+    
+    @return: row, col integer arrays. Points outside the grid get -1.
+    
+    The coordinates of L{senorge_grid} are the lower left corners of the
+    cells, i.e. cell I{col} covers xg[col] <= x < xg[col]+dx.
+    """
+    xg, yg = senorge_grid()
+    col = np.floor((np.asarray(x, dtype=float) - xg[0]) / (xg[1]-xg[0]))
+    row = np.floor((np.asarray(y, dtype=float) - yg[0]) / (yg[1]-yg[0]))
+    col = np.atleast_1d(col).astype(int)
+    row = np.atleast_1d(row).astype(int)
+    outside = (col < 0) | (col >= len(xg)) | (row < 0) | (row >= len(yg))
+    if flipped:
+        row = len(yg) - 1 - row
+    col[outside] = -1
+    row[outside] = -1
+    return row, col
+
+def latlon_to_index(lat, lon, flipped=True):
+    """
+    Returns the indices of the seNorge cells containing the points I{lat},
+    I{lon} (WGS84) - see L{utm_to_index}.
+    """
+    x, y = _utm33()(np.asarray(lon, dtype=float), np.asarray(lat, dtype=float))
+    return utm_to_index(x, y, flipped)
+
+def index_to_utm(row, col, flipped=True):
+    """
+    Returns the UTM zone 33 coordinates of the centres of the seNorge cells
+    I{row}, I{col} - the inverse of L{utm_to_index}.
+    """
+    xg, yg = senorge_grid()
+    row = np.asarray(row)
+    if flipped:
+        row = len(yg) - 1 - row
+    return (xg[np.asarray(col)] + (xg[1]-xg[0]) / 2.0,
+            yg[row] + (yg[1]-yg[0]) / 2.0)
+
+def index_to_latlon(row, col, flipped=True):
+    """
+    Returns the lat, lon (WGS84) of the centres of the seNorge cells I{row},
+    I{col}.
+    """
+    x, y = index_to_utm(row, col, flipped)
+    lon, lat = _utm33()(np.asarray(x, dtype=float), np.asarray(y, dtype=float),
+                        inverse=True)
+    return lat, lon
+
 def senorge_mask(show=False):
     """
     Loads the no-data mask for senorge.
@@ -196,6 +274,44 @@ def is_scalar(obj):
 
 ###############################################################################
 
+def _grid_coords(xin, xout):
+    """
+    Returns the fractional index of each I{xout} in the irregular but
+    increasing coordinates I{xin}. Values below (above) the range of I{xin}
+    get -1 (len(xin)).
+    
+    Vectorized version of L{_grid_coords_loop}.
+    """
+    n = len(xin)
+    i = np.searchsorted(xin, xout.ravel()) - 1
+    ic = np.clip(i, 0, n-2)
+    xinf = np.asarray(xin, dtype=np.float64)
+    x = np.asarray(xout, dtype=np.float64).ravel()
+    coords = ic + (x - xinf[ic]) / (xinf[ic+1] - xinf[ic])
+    coords = np.where(i < 0, -1.0, coords) # outside range on lower end
+    coords = np.where(i >= n-1, float(n), coords) # outside range on upper end
+    return np.reshape(coords, xout.shape)
+
+
+def _grid_coords_loop(xin, xout):
+    """
+    Loop version of L{_grid_coords} as in the original basemap code. Used
+    only to verify L{_grid_coords} - see L{verify.v_grid_interp}.
+    """
+    xoutflat = xout.flatten()
+    ix = (np.searchsorted(xin,xoutflat)-1).tolist()
+    xoutflat = xoutflat.tolist(); xin = xin.tolist()
+    xcoords = []
+    for n,i in enumerate(ix):
+        if i < 0:
+            xcoords.append(-1) # outside of range on xin (lower end)
+        elif i >= len(xin)-1:
+            xcoords.append(len(xin)) # outside range on upper end.
+        else:
+            xcoords.append(float(i)+(xoutflat[n]-xin[i])/(xin[i+1]-xin[i]))
+    return np.reshape(xcoords,xout.shape)
+
+
 def interp(datain,xin,yin,xout,yout,checkbounds=False,masked=False,order=1):
     """This function is originally from matplotlib.toolkits.basemap.interp
     
@@ -273,28 +389,8 @@ def interp(datain,xin,yin,xout,yout,checkbounds=False,masked=False,order=1):
         ycoords = (len(yin)-1)*(yout-yin[0])/(yin[-1]-yin[0])
     else:
         # irregular (but still rectilinear) input grid.
-        xoutflat = xout.flatten(); youtflat = yout.flatten()
-        ix = (np.searchsorted(xin,xoutflat)-1).tolist()
-        iy = (np.searchsorted(yin,youtflat)-1).tolist()
-        xoutflat = xoutflat.tolist(); xin = xin.tolist()
-        youtflat = youtflat.tolist(); yin = yin.tolist()
-        xcoords = []; ycoords = []
-        for n,i in enumerate(ix):
-            if i < 0:
-                xcoords.append(-1) # outside of range on xin (lower end)
-            elif i >= len(xin)-1:
-                xcoords.append(len(xin)) # outside range on upper end.
-            else:
-                xcoords.append(float(i)+(xoutflat[n]-xin[i])/(xin[i+1]-xin[i]))
-        for m,j in enumerate(iy):
-            if j < 0:
-                ycoords.append(-1) # outside of range of yin (on lower end)
-            elif j >= len(yin)-1:
-                ycoords.append(len(yin)) # outside range on upper end
-            else:
-                ycoords.append(float(j)+(youtflat[m]-yin[j])/(yin[j+1]-yin[j]))
-        xcoords = np.reshape(xcoords,xout.shape)
-        ycoords = np.reshape(ycoords,yout.shape)
+        xcoords = _grid_coords(xin, xout)
+        ycoords = _grid_coords(yin, yout)
     # data outside range xin,yin will be clipped to
     # values on boundary.
     if masked:
@@ -339,10 +435,18 @@ def interp(datain,xin,yin,xout,yout,checkbounds=False,masked=False,order=1):
     return dataout
 
 
-def interpolate(xold, yold, zold):
+@timed('interpolate')
+def interpolate(xold, yold, zold, scheme=None):
     """
     Convenience function for interpolating the UM4 grid to the seNorge grid. 
+    
+    @param scheme: I{None} for nearest neighbour by L{interp} or one of
+        "nearest", "bilinear" and "area" to use the stored sparse matrices of
+        L{pysenorge.regrid}. These also accept a (time, y, x) stack.
     """
+    if scheme is not None:
+        from pysenorge.regrid import regrid
+        return regrid(xold, yold, zold, scheme)
 #    print xold.shape, yold.shape, zold.shape
     xcrop, ycrop, zcrop = crop_overlap(xold, yold, zold)
 #    print xcrop.shape, ycrop.shape, zcrop.shape
@@ -350,7 +454,7 @@ def interpolate(xold, yold, zold):
     xnew, ynew, lon, lat = senorge_grid(meshed=True) #@UnusedVariable
     znew = interp(zcrop, xcrop, ycrop, xnew, ynew, checkbounds=True, masked=False, order=0)
 #    print xnew.shape, ynew.shape, znew.shape
-    mask = np.flipud(np.load(os.path.join(pysenorgedir, 'resources/norway_mask.npy')))
+    mask = interpolate_mask()
     znew[mask]  = nan
 #    from pylab import figure, imshow, show
 #    imshow(znew)
@@ -2,6 +2,32 @@ __docformat__ = "reStructuredText"
 '''
 Binary (.bil) input/output class.
 
+Besides single grids (*BILdata*) related products can be stored as bands of
+one file (*BandFile*), e.g. average, maximum and direction of the wind. The
+layout is described in an ESRI style header (*.hdr*) next to the data file::
+
+    BYTEORDER      I
+    LAYOUT         BIL
+    NROWS          1550
+    NCOLS          1195
+    NBANDS         3
+    NBITS          16
+    PIXELTYPE      UNSIGNEDINT
+    BANDROWBYTES   2390
+    TOTALROWBYTES  7170
+    BANDGAPBYTES   0
+    BANDNAMES      avg max dir
+
+Supported layouts are BIL (band interleaved by line), BIP (by pixel) and BSQ
+(band sequential). Single bands are read through a memory map without reading
+the other bands.
+
+Files are written atomically: the data goes to a temporary file in the same
+folder which then replaces the target, so readers never see a half written
+grid. The temporary file is synced to disk (*fsync*) before the rename
+unless the environment variable *PYSENORGE_FSYNC* is set to 0 - e.g. for
+batch runs that rewrite whole periods anyway.
+
 :Author: kmu
 :Created: 14. okt. 2010
 '''
@@ -10,10 +36,57 @@ import os, sys
 sys.path.append(os.path.abspath('../..'))
 
 # Additional
-from numpy import zeros, fromfile, int8, int16, uint8, uint16, float32, nan
+from numpy import zeros, fromfile, uint16, float32, nan, dtype, memmap, \
+    asarray, array, ascontiguousarray
 
 # Own
 from pysenorge.converters import get_FillValue
+from pysenorge.tools.instrumentation import stage, add_bytes
+
+FSYNCVAR = 'PYSENORGE_FSYNC'
+
+
+def fsync_default():
+    '''
+    Returns *False* if syncing is switched off by *PYSENORGE_FSYNC=0*.
+    '''
+    return os.environ.get(FSYNCVAR, '1').strip().lower() not in \
+        ('0', 'no', 'false', 'off')
+
+
+def atomic_write(filename, data, fsync=None):
+    '''
+    Writes *data* (array or string) to *filename* through a temporary file
+    which then replaces *filename*.
+
+    :Parameters:
+        - filename: Target file
+        - data: *numpy* array (written in C order) or string
+        - fsync: Sync the file to disk before the rename - default: see
+            *fsync_default*
+    '''
+    if fsync is None:
+        fsync = fsync_default()
+    if not isinstance(data, str):
+        data = ascontiguousarray(data)
+    tmpfile = "%s.%i.tmp" % (filename, os.getpid())
+    fid = open(tmpfile, 'wb')
+    try:
+        fid.write(data)
+        fid.flush()
+        if fsync:
+            os.fsync(fid.fileno())
+    finally:
+        fid.close()
+    try:
+        os.rename(tmpfile, filename)
+    except OSError:
+        # os.rename does not overwrite on win32
+        if not os.path.exists(filename):
+            os.remove(tmpfile)
+            raise
+        os.remove(filename)
+        os.rename(tmpfile, filename)
 
 
 class BILdata(object):
@@ -24,16 +97,30 @@ class BILdata(object):
     The seNorge array has a standard size of height=1550, width=1195.
     The standard data-type is "uint16" with a no-data-value of 65535.
     The standard file name is of type "themename_YYYY_MM_DD.bil"  
+    
+    Replaces the former *pysenorge._io.BILdata*, whose call style
+    (*BILdata(filename)*, *write(data, dt, lsd)*, *set_dimension*) is still
+    supported.
     '''
 
-    def __init__(self, filename, datatype):
+    def __init__(self, filename, datatype=None):
         '''
         Initializes defaults.
+        
+        :Parameters:
+            - filename: BIL file
+            - datatype: Name or *numpy* type of the values, e.g. "uint16" -
+                if not given "uint16" and *write* converts the data to it as
+                the former *_io.BILdata* did
         '''
+        self._convert = datatype is None
+        if datatype is None:
+            datatype = 'uint16'
         self.nrows = 1550
         self.ncols = 1195
-        self.datatype = eval(datatype)
+        self.datatype = dtype(datatype).type
         self.nodata = get_FillValue(self.datatype)
+        self.nbands = 1
         self.data = zeros((self.nrows, self.ncols), self.datatype)
         self.filename = filename
         
@@ -50,87 +137,106 @@ class BILdata(object):
         self.ncols = ncols
         self.data = zeros((self.nrows, self.ncols), self.datatype)
         
+        
+    set_dimension = _set_dimension
+        
     
     def read(self):
         """
         Reads data from BIL file.
+        
+        Dimensions, data-type and byte order are taken from the header if
+        it exists.
         """
         print "Reading %s" % self.filename
-#        self._read_hdr()
-        fid = open(self.filename, "rb")
-        tmpdata = fromfile(fid, self.datatype)
-        fid.close()
-        tmpdata.shape = (self.nrows, self.ncols)
-        self.data[:] = tmpdata
+        filedtype = self._read_hdr()
+        if self.nbands > 1:
+            # first band of a multi-band file
+            self.data[:] = BandFile(self.filename).band(0)
+            return
+        with stage('bil_read'):
+            fid = open(self.filename, "rb")
+            tmpdata = fromfile(fid, filedtype)
+            fid.close()
+            tmpdata.shape = (self.nrows, self.ncols)
+            self.data[:] = tmpdata
+            add_bytes(read=tmpdata.nbytes)
 #        self._get_mask()
 
 
-    def write(self, data):
+    def write(self, data, dt=None, lsd=None, fsync=None):
         '''
-        Writes data to BIL file.
+        Writes data to BIL file and the header describing it.
         
         :Parameters:
             - data: *numpy* array to be stored
+            - dt: Data-type the data is converted to - by default the data
+                must already be of the data-type of the file unless the
+                instance was created without data-type
+            - lsd: Least significant digit - the data is multiplied by
+                10**lsd before the conversion
+            - fsync: See *atomic_write*
+        
+        :Raises:
+            - ValueError: if *data* is not of the data-type of the file
         '''
-        # Make sure data is in appropriate format
-        if self.data.dtype == data.dtype:
-            # Open and write to file
-            fid = open(self.filename, 'wb')
-            fid.write(data)
-            fid.flush()
-            fid.close()
-            self.data = data
-            return "Data written to %s" % self.filename
-        else:
-            print "Inconsistent data-type for BIL format."
+        if lsd is not None:
+            # Move the least significant digit before the dot.
+            data = data * 10**int(lsd)
+        if dt is None and self._convert:
+            dt = self.datatype
+        if dt is not None:
+            self.datatype = dtype(dt).type
+            self.nodata = get_FillValue(self.datatype)
+            data = asarray(data).astype(self.datatype)
+        elif data.dtype != dtype(self.datatype):
+            raise ValueError("Inconsistent data-type for BIL format: %s "
+                             "instead of %s" % (data.dtype.name,
+                                                dtype(self.datatype).name))
+        with stage('bil_write'):
+            atomic_write(self.filename, data, fsync)
+            add_bytes(written=data.nbytes)
+        if data.ndim == 2:
+            self.nrows, self.ncols = data.shape
+        self.nbands = 1
+        self.data = data
+        self._write_hdr()
+        return "Data written to %s" % self.filename
             
             
     def _read_hdr(self):
         """
         Reads header information from *.hdr* file (if existent).
+        
+        :Returns:
+            - The data-type of the file incl. byte order
         """
-        hdr = os.path.splitext(self.filename)[0] + '.hdr'
-        if os.path.exists(hdr):
-            # Verify the information
-            fid = open(hdr, 'r')
-            lines = fid.readlines()
-            byteorder = int(lines[0].split('\t')[1].strip())
-            nrows = int(lines[2].split('\t')[1].strip())
-            ncols = int(lines[3].split('\t')[1].strip())
-            print "BYTEORDER: %i \nNROWS: %i \nNCOLS: %i\n" % (byteorder, nrows, ncols)
+        self.nbands = 1
+        header = read_hdr(self.filename)
+        if header is None:
+            return dtype(self.datatype)
+        nrows = int(header.get('NROWS', self.nrows))
+        ncols = int(header.get('NCOLS', self.ncols))
+        self.nbands = int(header.get('NBANDS', 1))
+        filedtype = header_dtype(header, self.datatype)
+        check_size(self.filename, nrows, ncols, self.nbands, filedtype)
+        native = filedtype.newbyteorder('=')
+        if native != dtype(self.datatype):
+            print "Warning: %s contains %s - not %s!" % \
+                (self.filename, native.name, dtype(self.datatype).name)
+            self.datatype = native.type
+            self.nodata = get_FillValue(self.datatype)
+        if (nrows, ncols) != self.data.shape or self.data.dtype != native:
             self._set_dimension(nrows, ncols)
-        else:
-            print "No header data found! Using default..."
+        return filedtype
               
     
     def _write_hdr(self):
         ''' 
-        Creates a I{.hdr} file to the corresponding I{.bil} file.
-
-        Example content of .hdr file
-        BYTEORDER      I
-        LAYOUT       BIL
-        NROWS         1550
-        NCOLS         1195
-        NBANDS        1
-        NBITS         16
-        BANDROWBYTES         2390
-        TOTALROWBYTES        2390
-        BANDGAPBYTES         0
+        Creates a I{.hdr} file to the corresponding I{.bil} file - see
+        *write_hdr*.
         '''
-        hdr = os.path.splitext(self.filename)[0] + '.hdr'
-        fid = open(hdr, 'w')
-        fid.write('BYTEORDER\t%s\n' % sys.byteorder)
-        fid.write('LAYOUT\tBIL\n')
-        fid.write('NROWS\t%i\n' % self.nrows)
-        fid.write('NCOLS\t%i\n' % self.ncols)
-        fid.write('NBANDS\t1\n')
-        fid.write('NBITS\t16\n')
-        fid.write('BANDROWBYTES\t2390\n')
-        fid.write('TOTALROWBYTES\t2390\n')
-        fid.write('BANDGAPBYTES\t0\n')
-        fid.flush()
-        fid.close()   
+        return write_hdr(self.filename, self.nrows, self.ncols, self.datatype)
         
         
     def _view(self):
@@ -177,5 +283,219 @@ class BILdata(object):
         
     
     
+# Header value of PIXELTYPE by numpy kind
+PIXELTYPES = {'u': 'UNSIGNEDINT', 'i': 'SIGNEDINT', 'f': 'FLOAT'}
+
+LAYOUTS = ('BIL', 'BIP', 'BSQ')
+
+
+def read_hdr(filename):
+    '''
+    Reads the header (*.hdr*) belonging to the data file *filename*.
+
+    :Returns:
+        - Dictionary with the upper case keys of the header and the values
+            as strings, or *None* if there is no header
+    '''
+    hdr = os.path.splitext(filename)[0] + '.hdr'
+    if not os.path.exists(hdr):
+        return None
+    header = {}
+    fid = open(hdr, 'r')
+    for line in fid:
+        items = line.split(None, 1)
+        if len(items) == 2:
+            header[items[0].upper()] = items[1].strip()
+    fid.close()
+    return header
+
+
+def header_dtype(header, default=uint16):
+    '''
+    Returns the numpy data-type (incl. byte order) described by *header*.
+    '''
+    nbits = int(header.get('NBITS', dtype(default).itemsize*8))
+    pixeltype = header.get('PIXELTYPE', '').upper()
+    if pixeltype in ('FLOAT', 'REAL'):
+        kind = 'f'
+    elif pixeltype.startswith('SIGNED'):
+        kind = 'i'
+    elif pixeltype.startswith('UNSIGNED'):
+        kind = 'u'
+    else:
+        kind = dtype(default).kind
+    byteorder = header.get('BYTEORDER', 'I').upper()
+    if byteorder in ('I', 'LITTLE', 'LSBFIRST'):
+        order = '<'
+    elif byteorder in ('M', 'BIG', 'MSBFIRST'):
+        order = '>'
+    else:
+        order = '='
+    return dtype('%s%s%i' % (order, kind, nbits/8))
+
+
+def check_size(filename, nrows, ncols, nbands, dt):
+    '''
+    Checks that the size of *filename* matches the dimensions of its header.
+
+    :Raises:
+        - IOError: if the file is of another size, e.g. a stale header
+    '''
+    expected = nrows * ncols * nbands * dtype(dt).itemsize
+    size = os.path.getsize(filename)
+    if size != expected:
+        raise IOError("%s has %i bytes but its header describes %i" %
+                      (filename, size, expected))
+
+
+def write_hdr(filename, nrows, ncols, dt, nbands=1, layout='BIL',
+              bandnames=None):
+    '''
+    Writes the header (*.hdr*) belonging to the data file *filename*.
+
+    :Parameters:
+        - nrows, ncols, nbands: Dimensions
+        - dt: numpy data-type of the values
+        - layout: BIL, BIP or BSQ
+        - bandnames: Optional list of band names
+    '''
+    dt = dtype(dt)
+    itemsize = dt.itemsize
+    if dt.byteorder == '=':
+        big = sys.byteorder == 'big'
+    else:
+        big = dt.byteorder == '>'
+    if layout == 'BIL':
+        bandrowbytes = ncols * itemsize
+        totalrowbytes = ncols * itemsize * nbands
+    elif layout == 'BIP':
+        bandrowbytes = ncols * itemsize * nbands
+        totalrowbytes = bandrowbytes
+    else:
+        bandrowbytes = ncols * itemsize
+        totalrowbytes = bandrowbytes
+    lines = [('BYTEORDER', 'M' if big and itemsize > 1 else 'I'),
+             ('LAYOUT', layout),
+             ('NROWS', nrows),
+             ('NCOLS', ncols),
+             ('NBANDS', nbands),
+             ('NBITS', itemsize*8),
+             ('PIXELTYPE', PIXELTYPES[dt.kind]),
+             ('BANDROWBYTES', bandrowbytes),
+             ('TOTALROWBYTES', totalrowbytes),
+             ('BANDGAPBYTES', 0)]
+    if bandnames is not None:
+        lines.append(('BANDNAMES', ' '.join(bandnames)))
+    hdr = os.path.splitext(filename)[0] + '.hdr'
+    atomic_write(hdr, ''.join(['%s\t%s\n' % line for line in lines]))
+    return hdr
+
+
+class BandFile(object):
+    '''
+    Several seNorge grids of the same data-type stored as bands of one file.
+    '''
+
+    def __init__(self, filename):
+        '''
+        :Parameters:
+            - filename: Data file (*.bil*, *.bip* or *.bsq*) - the header is
+                expected next to it
+        '''
+        self.filename = filename
+        self.header = None
+
+    def write(self, bands, bandnames=None, layout='BIL', fsync=None):
+        '''
+        Writes the *bands* (list of 2-D arrays of equal shape and data-type)
+        and the header.
+        '''
+        layout = layout.upper()
+        if layout not in LAYOUTS:
+            raise ValueError("Unknown layout %s" % layout)
+        data = asarray(bands)
+        if data.ndim != 3:
+            raise ValueError("Bands must be 2-D arrays of equal shape")
+        nbands, nrows, ncols = data.shape
+        if bandnames is not None and len(bandnames) != nbands:
+            raise ValueError("%i band names for %i bands" %
+                             (len(bandnames), nbands))
+        if layout == 'BIL':
+            data = data.transpose((1, 0, 2))
+        elif layout == 'BIP':
+            data = data.transpose((1, 2, 0))
+        with stage('bil_write'):
+            atomic_write(self.filename, data, fsync)
+            add_bytes(written=data.nbytes)
+        write_hdr(self.filename, nrows, ncols, data.dtype, nbands, layout,
+                  bandnames)
+        self.header = None
+
+    def _header(self):
+        if self.header is None:
+            self.header = read_hdr(self.filename)
+            if self.header is None:
+                raise IOError("No header found for %s" % self.filename)
+        return self.header
+
+    def _shape(self):
+        header = self._header()
+        nrows = int(header['NROWS'])
+        ncols = int(header['NCOLS'])
+        nbands = int(header.get('NBANDS', 1))
+        layout = header.get('LAYOUT', 'BIL').upper()
+        if layout not in LAYOUTS:
+            raise IOError("Unknown layout %s in the header of %s" %
+                          (layout, self.filename))
+        check_size(self.filename, nrows, ncols, nbands, header_dtype(header))
+        return layout, nbands, nrows, ncols
+
+    @property
+    def bandnames(self):
+        names = self._header().get('BANDNAMES')
+        if names is None:
+            return [str(i) for i in range(self._shape()[1])]
+        return names.split()
+
+    @property
+    def dtype(self):
+        return header_dtype(self._header())
+
+    def band(self, band):
+        '''
+        Returns the band *band* (index or name) as array in native byte
+        order. Only the band itself is read from the file.
+        '''
+        layout, nbands, nrows, ncols = self._shape()
+        if not isinstance(band, int):
+            band = self.bandnames.index(band)
+        if not 0 <= band < nbands:
+            raise IndexError("Band %i of %i" % (band, nbands))
+        dt = self.dtype
+        with stage('bil_read'):
+            if layout == 'BSQ':
+                mm = memmap(self.filename, dtype=dt, mode='r',
+                            offset=band*nrows*ncols*dt.itemsize,
+                            shape=(nrows, ncols))
+                data = array(mm)
+            elif layout == 'BIL':
+                mm = memmap(self.filename, dtype=dt, mode='r',
+                            shape=(nrows, nbands, ncols))
+                data = array(mm[:, band, :])
+            else:
+                mm = memmap(self.filename, dtype=dt, mode='r',
+                            shape=(nrows, ncols, nbands))
+                data = array(mm[:, :, band])
+            del mm
+            add_bytes(read=data.nbytes)
+        return data.astype(dt.newbyteorder('='))
+
+    def read(self):
+        '''
+        Returns all bands as (bands, rows, cols) array.
+        '''
+        return array([self.band(i) for i in range(self._shape()[1])])
+
+
 if __name__ == "__main__":
     pass
\ No newline at end of file
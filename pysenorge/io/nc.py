@@ -33,22 +33,55 @@ sys.path.append(os.path.abspath('../..'))
 # Additional
 from numpy import arange, float32
 
-try:
-    from netCDF4 import Dataset, num2date
-    print "Using netCDF4"
-except ImportError:
-    try:
-        from Scientific.IO.NetCDF import NetCDFFile as Dataset
-        print "Using Scientific.IO"
-    except ImportError:
-        print '''WARNING: Can not find module "netCDF4" or "Scientific.IO.NetCDF"!
-        Please install one of them for netCDF file support.'''
+# The netCDF library is imported on first use (see _netcdf) to keep the start
+# of BIL-only theme runs fast.
 
 # Own
 from pysenorge.set_environment import timeunit, default_senorge_width,\
             default_senorge_height
 from pysenorge.converters import get_FillValue
 from pysenorge.grid import senorge_grid
+from pysenorge.tools.instrumentation import timed, add_bytes
+
+
+def _netcdf():
+    """
+    Imports the netCDF library on first use.
+    
+    :Returns:
+        - (Dataset, num2date); *num2date* is *None* if only *Scientific.IO*
+            is available.
+    """
+    try:
+        from netCDF4 import Dataset, num2date
+    except ImportError:
+        try:
+            from Scientific.IO.NetCDF import NetCDFFile as Dataset
+            num2date = None
+        except ImportError:
+            raise ImportError('''Can not find module "netCDF4" or "Scientific.IO.NetCDF"!
+        Please install one of them for netCDF file support.''')
+    return Dataset, num2date
+
+
+def open_dataset(filename, mode='r'):
+    """
+    Opens a netCDF file with the available netCDF library. Gzipped files
+    (*.nc.gz*) are read from memory without unzipping them to disk (see
+    *gcompression.gopen*).
+    
+    :Parameters:
+        - filename: netCDF file
+        - mode: 'r', 'w' or 'a' - gzipped files only 'r'
+    """
+    if filename.endswith('.gz'):
+        if mode != 'r':
+            raise IOError("%s can only be opened for reading" % filename)
+        from pysenorge.tools.gcompression import gopen
+        return gopen(filename)
+    Dataset = _netcdf()[0]
+    return Dataset(filename, mode)
+
 
 class NCdata():
     """
@@ -63,6 +96,7 @@ class NCdata():
         self.zip = False
         
     
+    @timed('nc_new')
     def new(self, secs):
         """
         Creates a new seNorge netCDF file.
@@ -71,6 +105,7 @@ class NCdata():
         :Parameters:
             - secs: in seconds since 1970-01-01 00:00:00
         """
+        Dataset = _netcdf()[0]
         # create new file
         try:
             rootgrp = Dataset(self.filename, 'w', format='NETCDF3_CLASSIC')
@@ -111,6 +146,7 @@ class NCdata():
         self._set_latlon()
         
         
+    @timed('nc_add_variable')
     def add_variable(self, theme_name, theme_dtype, theme_unit, long_name, data,
                      lsd=None):
         """
@@ -139,8 +175,10 @@ class NCdata():
         # Check for correct dimensions
         if data.shape == (1550, 1195):
             var[:] = data
+            add_bytes(written=data.nbytes)
         elif data.shape == (1195, 1550):
             var[:] = data.T
+            add_bytes(written=data.nbytes)
             print "Data array transposed before saving!"
         else:
             print "Data array does not have seNorge standard dimensions: (y=1550, x=1195)."
@@ -149,6 +187,7 @@ class NCdata():
         print """Added variable "%s" to file %s""" % (theme_name, self.filename)
         
         
+    @timed('nc_close')
     def close(self):
         """
         Closes and flushes the netCDF file.
@@ -357,6 +396,7 @@ class NCdataGrp(NCdata):
     '''
         
     def new(self):
+        Dataset = _netcdf()[0]
         # create new file
         rootgrp = Dataset(self.filename, 'w', format='NETCDF4')
         # create standard groups
@@ -386,6 +426,7 @@ class NCdataGrp(NCdata):
         pass
         
     def add_theme(self, theme_name, theme_dtype, theme_unit ):
+        Dataset = _netcdf()[0]
         self.rootgrp = Dataset(self.filename, 'a') # might be replaced by open or add function
         self.rootgrp.thmgrp.createDimension(theme_name, size=self.default_theme_dimension)
         new_theme = self.rootgrp.thmgrp.createVariable(theme_name, theme_dtype, (theme_name,)) # check how the dimensions work for 2D!!!
@@ -402,6 +443,7 @@ def NCreport(NCfile, stdout=False):
     """
     Might merge into NCdata.report
     """
+    Dataset, num2date = _netcdf()
     if isinstance(NCfile, Dataset):
         rootgrp = NCfile
     else:
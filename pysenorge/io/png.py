@@ -7,9 +7,15 @@ Output to PNG image files.
 :Created: 14. okt. 2010
 '''
 # Built-in
+import os
 # Additional
 # Own
+from pysenorge.tools.instrumentation import timed, add_bytes
 
+# Colour look-up tables by file name (see load_clt)
+_CLTCACHE = {}
+
+@timed('png_write')
 def writePNG(A, outname, cltfile=None, test=False, vmin=0, vmax=100):
     """
     Write PNG image using *Matplotlib*.
@@ -38,8 +44,7 @@ def writePNG(A, outname, cltfile=None, test=False, vmin=0, vmax=100):
             plt.colorbar()
             plt.show()
         else:
-            clt = CLT()
-            clt.read(cltfile)
+            clt = load_clt(cltfile)
             colors, contours, ticks, labels = clt.forMPL()
 
             ax.contourf(A, contours, colors=colors, aspect='equal',
@@ -55,12 +60,58 @@ def writePNG(A, outname, cltfile=None, test=False, vmin=0, vmax=100):
                 ax.axis('off')
                 # dpi x figsize = 1550x1195 pixel
                 plt.savefig(outname+".png", dpi=100)
+                add_bytes(written=os.path.getsize(outname+".png"))
                 print "%s written!" % (outname+".png")
             
     except ImportError:
         print '''Required plotting module "matplotlib" not found!\nVisit www.matplotlib.sf.net''' 
 
     
+def load_clt(cltfile):
+    """
+    Returns the *CLT* read from *cltfile*. Tables are read once per process
+    and re-read only if the file changed.
+    
+    :Parameters:
+        - cltfile: Colour look-up table file
+    """
+    key = os.path.abspath(cltfile)
+    mtime = os.path.getmtime(cltfile)
+    if key not in _CLTCACHE or _CLTCACHE[key][0] != mtime:
+        clt = CLT()
+        clt.read(cltfile)
+        _CLTCACHE[key] = (mtime, clt)
+    return _CLTCACHE[key][1]
+
+
+def writeRGBA(A, filename):
+    """
+    Writes an RGBA image without *Matplotlib*.
+    
+    :Parameters:
+        - A: (rows, cols, 4) *uint8* array, first row at the top
+        - filename: Name of the PNG file
+    """
+    import struct, zlib
+    from numpy import ascontiguousarray, uint8
+    A = ascontiguousarray(A, dtype=uint8)
+    height, width = A.shape[:2]
+    
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + \
+            struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+    
+    # every row starts with filter type 0 (none)
+    raw = ''.join(['\x00' + row.tostring() for row in A])
+    png = '\x89PNG\r\n\x1a\n' + \
+        chunk('IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) + \
+        chunk('IDAT', zlib.compress(raw, 6)) + \
+        chunk('IEND', '')
+    fid = open(filename, 'wb')
+    fid.write(png)
+    fid.close()
+
+
 def _pngColorbar(fig, colors, contours, ticks, labels, title):
     from matplotlib import mpl
     # ColorbarBase derives from ScalarMappable and puts a colorbar
@@ -241,6 +292,33 @@ class CLT():
 
         return colors, contours, ticks, labels
 
+    def colorize(self, A):
+        """
+        Returns the colours of the values in *A* as RGBA image.
+        
+        Values outside all classes, NaN and the no-data value of the header
+        are transparent.
+        
+        :Parameters:
+            - A: Array of values in the units of the table
+            
+        :Returns:
+            - *uint8* array of shape A.shape + (4,)
+        """
+        from numpy import array, asarray, searchsorted, isfinite, uint8
+        self.cltlist.sort(self._FROM_cmp)
+        bounds = array([clt.FROM for clt in self.cltlist], dtype=float)
+        upper = array([clt.TO for clt in self.cltlist], dtype=float)
+        palette = array([clt.RGB + (255,) for clt in self.cltlist] +
+                        [(0, 0, 0, 0)], dtype=uint8)
+        A = asarray(A, dtype=float)
+        ndx = searchsorted(bounds, A, 'right') - 1
+        valid = isfinite(A) & (ndx >= 0) & (A != self.hdr.nodata)
+        ndx[~valid] = 0
+        valid &= A <= upper[ndx]
+        ndx[~valid] = len(self.cltlist)
+        return palette[ndx]
+
 
 def _test():
     cltfile = CLT()
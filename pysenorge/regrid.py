@@ -0,0 +1,247 @@
+__docformat__ = 'reStructuredText'
+'''
+Regridding of UM4 fields to the seNorge grid by sparse matrices.
+
+The interpolation from a rectilinear input grid (e.g. UM4, 4 km) to the
+seNorge grid (1 km) is a linear map. It is computed once as a sparse (CSR)
+matrix with one row per seNorge cell and one column per input cell and then
+applied to an entire (time, y, x) stack by one sparse matrix product.
+
+Schemes:
+    - *nearest*: nearest neighbour. Points exactly half-way between two
+        input cells go to the cell with the even index (*numpy.around*).
+        *grid.interpolate* rounds on the input grid cropped to Norway, so it
+        may choose the other cell at such ties - for UM4 about a quarter of
+        the land cells, as the seNorge coordinates often lie half-way.
+    - *bilinear*: bilinear interpolation between the four surrounding cells
+    - *area*: area weighted (conservative) - each seNorge cell is the mean of
+        the input cells weighted by their overlap with it. Use it for fluxes
+        (e.g. net short-wave radiation) and sums.
+
+Input cells are bounded half-way between the cell centres. Output cells
+outside the input grid get the value of the nearest input cell.
+
+The matrices depend only on the grids and the scheme. They are kept in memory
+and stored as *.npz* files in *REGRIDdir*, so a new process loads them instead
+of computing them again. Requires *scipy*.
+
+Example::
+
+    from pysenorge.regrid import regrid
+    # x_wind: (time, rlat, rlon)
+    x_wind_senorge = regrid(rlon, rlat, x_wind, scheme='area')
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import hashlib
+
+# Additional
+import numpy as np
+import numpy.ma as ma
+from numpy import nan, float32, float64
+
+# Own
+from pysenorge.set_environment import netCDFout
+
+# Folder of the stored regridding matrices
+REGRIDdir = os.path.join(netCDFout, 'regrid')
+
+SCHEMES = ('nearest', 'bilinear', 'area')
+
+# Matrices computed or loaded in this process by key
+_MATRICES = {}
+
+
+def _positions(xin, xout):
+    '''
+    Returns the fractional index of each *xout* in the increasing
+    coordinates *xin* clipped to the range of *xin*.
+    '''
+    i = np.clip(np.searchsorted(xin, xout) - 1, 0, len(xin)-2)
+    pos = i + (xout - xin[i]) / (xin[i+1] - xin[i])
+    return np.clip(pos, 0, len(xin)-1)
+
+
+def _edges(x):
+    '''
+    Returns the cell boundaries half-way between the cell centres *x*.
+    '''
+    mid = 0.5 * (x[1:] + x[:-1])
+    return np.concatenate(([x[0] - (mid[0] - x[0])], mid,
+                           [x[-1] + (x[-1] - mid[-1])]))
+
+
+def _nearest_1d(xin, xout):
+    cols = np.around(_positions(xin, xout)).astype(np.int32)
+    rows = np.arange(len(xout), dtype=np.int32)
+    return rows, cols, np.ones(len(xout), dtype=float64)
+
+
+def _bilinear_1d(xin, xout):
+    pos = _positions(xin, xout)
+    i0 = pos.astype(np.int32)
+    i1 = np.clip(i0 + 1, 0, len(xin)-1)
+    w1 = pos - i0
+    rows = np.arange(len(xout), dtype=np.int32)
+    return (np.concatenate((rows, rows)), np.concatenate((i0, i1)),
+            np.concatenate((1.0 - w1, w1)))
+
+
+def _area_1d(xin, xout):
+    ein = _edges(xin)
+    eout = _edges(xout)
+    lo, hi = eout[:-1], eout[1:]
+    # first and last input cell touching each output cell
+    kmin = np.clip(np.searchsorted(ein, lo, 'right') - 1, 0, len(xin)-1)
+    kmax = np.clip(np.searchsorted(ein, hi, 'left') - 1, 0, len(xin)-1)
+    rows, cols, weights = [], [], []
+    for offset in range((kmax - kmin).max() + 1):
+        k = kmin + offset
+        valid = k <= kmax
+        r = np.nonzero(valid)[0]
+        k = k[valid]
+        overlap = np.minimum(hi[r], ein[k+1]) - np.maximum(lo[r], ein[k])
+        keep = overlap > 0
+        rows.append(r[keep])
+        cols.append(k[keep])
+        weights.append(overlap[keep])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    weights = np.concatenate(weights)
+    total = np.zeros(len(xout))
+    counts = np.bincount(rows, weights)
+    total[:len(counts)] = counts
+    weights = weights / total[rows]
+    # output cells outside the input grid take the nearest input cell
+    outside = np.nonzero(total <= 0)[0]
+    if len(outside) > 0:
+        r, c, w = _nearest_1d(xin, xout[outside])
+        rows = np.concatenate((rows, outside))
+        cols = np.concatenate((cols, c))
+        weights = np.concatenate((weights, w))
+    return rows, cols, weights
+
+
+def _matrix_1d(xin, xout, scheme):
+    from scipy.sparse import coo_matrix
+    builder = {'nearest': _nearest_1d, 'bilinear': _bilinear_1d,
+               'area': _area_1d}[scheme]
+    rows, cols, weights = builder(xin, xout)
+    return coo_matrix((weights, (rows, cols)),
+                      shape=(len(xout), len(xin))).tocsr()
+
+
+def regrid_matrix(xin, yin, xout, yout, scheme='nearest', cachedir=REGRIDdir):
+    '''
+    Returns the sparse regridding matrix from the grid *xin*, *yin* to the
+    grid *xout*, *yout*.
+
+    :Parameters:
+        - xin, yin: Increasing 1-D coordinates of the input grid
+        - xout, yout: Increasing 1-D coordinates of the output grid
+        - scheme: One of *SCHEMES*
+        - cachedir: Folder of the stored matrices or *None*
+
+    :Returns:
+        - CSR matrix of shape (len(yout)*len(xout), len(yin)*len(xin))
+    '''
+    if scheme not in SCHEMES:
+        raise ValueError("Unknown regridding scheme '%s'" % scheme)
+    xin, yin, xout, yout = [np.asarray(a, dtype=float64)
+                            for a in (xin, yin, xout, yout)]
+    if xin[-1]-xin[0] < 0 or yin[-1]-yin[0] < 0:
+        raise ValueError('xin and yin must be increasing!')
+    md5 = hashlib.md5(scheme)
+    for a in (xin, yin, xout, yout):
+        md5.update(a.tostring())
+    key = md5.hexdigest()
+    if key in _MATRICES:
+        return _MATRICES[key]
+
+    from scipy.sparse import csr_matrix, kron
+    filename = None
+    if cachedir is not None:
+        filename = os.path.join(cachedir, 'regrid_%s_%s.npz' % (scheme, key))
+    if filename is not None and os.path.exists(filename):
+        npz = np.load(filename)
+        M = csr_matrix((npz['data'], npz['indices'], npz['indptr']),
+                       shape=tuple(npz['shape']))
+    else:
+        # the weights of a rectilinear grid are the product of the weights
+        # along x and along y
+        M = kron(_matrix_1d(yin, yout, scheme),
+                 _matrix_1d(xin, xout, scheme)).tocsr()
+        M.data = M.data.astype(float32)
+        if filename is not None:
+            try:
+                if not os.path.exists(cachedir):
+                    os.makedirs(cachedir)
+                tmpfile = filename + '.tmp.npz'
+                np.savez(tmpfile, data=M.data, indices=M.indices,
+                         indptr=M.indptr, shape=np.array(M.shape))
+                os.rename(tmpfile, filename)
+            except (IOError, OSError), e:
+                print "Could not store regridding matrix: %s" % e
+    _MATRICES[key] = M
+    return M
+
+
+def apply_matrix(M, data, shape):
+    '''
+    Applies the regridding matrix *M* to *data*.
+
+    :Parameters:
+        - M: Matrix returned by *regrid_matrix*
+        - data: (y, x) or (..., y, x) array on the input grid; masked values
+            are treated as NaN
+        - shape: (rows, cols) of the output grid
+
+    :Returns:
+        - float32 array of shape data.shape[:-2] + shape
+    '''
+    data = ma.filled(ma.asarray(data).astype(float32), nan)
+    lead = data.shape[:-2]
+    stack = data.reshape((-1, M.shape[1]))
+    # one product for all time steps: (cells_out, cells_in) x (cells_in, nt)
+    result = (M * stack.T).T
+    result = np.ascontiguousarray(result, dtype=float32)
+    return result.reshape(lead + tuple(shape))
+
+
+def regrid(xin, yin, data, scheme='nearest', masked=True):
+    '''
+    Regrids *data* from the grid *xin*, *yin* (e.g. the UM4 *rlon*, *rlat*)
+    to the seNorge grid.
+
+    :Parameters:
+        - xin, yin: Increasing 1-D coordinates of the input grid in UTM 33
+        - data: (y, x) or (time, y, x) array on the input grid
+        - scheme: One of *SCHEMES*
+        - masked: If *True* cells outside Norway are set to NaN
+
+    :Returns:
+        - float32 array of shape data.shape[:-2] + (1550, 1195) in the order
+            of *grid.interpolate* (south up)
+    '''
+    from pysenorge.grid import senorge_grid, interpolate_mask
+    xout, yout = senorge_grid()
+    M = regrid_matrix(xin, yin, xout, yout, scheme)
+    result = apply_matrix(M, data, (len(yout), len(xout)))
+    if masked:
+        stack = result.reshape((-1,) + result.shape[-2:])
+        stack[:, interpolate_mask()] = nan
+    return result
+
+
+def warm_up(xin, yin, schemes=SCHEMES):
+    '''
+    Computes or loads the matrices from the grid *xin*, *yin* to the seNorge
+    grid for *schemes*, e.g. at the start of a long running process.
+    '''
+    from pysenorge.grid import senorge_grid
+    xout, yout = senorge_grid()
+    for scheme in schemes:
+        regrid_matrix(xin, yin, xout, yout, scheme)
@@ -23,6 +23,10 @@ from pysenorge.tools.date_converters import datetime2BILdate, iso2datetime,\
 #                                              WindThresholdLi
 from pysenorge.io.bil import BILdata
 from pysenorge.grid import senorge_mask
+from pysenorge.tools.instrumentation import instrumented_main, timed, \
+    set_run_date
+from pysenorge.themes.senorge_theme import seNorgeTheme, BILInput, Output, \
+    register
 
 
 def __model(u, nsd):
@@ -42,6 +46,7 @@ def __model(u, nsd):
 
     return Hwind
 
+@timed('model')
 def model(u, nsd, lwc, age):
     '''    
     Empirical formulation relating the additional snow depth |Hwind| deposited in lee
@@ -113,6 +118,7 @@ def model(u, nsd, lwc, age):
     
     return Hwind
 
+@instrumented_main('additional_snow_depth_wind')
 def main():
     '''
     Loads and verifies input data, calls the model, and controls the output stream. 
@@ -154,6 +160,7 @@ def main():
     
     # get current datetime
     cdt = iso2datetime(args[0]+" 06:00:00")
+    set_run_date(cdt.date().isoformat())
     windfilename = "wind_speed_avg_600m_%s.bil" % datetime2BILdate(cdt)
     
     # Add full path to the filename
@@ -261,7 +268,32 @@ def main():
         
     # At last - cross fingers it all worked out!
     print "\n*** Finished successfully ***\n"
-    
+
+
+class AdditionalSnowDepthWind(seNorgeTheme):
+    '''
+    Additional snow depth due to wind as plugin for *run_themes.py*.
+    '''
+    name = 'additional_snow_depth_wind'
+    inputs = [BILInput('u', "%(BILout)s/wind_speed_avg_600m/%(hydroyear)s/wind_speed_avg_600m_%(date)s.bil",
+                       scale=0.1),
+              BILInput('nsd', "%(BILout)s/sdfsw/%(hydroyear)s/sdfsw_%(date)s.bil",
+                       dtype=None),
+              BILInput('lwc', "%(BILout)s/lwc/%(hydroyear)s/lwc_%(date)s.bil",
+                       datatype='uint8', dtype=None),
+              BILInput('age', "%(BILout)s/age/%(hydroyear)s/age_%(date)s.bil",
+                       datatype='uint8', dtype=None)]
+    outputs = [Output('additional_snow_depth', scale=0.001, unit="m",
+                      cltfile=os.path.join(BILout, 'additional_snow_depth',
+                                           "Hwind.clt"))]
+
+    tiled = True
+
+    def model(self, u, nsd, lwc, age):
+        return {'additional_snow_depth': model(u, nsd, lwc, age)}
+
+register(AdditionalSnowDepthWind)
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
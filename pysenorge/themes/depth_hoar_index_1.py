@@ -35,10 +35,6 @@ execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
 
 # Additional
 from numpy import flipud, zeros_like, int16, float32
-try: # for future purpose
-    from netCDF4 import date2num
-except ImportError:
-    pass # Error message will be delivered by IO module!
 # Own
 from pysenorge.set_environment import METdir, PROGdir, BILin, BILout, \
                                         IntFillValue, timeunit
@@ -46,8 +42,13 @@ from pysenorge.io.bil import BILdata
 from pysenorge.tools.date_converters import datetime2BILdate, iso2datetime,\
                                             get_hydroyear
 from pysenorge.grid import senorge_mask
+from pysenorge.tools.instrumentation import instrumented_main, timed, \
+    set_run_date
+from pysenorge.themes.senorge_theme import seNorgeTheme, BILInput, Output, \
+    register
 
 
+@timed('model')
 def model(tm, sd, tgss):
     """
     The map indicates the probability of destabilizing the snow cover
@@ -71,7 +72,7 @@ def model(tm, sd, tgss):
     sddims = sd.shape
     if tmdims != sddims:
         print "Temperature grid and snow-depth grid have different shapes!"
-    if tgss == None:
+    if tgss is None:
         tgss = zeros_like(tm)
     for i in range(tmdims[0]):
         for j in range(tmdims[1]):
@@ -95,7 +96,7 @@ def __model(tm, sd, tgss):
     sddims = sd.shape
     if tmdims != sddims:
         print "Temperature grid and snow-depth grid have different shapes!"
-    if tgss == None:
+    if tgss is None:
         tgss = zeros_like(tm)
     
     
@@ -123,6 +124,7 @@ def __model(tm, sd, tgss):
     
     return int16(tgss)
 
+@instrumented_main('depth_hoar_index_1')
 def main():
     '''
     Loads and verifies input data, calls the model, and controls the output stream. 
@@ -164,6 +166,7 @@ def main():
     
     # get current datetime
     cdt = iso2datetime(args[0]+" 06:00:00")
+    set_run_date(cdt.date().isoformat())
     oneday = timedelta(days=1)
     tmfilename = "tm_%s.bil" % datetime2BILdate(cdt)
     sdfilename = "sd_%s.bil" % datetime2BILdate(cdt)
@@ -210,6 +213,7 @@ def main():
     # Setup outputs
     outfile = themedir+'_'+datetime2BILdate(cdt)
     if options.nc:
+        from netCDF4 import date2num
         secs = date2num(cdt, timeunit) # used in NCdata.new()
     outdir = os.path.join(options.outdir, str(get_hydroyear(cdt)))
     if not os.path.exists(outdir):
@@ -273,9 +277,32 @@ class TestModel(unittest.TestCase):
                 self.assertEqual(result[i][j], tgss[i][j])
 
 
+# "__model" would be name-mangled inside the class body
+_daily_model = __model
 
 
-    
+class DepthHoarIndex1(seNorgeTheme):
+    '''
+    Depth hoar index 1 as plugin for *run_themes.py*.
+    '''
+    name = 'depth_hoar_index_1'
+    inputs = [BILInput('tm', "%(METdir)s/tm/%(year)s/tm_%(date)s.bil",
+                       scale=0.1, offset=-273.1,
+                       fallback="%(PROGdir)s/%(year)s/tm_%(date)s.bil"),
+              BILInput('sd', "%(BILin)s/sd/%(hydroyear)s/sd_%(date)s.bil",
+                       scale=0.001),
+              BILInput('tgss', "%(BILout)s/depth_hoar_index_1/%(yhydroyear)s/depth_hoar_index_1_%(yesterday)s.bil",
+                       datatype='int16', optional=True)]
+    outputs = [Output('depth_hoar_index_1', datatype='int16',
+                      unit="K m-1 per day", long_name='Depth hoar index 1',
+                      cltfile=os.path.join(BILout, 'depth_hoar_index_1',
+                                           "tgss.clt"))]
+
+    def model(self, tm, sd, tgss):
+        return {'depth_hoar_index_1': _daily_model(tm, sd, tgss)}
+
+register(DepthHoarIndex1)
+
 
 if __name__ == '__main__':
     main()
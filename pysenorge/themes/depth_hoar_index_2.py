@@ -34,10 +34,6 @@ execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
 
 # Additional
 from numpy import flipud, zeros_like, uint16, float32, asarray
-try: # for future purpose
-    from netCDF4 import date2num
-except ImportError:
-    pass # Error message will be delivered by IO module!
 # Own
 from pysenorge.set_environment import METdir, PROGdir, BILin, BILout, \
                                         UintFillValue, timeunit
@@ -45,8 +41,13 @@ from pysenorge.io.bil import BILdata
 from pysenorge.tools.date_converters import datetime2BILdate, iso2datetime,\
                                             get_hydroyear
 from pysenorge.grid import senorge_mask
+from pysenorge.tools.instrumentation import instrumented_main, timed, \
+    set_run_date
+from pysenorge.themes.senorge_theme import seNorgeTheme, BILInput, Output, \
+    register
 
 
+@timed('model')
 def model(tm, sd, tds):
     """
     Doc...
@@ -60,7 +61,7 @@ def model(tm, sd, tds):
     littlesnow_flag = 65533
     nosnow_flag = 65534
     
-    if tds == None: # init tds if not existent
+    if tds is None: # init tds if not existent
         tds = uint16(zeros_like(tm))
     
     # define the array masks
@@ -88,6 +89,7 @@ def model(tm, sd, tds):
     return tds 
     
 
+@instrumented_main('depth_hoar_index_2')
 def main():
     '''
     Loads and verifies input data, calls the model, and controls the output stream. 
@@ -128,6 +130,7 @@ def main():
     
     # get current datetime
     cdt = iso2datetime(args[0]+" 06:00:00")
+    set_run_date(cdt.date().isoformat())
     oneday = timedelta(days=1)
     tmfilename = "tm_%s.bil" % datetime2BILdate(cdt)
     sdfilename = "sd_%s.bil" % datetime2BILdate(cdt)
@@ -174,6 +177,7 @@ def main():
     # Setup outputs
     outfile = themedir+'_'+datetime2BILdate(cdt)
     if options.nc:
+        from netCDF4 import date2num
         secs = date2num(cdt, timeunit) # used in NCdata.new()
     outdir = os.path.join(options.outdir, str(get_hydroyear(cdt)))
     if not os.path.exists(outdir):
@@ -251,7 +255,30 @@ def __test():
     
     tds = model(tm, sd, tds)
     print tds
-    
+
+
+class DepthHoarIndex2(seNorgeTheme):
+    '''
+    Depth hoar index 2 as plugin for *run_themes.py*.
+    '''
+    name = 'depth_hoar_index_2'
+    inputs = [BILInput('tm', "%(METdir)s/tm/%(year)s/tm_%(date)s.bil",
+                       scale=0.1, offset=-273.1,
+                       fallback="%(PROGdir)s/%(year)s/tm_%(date)s.bil"),
+              BILInput('sd', "%(BILin)s/sd/%(hydroyear)s/sd_%(date)s.bil",
+                       scale=0.001),
+              BILInput('tds', "%(BILout)s/depth_hoar_index_2/%(yhydroyear)s/depth_hoar_index_2_%(yesterday)s.bil",
+                       dtype=None, optional=True)]
+    outputs = [Output('depth_hoar_index_2', unit="days",
+                      long_name='Depth hoar index 2',
+                      cltfile=r"Z:\snowsim\depth_hoar_index_2\tgss2_v2.clt")]
+
+    tiled = True
+
+    def model(self, tm, sd, tds):
+        return {'depth_hoar_index_2': model(tm, sd, tds)}
+
+register(DepthHoarIndex2)
 
 
 if __name__ == '__main__':
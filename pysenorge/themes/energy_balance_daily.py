@@ -33,14 +33,6 @@ from optparse import OptionParser
 execfile("set_pysenorge_path.py")
 
 # Additional
-try:
-    from netCDF4 import Dataset
-except ImportError:
-    try:
-        from Scientific.IO.NetCDF import NetCDFFile as Dataset
-    except ImportError:
-        print '''WARNING: Can not find module "netCDF4" or "Scientific.IO.NetCDF"!
-        Please install for netCDF file support.'''
 from numpy import sqrt, mean, flipud, zeros_like, arctan2, zeros, uint16
 
 # Own
@@ -29,21 +29,24 @@ from optparse import OptionParser
 execfile("set_pysenorge_path.py")
 
 # Additional
-from netCDF4 import Dataset
 from numpy import sqrt, mean
 
 # Own
 from pysenorge.set_environment import netCDFin, netCDFout
-from pysenorge.io.nc import NCdata
+from pysenorge.io.nc import NCdata, open_dataset
 from pysenorge.tools.date_converters import iso2datetime, datetime2BILdate
 from pysenorge.converters import nan2fill
 from pysenorge.grid import interpolate
+from pysenorge.tools.instrumentation import instrumented_main, timed, stage, \
+    add_bytes, set_run_date
 
+@timed('model')
 def model(x_wind, y_wind):
     
     wind_amp = sqrt(x_wind**2 + y_wind**2)
     return 
 
+@instrumented_main('max_wind_speed_daily')
 def main():
     # Theme variables
     themedir = 'awsd'
@@ -74,6 +77,7 @@ def main():
     
     # get current datetime
     cdt = iso2datetime(args[0]+" 06:00:00")
+    set_run_date(cdt.date().isoformat())
     ncfilename = "UM4_sf_%s.nc" % datetime2BILdate(cdt) # e.g. UM4_sf_2010_11_28.nc
     if len(args) != 1:
         parser.error("Please provide an input file!")
@@ -86,26 +90,29 @@ def main():
     if not os.path.exists(ncfile):
         parser.error("%s does not exist!" % ncfile)
     else:
-        if timerange == None:
-            # Load wind data from prognosis (netCDF file) for full timerange
-            ds = Dataset(ncfile, 'r')
-            wind_time = ds.variables['time'][:]
-            x_wind = ds.variables['x_wind'][:,:,:]
-            y_wind = ds.variables['y_wind'][:,:,:]
-            rlon = ds.variables['rlon'][:]
-            rlat = ds.variables['rlat'][:]
-            ds.close()    
-            print "xwind-shape", x_wind.shape
-        else:
-            # Load wind data from prognosis (netCDF file) for selected timerange
-            ds = Dataset(ncfile, 'r')
-            wind_time = ds.variables['time'][timerange[0]:timerange[1]]
-            x_wind = ds.variables['x_wind'][timerange[0]:timerange[1],:,:]
-            y_wind = ds.variables['y_wind'][timerange[0]:timerange[1],:,:]
-            rlon = ds.variables['rlon'][:]
-            rlat = ds.variables['rlat'][:]
-            ds.close()    
-            print "xwind-shape", x_wind.shape
+        with stage('read_um4'):
+            if timerange == None:
+                # Load wind data from prognosis (netCDF file) for full timerange
+                ds = open_dataset(ncfile, 'r')
+                wind_time = ds.variables['time'][:]
+                x_wind = ds.variables['x_wind'][:,:,:]
+                y_wind = ds.variables['y_wind'][:,:,:]
+                rlon = ds.variables['rlon'][:]
+                rlat = ds.variables['rlat'][:]
+                ds.close()    
+                print "xwind-shape", x_wind.shape
+            else:
+                # Load wind data from prognosis (netCDF file) for selected timerange
+                ds = open_dataset(ncfile, 'r')
+                wind_time = ds.variables['time'][timerange[0]:timerange[1]]
+                x_wind = ds.variables['x_wind'][timerange[0]:timerange[1],:,:]
+                y_wind = ds.variables['y_wind'][timerange[0]:timerange[1],:,:]
+                rlon = ds.variables['rlon'][:]
+                rlat = ds.variables['rlat'][:]
+                ds.close()    
+                print "xwind-shape", x_wind.shape
+            add_bytes(read=sum([a.nbytes for a in (wind_time, x_wind, y_wind,
+                                                   rlon, rlat)]))
 
     
     # Setup outputs
@@ -17,6 +17,7 @@ def runDaily(scriptname, prognosis=False, UMperiod=['[6,30]']):
     
     Example input:
     scriptname = "wind_10m_daily.py"
+    UMperiod = ['[6,30]', '[30,54]']
     """
 
     dt = datetime.timedelta(days=1)
@@ -33,11 +34,11 @@ def runDaily(scriptname, prognosis=False, UMperiod=['[6,30]']):
     os.system("python %s %s" % (script, datetime.date.today().isoformat()))
     logging.info("File for %s written!" % datetime.date.today().isoformat())
     if prognosis:
-        for period in UMperiod:
-            os.system("python %s %s -t %s" % (script,
-                                              datetime.date.today().isoformat(),
-                                              period))
-            logging.info("File for %s written!" % (datetime.date.today()+dt).isoformat())
+        # All periods are computed from a single read of the UM4 file
+        os.system("python %s %s -t [%s]" % (script,
+                                            datetime.date.today().isoformat(),
+                                            ",".join(UMperiod)))
+        logging.info("Files for %s written!" % ", ".join(UMperiod))
     
     logging.info('Script finished: %s' % datetime.datetime.now().isoformat())
 
@@ -1,18 +1,60 @@
 __docformat__ = 'reStructuredText'
 '''
-Doc...
+Runs a theme script for every date in a period.
+
+Products whose inputs, options and code are unchanged since the last run
+are skipped (see *pysenorge.tools.build_cache*). The inputs and outputs of
+each script are taken from its theme plugin (see *senorge_theme*); scripts
+without plugin are always run.
 
 :Author: kmu
 :Created: 13. Sept. 2011
 '''
 import os
+import shlex
 import logging
 from datetime import timedelta, datetime
 execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
+from pysenorge.set_environment import LOGdir
 from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.build_cache import BuildCache
+from pysenorge.tools.time_windows import parse_timerange
+from pysenorge.themes.senorge_theme import ThemeError, UM4WindowTheme, \
+    get_theme
+
+def dependencies(scriptname, cdt, options=""):
+    """
+    Returns the lists of input and output files of *scriptname* for the date
+    *cdt* as declared by the theme plugin of the script (see *senorge_theme*)
+    or *None* if the script has no plugin.
+
+    :Parameters:
+        - options: Command line options of the script - the time windows
+            (*-t*) of UM4 themes change the inputs and outputs
+    """
+    try:
+        theme = get_theme(os.path.splitext(scriptname)[0])
+    except (ThemeError, ImportError):
+        return None
+    windows = [theme.timerange] if isinstance(theme, UM4WindowTheme) else []
+    args = shlex.split(options)
+    for n, arg in enumerate(args):
+        if arg in ('-t', '--timerange') and n+1 < len(args):
+            windows = parse_timerange(args[n+1])
+        elif arg.startswith('--timerange='):
+            windows = parse_timerange(arg.split('=', 1)[1])
+    if not windows:
+        return (theme.input_files(cdt), theme.output_files(cdt))
+    # all windows are read from the same prognosis
+    outputs = []
+    for window in windows:
+        theme.timerange = window
+        outputs.extend(theme.output_files(cdt))
+    return (theme.input_files(cdt), outputs)
 
 
-def runPeriod(scriptname, start_date, end_date):
+def runPeriod(scriptname, start_date, end_date, options="", force=False,
+              cachefile=os.path.join(LOGdir, "build_cache.json")):
     """
     All input as strings
     
@@ -20,6 +62,11 @@ def runPeriod(scriptname, start_date, end_date):
     scriptname = "wind_10m_daily.py"
     start_date = "2011-05-27"
     end_date = "2011-06-08"
+    
+    :Parameters:
+        - options: Additional command line options passed to the script
+        - force: If *True* all dates are run regardless of the build cache
+        - cachefile: JSON file holding the build cache
     """
     
     LOG_FILENAME = os.path.join(os.path.expanduser("~"),
@@ -32,13 +79,31 @@ def runPeriod(scriptname, start_date, end_date):
     end_date =  iso2datetime(end_date+"T00:00:00")
     
     dt = timedelta(days=1)
+    script = os.path.join(os.path.dirname(__file__), scriptname)
+    cache = BuildCache(cachefile)
     
     while start_date <= end_date:
         strdate = "%s-%s-%s" % (str(start_date.year).zfill(2),
                                 str(start_date.month).zfill(2),
                                 str(start_date.day).zfill(2))
-        script = os.path.join(os.path.dirname(__file__), scriptname)
-        os.system("python %s %s" % (script, strdate)) 
+        deps = dependencies(scriptname, start_date, options)
+        if deps is None:
+            os.system("python %s %s %s" % (script, strdate, options))
+        else:
+            inputs, outputs = deps
+            sig = cache.signature(inputs, params=options, code=script)
+            if not force and cache.is_current(outputs, sig):
+                logging.info("%s %s unchanged - skipped" % (scriptname, strdate))
+            else:
+                status = os.system("python %s %s %s" % (script, strdate,
+                                                        options))
+                if status == 0:
+                    cache.update(outputs, sig)
+                    cache.save()
+                else:
+                    logging.error("%s %s failed with exit status %i - not "
+                                  "recorded in the build cache" %
+                                  (scriptname, strdate, status))
         start_date = start_date+dt
         
     logging.info('Script finished: %s' % datetime.now().isoformat())
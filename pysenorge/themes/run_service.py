@@ -0,0 +1,352 @@
+__docformat__ = 'reStructuredText'
+'''
+Resident service generating the themes as soon as new UM4 files arrive.
+
+Instead of being started by cron for every script and date, the service runs
+permanently. It polls *netCDFin/<year>* for new "UM4_sf00_*.nc(.gz)" and
+"UM4_ml00_*.nc(.gz)" files and runs the registered themes (see
+*senorge_theme*) using a new file - followed by the themes depending on their
+outputs - in-process. Grids, masks, loaded inputs and colour look-up tables
+stay in memory between runs.
+
+A file is processed once its size has been stable for one poll interval.
+Compressed files are read from memory without unzipping them to disk (see
+*gcompression.gopen*). Processed files
+are recorded in a state file, so a restarted service does not redo them.
+Themes which failed, e.g. because an input of another chain was not there
+yet, are retried at the following polls - together with the themes depending
+on them - until they succeed or the retry limit is reached.
+
+Command line usage::
+
+    python run_service.py -t wind_10m_daily,wind_600m_daily,additional_snow_depth_wind [options]
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import glob
+import json
+import time
+import logging
+import traceback
+from datetime import timedelta, datetime
+from optparse import OptionParser
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
+
+# Own
+from pysenorge.set_environment import netCDFin, LOGdir
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.instrumentation import start_run, finish_run, stage
+from pysenorge.regrid import SCHEMES
+from pysenorge.themes.senorge_theme import ThemeCache, ThemeError, \
+    UM4Input, get_theme, order_themes
+
+# File name patterns of the UM4 prognosis files
+PATTERNS = ["UM4_sf00_*.nc", "UM4_sf00_*.nc.gz",
+            "UM4_ml00_*.nc", "UM4_ml00_*.nc.gz"]
+
+
+def nc_name(filename):
+    '''
+    Returns the name of the UM4 file *filename* without ".gz".
+    '''
+    return filename[:-3] if filename.endswith('.gz') else filename
+
+
+def um4_date(filename):
+    '''
+    Returns the date of the themes using the UM4 file *filename*, i.e. the day
+    after the prognosis run (e.g. UM4_sf00_2011_02_01.nc -> 2011-02-02 06:00).
+    '''
+    name = os.path.basename(filename).split('.')[0]
+    yy, mm, dd = name.split('_')[-3:]
+    return iso2datetime("%s-%s-%s 06:00:00" % (yy, mm, dd)) + timedelta(days=1)
+
+
+class UM4Service(object):
+    '''
+    Watches *netCDFin* and runs the themes using newly arrived UM4 files.
+    '''
+
+    def __init__(self, names, bil=True, nc=False, png=False, retries=10,
+                 statefile=os.path.join(LOGdir, 'run_service_state.json'),
+                 schemes=SCHEMES):
+        '''
+        :Parameters:
+            - names: Theme names
+            - bil, nc, png: Output formats
+            - retries: Number of times failed themes of a file are retried
+            - statefile: JSON file recording the processed files
+            - schemes: Regrid schemes whose matrices are built by *warm_up*
+        '''
+        self.themes = order_themes([get_theme(name) for name in names])
+        self.formats = (bil, nc, png)
+        self.retries = retries
+        self.schemes = schemes
+        self.statefile = statefile
+        self.cache = ThemeCache()
+        self.sizes = {} # file sizes seen at the last poll
+        self.done = {}
+        if os.path.exists(statefile):
+            fid = open(statefile, 'r')
+            try:
+                self.done = json.load(fid)
+            except ValueError:
+                logging.warning("Corrupt state file %s - starting empty" %
+                                statefile)
+            fid.close()
+
+    def warm_up(self):
+        '''
+        Loads the grids, masks, projection, regrid matrices and colour look-up
+        tables used by the themes.
+        '''
+        from pysenorge.grid import senorge_grid, interpolate_mask, _utm33
+        from pysenorge.io.png import load_clt
+        self.cache.mask()
+        if [t for t in self.themes
+            if [i for i in t.inputs if isinstance(i, UM4Input)]]:
+            _utm33()
+            senorge_grid(meshed=True)
+            interpolate_mask()
+            if self.schemes:
+                self.warm_up_regrid()
+        if self.formats[2]:
+            for theme in self.themes:
+                for o in theme.outputs:
+                    if o.cltfile is not None and os.path.exists(o.cltfile):
+                        load_clt(o.cltfile)
+
+    def warm_up_regrid(self):
+        '''
+        Builds the regrid matrices of *schemes* from the grids of the newest
+        sf00 and ml00 UM4 files - matrices stored by an earlier run are only
+        loaded.
+        '''
+        from pysenorge.io.nc import open_dataset
+        from pysenorge import regrid
+        newest = {}
+        for filename in self._find():
+            kind = os.path.basename(filename).split('_')[1]
+            if kind not in newest or nc_name(filename) > nc_name(newest[kind]):
+                newest[kind] = filename
+        for kind, filename in sorted(newest.items()):
+            try:
+                ds = open_dataset(filename, 'r')
+                rlon = ds.variables['rlon'][:]
+                rlat = ds.variables['rlat'][:]
+                ds.close()
+                regrid.warm_up(rlon, rlat, self.schemes)
+            except (ImportError, IOError, KeyError), e:
+                logging.warning("No regrid matrices for %s: %s" % (filename, e))
+            else:
+                logging.info("Regrid matrices of %s ready" % kind)
+        if len(newest) == 0:
+            logging.warning("No UM4 file to build the regrid matrices from")
+
+    def save_state(self):
+        tmpfile = self.statefile + '.tmp'
+        fid = open(tmpfile, 'w')
+        json.dump(self.done, fid, indent=0, sort_keys=True)
+        fid.close()
+        if os.path.exists(self.statefile):
+            os.remove(self.statefile) # os.rename does not overwrite on win32
+        os.rename(tmpfile, self.statefile)
+
+    def mark_existing(self):
+        '''
+        Records all UM4 files present now as processed, so that only files
+        arriving from now on are processed.
+        '''
+        for filename in self._find():
+            ncfile = nc_name(filename)
+            if ncfile not in self.done:
+                self.done[ncfile] = {'processed': None, 'failed': []}
+        self.save_state()
+
+    def _find(self):
+        now = datetime.now()
+        folders = set([os.path.join(netCDFin, str(now.year)),
+                       os.path.join(netCDFin, str((now-timedelta(days=1)).year))])
+        found = []
+        for folder in folders:
+            for pattern in PATTERNS:
+                found.extend(glob.glob(os.path.join(folder, pattern)))
+        return sorted(found)
+
+    def scan(self):
+        '''
+        Returns the new UM4 files whose size did not change since the
+        previous scan.
+        '''
+        ready = []
+        sizes = {}
+        for filename in self._find():
+            ncfile = nc_name(filename)
+            if ncfile in self.done or (filename != ncfile and
+                                       os.path.exists(ncfile)):
+                continue
+            try:
+                sizes[filename] = os.path.getsize(filename)
+            except OSError:
+                continue # removed meanwhile
+            if self.sizes.get(filename) == sizes[filename]:
+                ready.append(filename)
+        self.sizes = sizes
+        return ready
+
+    def pending(self):
+        '''
+        Returns the processed files with failed themes which have not reached
+        the retry limit.
+        '''
+        return sorted([f for f, state in self.done.items()
+                       if state.get('failed') and
+                       state.get('attempts', 1) <= self.retries and
+                       (os.path.exists(f) or os.path.exists(f+'.gz'))])
+
+    def affected(self, ncfile, cdt, names=None):
+        '''
+        Returns the themes using *ncfile* on date *cdt* - or the themes
+        *names* - followed by the themes depending on their outputs.
+        '''
+        ncfile = os.path.normpath(nc_name(ncfile))
+        selected = []
+        outputs = set()
+        for theme in self.themes: # ordered - producers come first
+            inputs = [nc_name(f) for f in theme.input_files(cdt)]
+            if names is None:
+                use = ncfile in inputs
+            else:
+                use = theme.name in names
+            if use or outputs.intersection(inputs):
+                selected.append(theme)
+                outputs.update(theme.output_files(cdt))
+        return selected
+
+    def process(self, filename):
+        '''
+        Runs all themes affected by the UM4 file *filename* or - if the file
+        was processed before - the themes which failed then.
+        '''
+        filename = nc_name(filename)
+        cdt = um4_date(filename)
+        names = None
+        attempts = 1
+        state = self.done.get(filename)
+        if state is not None and state.get('failed'):
+            names = state['failed']
+            attempts = state.get('attempts', 1) + 1
+        failed = []
+        for theme in self.affected(filename, cdt, names):
+            start_run(theme.name, cdt.date().isoformat())
+            try:
+                with stage('main'):
+                    theme.run(cdt, self.cache, *self.formats)
+                logging.info("%s %s written" % (theme.name, cdt.date()))
+            except ThemeError, e:
+                # e.g. an input produced by another chain is not there yet
+                logging.warning("%s %s skipped: %s" % (theme.name, cdt.date(), e))
+                failed.append(theme.name)
+            except Exception:
+                logging.error("%s %s failed:\n%s" % (theme.name, cdt.date(),
+                                                     traceback.format_exc()))
+                failed.append(theme.name)
+            finally:
+                finish_run()
+        self.done[filename] = {'processed': datetime.now().isoformat(),
+                               'failed': failed, 'attempts': attempts}
+        if failed and attempts > self.retries:
+            logging.error("%s: %s given up after %i attempts" %
+                          (filename, ", ".join(failed), attempts))
+        self.save_state()
+        self.cache.next_date()
+
+    def serve(self, interval=60, once=False):
+        '''
+        Polls for new files every *interval* seconds until interrupted.
+        '''
+        self.warm_up()
+        logging.info("Service started: %s" % ", ".join([t.name for t in self.themes]))
+        try:
+            while True:
+                retry = self.pending()
+                for filename in self.scan():
+                    logging.info("New file %s" % filename)
+                    self.process(filename)
+                for filename in retry:
+                    logging.info("Retrying %s: %s" %
+                                 (filename,
+                                  ", ".join(self.done[filename]['failed'])))
+                    self.process(filename)
+                if once:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        logging.info("Service stopped")
+
+
+def main():
+    usage = "usage: python run_service.py -t THEMES [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-t", "--themes",
+                      action="store", dest="themes", type="string",
+                      help="Comma separated list of theme names")
+    parser.add_option("-i", "--interval",
+                      action="store", dest="interval", type="int", default=60,
+                      help="Poll interval in seconds (default=60)")
+    parser.add_option("-r", "--retries",
+                      action="store", dest="retries", type="int", default=10,
+                      help="Number of polls at which failed themes are retried (default=10)")
+    parser.add_option("--once",
+                      action="store_true", dest="once", default=False,
+                      help="Poll twice (one interval apart) and exit")
+    parser.add_option("--backfill",
+                      action="store_true", dest="backfill", default=False,
+                      help="Process files present at the first start - by default only new files are processed")
+    parser.add_option("--schemes",
+                      action="store", dest="schemes", type="string",
+                      default=",".join(SCHEMES),
+                      help="Comma separated regrid schemes whose matrices are built at the start, empty for none (default=%s)" % ",".join(SCHEMES))
+    parser.add_option("--no-bil",
+                  action="store_false", dest="bil", default=True,
+                  help="Set to suppress output in BIL format")
+    parser.add_option("--nc",
+                  action="store_true", dest="nc", default=False,
+                  help="Set to store output in netCDF format")
+    parser.add_option("--png",
+                  action="store_true", dest="png", default=False,
+                  help="Set to store output as PNG image")
+
+    (options, args) = parser.parse_args()
+
+    if options.themes is None:
+        parser.error("Please provide the themes to run!")
+
+    LOG_FILENAME = os.path.join(LOGdir, 'run_service.log')
+    logging.basicConfig(filename=LOG_FILENAME, level=logging.INFO,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    names = [name.strip() for name in options.themes.split(',')]
+    schemes = [s.strip() for s in options.schemes.split(',') if s.strip()]
+    if [s for s in schemes if s not in SCHEMES]:
+        parser.error("Unknown regrid scheme in %s!" % options.schemes)
+    service = UM4Service(names, options.bil, options.nc, options.png,
+                         options.retries, schemes=schemes)
+    if not os.path.exists(service.statefile) and not options.backfill:
+        service.mark_existing()
+    if options.once:
+        # a file is ready when its size is unchanged between two scans
+        service.scan()
+        time.sleep(options.interval)
+    service.serve(options.interval, options.once)
+
+
+if __name__ == "__main__":
+    main()
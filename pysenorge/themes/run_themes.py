@@ -0,0 +1,171 @@
+__docformat__ = 'reStructuredText'
+'''
+Runs a set of registered themes (see *senorge_theme*) for every date in a
+period within one Python process.
+
+All themes share one *ThemeCache*: an input file is read once per date even
+if several themes use it, and the output of a theme (e.g. the average wind
+speed at 600 m) is handed directly to the themes depending on it. Themes are
+ordered so that producers run before their consumers. As in *run_period.py*
+products whose inputs, options and code are unchanged are skipped.
+
+With *--catalog* the input files are looked up in the catalog (see
+*tools/catalog.py*) instead of the file system: dates with missing inputs
+are reported as gaps without being run, and the outputs written are added
+to the catalog.
+
+Command line usage::
+
+    python run_themes.py START_DATE [END_DATE] -t wind_600m_daily,additional_snow_depth_wind [options]
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import sys
+import logging
+import traceback
+from datetime import timedelta, datetime
+from optparse import OptionParser
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
+
+# Own
+from pysenorge.set_environment import LOGdir
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.build_cache import BuildCache
+from pysenorge.tools.instrumentation import start_run, finish_run, stage
+from pysenorge.themes.senorge_theme import ThemeCache, ThemeError, \
+    get_theme, order_themes
+
+
+def runThemes(names, start_date, end_date, bil=True, nc=False, png=False,
+              force=False, cachefile=os.path.join(LOGdir, "build_cache.json"),
+              catalog=None):
+    """
+    Runs the themes *names* for all dates from *start_date* to *end_date*.
+
+    :Parameters:
+        - names: List of theme names, e.g. ["wind_600m_daily"]
+        - start_date, end_date: ISO date strings
+        - bil, nc, png: Output formats
+        - force: If *True* all dates are run regardless of the build cache
+        - cachefile: JSON file holding the build cache
+        - catalog: *Catalog* used to check the inputs and record the outputs
+
+    :Returns:
+        - List of (theme, date) tuples that failed
+    """
+    themes = order_themes([get_theme(name) for name in names])
+    cache = ThemeCache()
+    build_cache = BuildCache(cachefile)
+    params = "bil=%s nc=%s png=%s" % (bil, nc, png)
+    failed = []
+
+    cdt = iso2datetime(start_date+" 06:00:00")
+    end = iso2datetime(end_date+" 06:00:00")
+    while cdt <= end:
+        for theme in themes:
+            code = sys.modules[theme.__class__.__module__].__file__
+            code = os.path.splitext(code)[0] + '.py'
+            outputs = theme.output_files(cdt)
+            if catalog is not None:
+                missing = catalog.missing(theme.required_files(cdt))
+                # outputs of themes run before are not in the catalog yet
+                missing = [f for f in missing if not os.path.exists(f)]
+                if missing:
+                    print "%s %s: missing %s" % (theme.name, cdt.date(),
+                                                 ", ".join(missing))
+                    logging.error("%s %s: missing %s" %
+                                  (theme.name, cdt.date(), ", ".join(missing)))
+                    failed.append((theme.name, cdt.date().isoformat()))
+                    continue
+            sig = build_cache.signature(theme.input_files(cdt), params, code)
+            if not force and build_cache.is_current(outputs, sig):
+                logging.info("%s %s unchanged - skipped" %
+                             (theme.name, cdt.date()))
+                continue
+            start_run(theme.name, cdt.date().isoformat())
+            try:
+                try:
+                    with stage('main'):
+                        theme.run(cdt, cache, bil, nc, png)
+                except ThemeError, e:
+                    print "%s %s: %s" % (theme.name, cdt.date(), e)
+                    logging.error("%s %s: %s" % (theme.name, cdt.date(), e))
+                    failed.append((theme.name, cdt.date().isoformat()))
+                    continue
+                except Exception:
+                    traceback.print_exc()
+                    logging.error("%s %s failed:\n%s" %
+                                  (theme.name, cdt.date(),
+                                   traceback.format_exc()))
+                    failed.append((theme.name, cdt.date().isoformat()))
+                    continue
+            finally:
+                finish_run()
+            build_cache.update(outputs, sig)
+            build_cache.save()
+            if catalog is not None:
+                catalog.add(outputs)
+            logging.info("%s %s written" % (theme.name, cdt.date()))
+        cache.next_date()
+        cdt += timedelta(days=1)
+    return failed
+
+
+def main():
+    usage = "usage: python run_themes.py START_DATE [END_DATE] -t THEMES [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-t", "--themes",
+                      action="store", dest="themes", type="string",
+                      help="Comma separated list of theme names")
+    parser.add_option("--no-bil",
+                  action="store_false", dest="bil", default=True,
+                  help="Set to suppress output in BIL format")
+    parser.add_option("--nc",
+                  action="store_true", dest="nc", default=False,
+                  help="Set to store output in netCDF format")
+    parser.add_option("--png",
+                  action="store_true", dest="png", default=False,
+                  help="Set to store output as PNG image")
+    parser.add_option("-f", "--force",
+                  action="store_true", dest="force", default=False,
+                  help="Set to ignore the build cache")
+    parser.add_option("-c", "--catalog",
+                  action="store", dest="catalog", type="string",
+                  metavar="FILE", default=None,
+                  help="SQLite catalog used to plan the runs (see tools/catalog.py)")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) not in (1, 2):
+        parser.error("Please provide the date(s) in ISO format YYYY-MM-DD!")
+    if options.themes is None:
+        parser.error("Please provide the themes to run!")
+    start_date = args[0]
+    end_date = args[-1]
+
+    LOG_FILENAME = os.path.join(os.path.expanduser("~"), 'run_themes.log')
+    logging.basicConfig(filename=LOG_FILENAME,level=logging.INFO)
+    logging.info('Script started: %s' % datetime.now().isoformat())
+
+    names = [name.strip() for name in options.themes.split(',')]
+    catalog = None
+    if options.catalog is not None:
+        from pysenorge.tools.catalog import Catalog
+        catalog = Catalog(options.catalog)
+    failed = runThemes(names, start_date, end_date, options.bil, options.nc,
+                       options.png, options.force, catalog=catalog)
+
+    logging.info('Script finished: %s' % datetime.now().isoformat())
+    if len(failed) > 0:
+        print "Failed: %s" % ", ".join(["%s %s" % f for f in failed])
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -25,7 +25,7 @@ logging.info('Script started: %s' % datetime.datetime.now().isoformat())
 script = os.path.join(os.path.dirname(__file__), scriptname)
 os.system("python %s %s" % (script,
                                   (datetime.date.today()-dt).isoformat()))
-os.system("python %s %s" % (script, datetime.date.today().isoformat()))
-os.system("python %s %s -t [31,55]" % (script, datetime.date.today().isoformat()))
+# Today and tomorrow from a single read of the UM4 file
+os.system("python %s %s -t [[7,31],[31,55]]" % (script, datetime.date.today().isoformat()))
 
 logging.info('Script finished: %s' % datetime.datetime.now().isoformat())
\ No newline at end of file
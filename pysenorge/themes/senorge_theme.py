@@ -1,65 +1,615 @@
 # -*- coding:iso-8859-10 -*-
 __docformat__ = 'reStructuredText'
 '''
-Doc...
+Theme framework and plugin registry.
+
+A theme declares its inputs, its outputs and its model; loading, unit
+conversion, output paths, no-data handling and writing BIL/netCDF/PNG files
+are done here. Themes register themselves with *register()* and can then be
+run in-process for any set of dates by *run_themes.py*, which shares one
+*ThemeCache* between all themes and dates so that an input file (or an output
+of another theme) is read only once.
+
+File names are %-templates with the keys returned by *date_keys()*, e.g.
+"%(BILin)s/sd/%(hydroyear)s/sd_%(date)s.bil".
+
+Example::
+
+    class DepthHoarIndex2(seNorgeTheme):
+        name = 'depth_hoar_index_2'
+        inputs = [BILInput('tm', TM_TEMPLATE, scale=0.1, offset=-273.1),
+                  BILInput('sd', SD_TEMPLATE, scale=0.001)]
+        outputs = [Output('depth_hoar_index_2', unit='days')]
+
+        def model(self, tm, sd):
+            return {'depth_hoar_index_2': model(tm, sd, None)}
+
+    register(DepthHoarIndex2)
 
 :Author: kmu
 :Created: 31. mars 2011
 '''
 # Built-in
+import os
+from datetime import timedelta
 
 # Additional
+from numpy import float32, flipud, isnan, nan, uint8, int8, int16, uint16
 
 # Own
+from pysenorge.set_environment import METdir, PROGdir, BILin, BILout, \
+    netCDFin, timeunit
+from pysenorge.tools.date_converters import datetime2BILdate, get_hydroyear
+from pysenorge.converters import get_FillValue
+from pysenorge.tools.instrumentation import stage, timed, add_bytes
+from pysenorge.tools.tiling import run_tiled
+from pysenorge.tools.time_windows import span, window_slices, window_date, \
+    step_date
+
+# Registered themes by name
+THEMES = {}
+
+# BIL data-types by name
+DATATYPES = {'uint8': uint8, 'int8': int8, 'uint16': uint16, 'int16': int16,
+             'float32': float32}
+
+
+class ThemeError(Exception):
+    '''
+    Raised if a theme can not be run, e.g. because an input is missing.
+    '''
+    pass
+
+
+def date_keys(cdt):
+    '''
+    Returns the keys available in file name templates for the date *cdt*.
+    '''
+    ydt = cdt - timedelta(days=1)
+    return {'METdir': METdir, 'PROGdir': PROGdir, 'BILin': BILin,
+            'BILout': BILout, 'netCDFin': netCDFin,
+            'year': cdt.year, 'hydroyear': get_hydroyear(cdt),
+            'yhydroyear': get_hydroyear(ydt),
+            'date': datetime2BILdate(cdt), 'yesterday': datetime2BILdate(ydt)}
+
+
+class ThemeCache(object):
+    '''
+    Holds loaded inputs, written outputs and the seNorge mask between theme
+    runs.
+
+    Entries not used during the previous and the current date are dropped by
+    *next_date()*, so the memory use stays bounded over long periods while
+    e.g. yesterday's output of a theme is still available as today's input.
+    '''
+
+    def __init__(self):
+        self.entries = {}
+        self.used = set()
+        self.previous = set()
+        self._mask = None
+
+    def get(self, key, loader):
+        '''
+        Returns the entry *key*, calling *loader()* to create it if necessary.
+        '''
+        if key not in self.entries:
+            self.entries[key] = loader()
+        self.used.add(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.used.add(key)
+
+    def next_date(self):
+        '''
+        Evicts entries not used since the previous call.
+        '''
+        keep = self.used | self.previous
+        for key in self.entries.keys():
+            if key not in keep:
+                del self.entries[key]
+        self.previous = self.used
+        self.used = set()
+
+    def mask(self):
+        '''
+        Returns the seNorge no-data mask (*True* outside Norway).
+        '''
+        if self._mask is None:
+            from pysenorge.grid import senorge_mask
+            self._mask = senorge_mask()
+        return self._mask
+
+
+class BILInput(object):
+    '''
+    A seNorge grid read from a BIL file.
+
+    The values are converted to *dtype* and scaled to physical units by
+    *value = raw * scale + offset*. If *dtype* is *None* the raw data is used.
+    '''
+
+    def __init__(self, name, template, datatype='uint16', dtype=float32,
+                 scale=1.0, offset=0.0, fallback=None, optional=False):
+        '''
+        :Parameters:
+            - name: Argument name of the input in *seNorgeTheme.model()*
+            - template: File name template
+            - datatype: Data-type of the BIL file
+            - dtype: Data-type handed to the model or *None*
+            - scale, offset: Conversion to physical units
+            - fallback: Template used if *template* does not exist
+            - optional: If *True* a missing file gives an array of zeros
+                (e.g. yesterday's value of the theme itself)
+        '''
+        self.name = name
+        self.template = template
+        self.datatype = datatype
+        self.dtype = dtype
+        self.scale = scale
+        self.offset = offset
+        self.fallback = fallback
+        self.optional = optional
+
+    def filename(self, keys):
+        filename = os.path.normpath(self.template % keys)
+        if self.fallback is not None and not os.path.exists(filename):
+            fallback = os.path.normpath(self.fallback % keys)
+            if os.path.exists(fallback):
+                print "Warning: %s not found - using %s instead!" % \
+                    (filename, fallback)
+                return fallback
+        return filename
+
+    def load(self, keys, cache):
+        filename = self.filename(keys)
+
+        def loader():
+            from pysenorge.io.bil import BILdata
+            bil = BILdata(filename, self.datatype)
+            if os.path.exists(filename):
+                bil.read()
+            elif not self.optional:
+                raise ThemeError("Input file %s does not exist!" % filename)
+            else:
+                print "%s does not exist - using zeros!" % filename
+            return bil.data
+
+        # Always convert a copy - the models may change their input in place
+        raw = cache.get(('bil', filename, self.datatype), loader)
+        if self.dtype is None:
+            return raw.copy()
+        data = raw.astype(self.dtype)
+        if self.scale != 1.0:
+            data *= self.scale
+        if self.offset != 0.0:
+            data += self.offset
+        return data
+
+
+class UM4Input(object):
+    '''
+    Variables of a UM4 prognosis (netCDF) file.
+
+    The input is handed to the model as dictionary containing the variables
+    and "time", "rlon" and "rlat". If only the gzipped file (*.nc.gz*)
+    exists it is read without unzipping it to disk.
+    '''
+
+    def __init__(self, name, template, variables, timerange=(7, 31)):
+        '''
+        :Parameters:
+            - name: Argument name of the input in *seNorgeTheme.model()*
+            - template: File name template
+            - variables: Names of the (time, rlat, rlon) variables to read
+            - timerange: (first, last+1) time index or *None* for all
+        '''
+        self.name = name
+        self.template = template
+        self.variables = variables
+        self.timerange = timerange
+
+    def filename(self, keys):
+        filename = os.path.normpath(self.template % keys)
+        if not os.path.exists(filename) and os.path.exists(filename+'.gz'):
+            return filename+'.gz'
+        return filename
+
+    def load(self, keys, cache):
+        filename = self.filename(keys)
+        if not os.path.exists(filename):
+            raise ThemeError("Input file %s does not exist!" % filename)
+        if self.timerange is None:
+            tslice = slice(None)
+        else:
+            tslice = slice(self.timerange[0], self.timerange[1])
+
+        data = {}
+        missing = [var for var in ['time', 'rlon', 'rlat'] + self.variables
+                   if ('um4', filename, var, str(self.timerange)) not in
+                   cache.entries]
+        if len(missing) > 0:
+            # read all missing variables with one open
+            from pysenorge.io.nc import open_dataset
+            with stage('read_um4'):
+                ds = open_dataset(filename, 'r')
+                for var in missing:
+                    if var in ('rlon', 'rlat'):
+                        value = ds.variables[var][:]
+                    else:
+                        value = ds.variables[var][tslice]
+                    add_bytes(read=value.nbytes)
+                    cache.put(('um4', filename, var, str(self.timerange)),
+                              value)
+                ds.close()
+        for var in ['time', 'rlon', 'rlat'] + self.variables:
+            data[var] = cache.get(('um4', filename, var, str(self.timerange)),
+                                  None)
+        return data
+
+
+class Output(object):
+    '''
+    A seNorge grid written by a theme.
+
+    The physical values returned by the model are stored as
+    *raw = (value - offset) / scale* in *datatype*. NaN values and cells
+    outside Norway are set to the no-data value. The BIL file is written
+    to *BILout/<name>/<hydroyear>/<name>_<date>.bil*, netCDF and PNG files next
+    to it.
+    '''
+
+    def __init__(self, name, datatype='uint16', scale=1.0, offset=0.0,
+                 unit='', long_name='', cltfile=None, southup=False):
+        '''
+        :Parameters:
+            - name: Output name - also the name of the theme folder
+            - datatype: Data-type of the BIL file
+            - scale, offset: Conversion from physical units
+            - unit: Unit of the netCDF variable
+            - long_name: Description of the netCDF variable
+            - cltfile: Colour look-up table for the PNG image
+            - southup: *True* if the model returns the grid with the first row
+                in the south (as *grid.interpolate*)
+        '''
+        self.name = name
+        self.datatype = datatype
+        self.scale = scale
+        self.offset = offset
+        self.unit = unit
+        self.long_name = long_name
+        self.cltfile = cltfile
+        self.southup = southup
+        self.template = "%%(BILout)s/%s/%%(hydroyear)s/%s_%%(date)s.bil" % \
+            (name, name)
+
+    def filename(self, keys):
+        return os.path.normpath(self.template % keys)
+
+    def convert(self, data, mask):
+        '''
+        Converts the model result to the BIL representation.
+        '''
+        dt = DATATYPES[self.datatype]
+        if self.southup:
+            data = flipud(data)
+        if data.dtype != dt or self.scale != 1.0 or self.offset != 0.0:
+            data = float32(data)
+            if self.offset != 0.0:
+                data -= self.offset
+            if self.scale != 1.0:
+                data *= 1.0 / self.scale
+            nodata = isnan(data)
+            data = data.astype(dt)
+            data[nodata] = get_FillValue(dt)
+        data[mask] = get_FillValue(dt)
+        return data
+
+    def physical(self, raw):
+        '''
+        Converts the BIL representation back to physical units with NaN as
+        no-data, e.g. for the colour look-up tables of the PNG images.
+        '''
+        data = float32(raw)
+        if self.scale != 1.0:
+            data *= self.scale
+        if self.offset != 0.0:
+            data += self.offset
+        data[raw == get_FillValue(raw.dtype.type)] = nan
+        return data
+
+    def write(self, raw, cdt, keys, bil=True, nc=False, png=False):
+        filename = self.filename(keys)
+        outdir = os.path.dirname(filename)
+        if not os.path.exists(outdir):
+            os.makedirs(outdir)
+        basename = os.path.splitext(filename)[0]
+
+        if bil:
+            from pysenorge.io.bil import BILdata
+            bilfile = BILdata(filename, self.datatype)
+            print bilfile.write(raw)
+
+        if nc:
+            from netCDF4 import date2num
+            from pysenorge.io.nc import NCdata
+            ncfile = NCdata(basename+'.nc')
+            ncfile.zip = True
+            ncfile.new(date2num(cdt, timeunit))
+            ncdata = flipud(raw)
+            ncfile.add_variable(self.name, ncdata.dtype.str, self.unit,
+                                self.long_name, ncdata)
+            ncfile.close()
+
+        if png:
+            from pysenorge.io.png import writePNG
+            writePNG(flipud(self.physical(raw)), basename,
+                     cltfile=self.cltfile)
+
 
 class seNorgeTheme(object):
     '''
     The abstract class for seNorge themes.
+
+    Subclasses set *name*, *inputs* and *outputs* and implement *model()*.
+    Themes whose model works cell by cell set *tiled* to run it on tiles of
+    the grid in parallel (see *pysenorge.tools.tiling*).
     '''
 
+    name = None
+    inputs = []
+    outputs = []
+    tiled = False
+
     def __init__(self):
         '''
         Constructor
         '''
-        
-    def model(self):
+        self.cache = ThemeCache()
+
+    def model(self, **inputs):
         '''
         The numerical model that generates the theme.
+
+        :Parameters:
+            - inputs: The loaded inputs by name
+
+        :Returns:
+            - Dictionary with the physical values of each output by name
         '''
-        pass
-    
-    def setup(self):
+        raise NotImplementedError
+
+    def setup(self, cdt):
         '''
         Method that setup input and output for the model.
+
+        :Returns:
+            - The file name template keys for the date *cdt*
         '''
-        pass
-    
-    def getInput(self):
-        pass
-    
-    def setOutput(self):
-        pass
-    
+        return date_keys(cdt)
+
+    def input_files(self, cdt):
+        keys = self.setup(cdt)
+        return [i.filename(keys) for i in self.inputs]
+
+    def required_files(self, cdt):
+        '''
+        Returns the input files which must exist, i.e. without the optional
+        inputs.
+        '''
+        keys = self.setup(cdt)
+        return [i.filename(keys) for i in self.inputs
+                if not getattr(i, 'optional', False)]
+
+    def output_files(self, cdt):
+        keys = self.setup(cdt)
+        return [o.filename(keys) for o in self.outputs]
+
+    def getInput(self, cdt, cache=None):
+        '''
+        Loads all inputs for the date *cdt*.
+        '''
+        if cache is None:
+            cache = self.cache
+        keys = self.setup(cdt)
+        data = {}
+        for i in self.inputs:
+            data[i.name] = i.load(keys, cache)
+        return data
+
+    def setOutput(self, cdt, results, cache=None, bil=True, nc=False,
+                  png=False):
+        '''
+        Converts and writes the model results. The BIL representation of each
+        output is kept in *cache* as input for other themes.
+        '''
+        if cache is None:
+            cache = self.cache
+        keys = self.setup(cdt)
+        mask = cache.mask()
+        for o in self.outputs:
+            raw = o.convert(results[o.name], mask)
+            o.write(raw, cdt, keys, bil, nc, png)
+            cache.put(('bil', o.filename(keys), o.datatype), raw)
+
+    def run(self, cdt, cache=None, bil=True, nc=False, png=False):
+        '''
+        Generates the theme for the date *cdt*.
+        '''
+        if cache is None:
+            cache = self.cache
+        inputs = self.getInput(cdt, cache)
+        if self.tiled:
+            results = timed('model')(run_tiled)(self.model, **inputs)
+        else:
+            results = timed('model')(self.model)(**inputs)
+        self.setOutput(cdt, results, cache, bil, nc, png)
+
     def makeCLT(self):
         '''
         Method that generates the color-lookup-table (clt) for the theme
         '''
         pass
-    
+
     def view(self):
         '''
         Method for plotting the theme based on the CLT settings.
         '''
         pass
-    
-    def runPeriod(self):
+
+    def runPeriod(self, start_date, end_date, **kwargs):
         '''
         Method for generating the theme over a given time period.
+
+        :Parameters:
+            - start_date, end_date: *datetime* objects
+            - kwargs: Passed to *run()*
         '''
-        pass
-    
-    def runDaily(self):
+        cdt = start_date
+        while cdt <= end_date:
+            self.run(cdt, **kwargs)
+            self.cache.next_date()
+            cdt += timedelta(days=1)
+
+    def runDaily(self, **kwargs):
         '''
         Method that generates the theme on a daily basis.
         '''
-        pass
\ No newline at end of file
+        from datetime import datetime
+        today = datetime.now().replace(hour=6, minute=0, second=0,
+                                       microsecond=0)
+        self.runPeriod(today-timedelta(days=1), today, **kwargs)
+
+
+
+class UM4WindowTheme(seNorgeTheme):
+    '''
+    A theme computed from a time window of one UM4 prognosis file, e.g. the
+    wind themes.
+
+    Subclasses set *template*, *variables*, the default *timerange* and the
+    *timestep* of the prognosis; the input is handed to *model()* as "um4".
+    The outputs are dated by the UM4 time value of the last step of the
+    window (see *time_windows.step_date*). Without the data, e.g. for
+    *output_files()*, the date is derived from the time step (see
+    *time_windows.window_date*).
+    '''
+
+    template = None
+    variables = []
+    timerange = (7, 31)
+    # Hours between the time steps of the prognosis file
+    timestep = 1
+
+    def __init__(self, timerange=None):
+        '''
+        :Parameters:
+            - timerange: (first, last+1) time index - default: *timerange*
+                of the class
+        '''
+        seNorgeTheme.__init__(self)
+        if timerange is not None:
+            self.timerange = timerange
+        self.inputs = [UM4Input('um4', self.template, self.variables,
+                                self.timerange)]
+        # date of the last step of the window being written
+        self.stepdate = None
+
+    def setup(self, cdt):
+        keys = date_keys(cdt)
+        if self.stepdate is not None:
+            keys['date'] = datetime2BILdate(self.stepdate)
+        else:
+            keys['date'] = datetime2BILdate(window_date(cdt, self.timerange,
+                                                        type(self).timerange,
+                                                        self.timestep))
+        return keys
+
+    def run(self, cdt, cache=None, bil=True, nc=False, png=False):
+        self.runWindows(cdt, [self.timerange], bil, nc, png, cache)
+
+    def runWindows(self, cdt, windows, bil=True, nc=False, png=False,
+                   cache=None):
+        '''
+        Generates the theme for each of the time *windows* (see
+        *time_windows.parse_timerange*) of the prognosis for the date *cdt*,
+        reading the prognosis once.
+        '''
+        if cache is None:
+            cache = self.cache
+        reader = UM4Input('um4', self.template, self.variables, span(windows))
+        um4 = reader.load(self.setup(cdt), cache)
+        default = self.timerange
+        try:
+            for window, tslice in zip(windows, window_slices(windows)):
+                self.timerange = window
+                data = dict(um4)
+                for var in ['time'] + self.variables:
+                    data[var] = um4[var][tslice]
+                results = timed('model')(self.model)(um4=data)
+                self.stepdate = step_date(cdt, data['time'][-1])
+                self.setOutput(cdt, results, cache, bil, nc, png)
+                self.stepdate = None
+        finally:
+            self.timerange = default
+            self.stepdate = None
+
+
+def register(cls):
+    '''
+    Registers the theme class *cls* under *cls.name*. Can be used as class
+    decorator.
+    '''
+    THEMES[cls.name] = cls
+    return cls
+
+
+def get_theme(name):
+    '''
+    Returns an instance of the registered theme *name*. Themes are defined in
+    the module *pysenorge.themes.<name>*, which is imported if necessary.
+    '''
+    if name not in THEMES:
+        # some themes locate "set_pysenorge_path.py" relative to the
+        # current directory
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            __import__('pysenorge.themes.%s' % name)
+        finally:
+            os.chdir(cwd)
+    if name not in THEMES:
+        raise ThemeError("Theme %s is not registered!" % name)
+    return THEMES[name]()
+
+
+def order_themes(themes):
+    '''
+    Sorts *themes* so that a theme using the output of another theme (of the
+    same date) runs after it.
+    '''
+    produced = {}
+    for theme in themes:
+        for o in theme.outputs:
+            produced[o.template] = theme
+    ordered = []
+    visiting = set()
+
+    def visit(theme):
+        if theme in ordered:
+            return
+        if theme in visiting:
+            raise ThemeError("Circular dependency involving %s" % theme.name)
+        visiting.add(theme)
+        for i in theme.inputs:
+            producer = produced.get(i.template)
+            if producer is not None and producer is not theme:
+                visit(producer)
+        visiting.remove(theme)
+        ordered.append(theme)
+
+    for theme in themes:
+        visit(theme)
+    return ordered
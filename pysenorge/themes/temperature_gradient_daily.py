@@ -39,17 +39,16 @@ execfile("set_pysenorge_path.py")
 
 # Additional
 from numpy import flipud, arange, int16, float32
-try: # for future purpose
-    from netCDF4 import date2num #@UnusedImport
-except ImportError:
-    pass # Error message will be delivered by IO module!
 # Own
 from pysenorge.set_environment import METdir, BILout, IntFillValue #@UnresolvedImport
 from pysenorge.io.bil import BILdata #@UnresolvedImport
 from pysenorge.tools.date_converters import get_date_filename #@UnresolvedImport
 from pysenorge.converters import int2float, date2epoch #@UnresolvedImport
 from pysenorge.grid import senorge_mask #@UnresolvedImport
+from pysenorge.tools.instrumentation import instrumented_main, timed, \
+    set_run_date
 
+@timed('model')
 def model(tm_today, tm_yesterday):
     """
     Main algorithm that produces the theme.
@@ -64,6 +63,7 @@ def model(tm_today, tm_yesterday):
     return tm_today - tm_yesterday
 
 
+@instrumented_main('temperature_gradient_daily')
 def main():
     '''
     Loads and verifies input data, calls the model, and controls the output stream. 
@@ -95,6 +95,7 @@ def main():
     (options, args) = parser.parse_args()
     
     yy, mm, dd = get_date_filename(args[0])
+    set_run_date("%s-%s-%s" % (yy, mm, dd))
     yy_range = arange(1950, 2050)
     
     # Verify input parameters
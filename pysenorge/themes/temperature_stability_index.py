@@ -21,9 +21,12 @@ from pysenorge.set_environment import METdir, BILout, netCDFout, IntFillValue, U
 from pysenorge.io.bil import BILdata
 from pysenorge.tools.get_date_filename import get_date_filename
 from pysenorge.grid import senorge_mask
+from pysenorge.tools.instrumentation import instrumented_main, timed, \
+    set_run_date
 
 
 
+@timed('model')
 def model(tm, tmgr, nodata_mask):
     '''
     Main algorithm that produces the theme.
@@ -66,6 +69,7 @@ def model(tm, tmgr, nodata_mask):
             
 
 
+@instrumented_main('temperature_stability_index')
 def main():
     '''
     Loads and verifies input data, calls the model, and controls the output stream. 
@@ -97,6 +101,7 @@ def main():
         parser.error("Please provide two input files!")
     else:
         yy, mm, dd = get_date_filename(args[0])
+        set_run_date("%s-%s-%s" % (yy, mm, dd))
         yy_range = arange(1950, 2050)
         if int(yy) not in yy_range:
             parser.error("Could not determine year from file name.")
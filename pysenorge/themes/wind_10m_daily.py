@@ -44,14 +44,6 @@ from datetime import timedelta
 from optparse import OptionParser
 
 # Additional
-try:
-    from netCDF4 import Dataset
-except ImportError:
-    try:
-        from Scientific.IO.NetCDF import NetCDFFile as Dataset
-    except ImportError:
-        print '''WARNING: Can not find module "netCDF4" or "Scientific.IO.NetCDF"!
-        Please install for netCDF file support.'''
 from numpy import sqrt, mean, flipud, zeros_like, arctan2, zeros, uint16
 
 execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
@@ -59,13 +51,19 @@ execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))
 from pysenorge.set_environment import netCDFin, BILout, FloatFillValue, \
                                       UintFillValue
 from pysenorge.io.bil import BILdata
-from pysenorge.io.nc import NCdata
+from pysenorge.io.nc import NCdata, open_dataset
 from pysenorge.io.png import writePNG
 from pysenorge.tools.date_converters import iso2datetime, datetime2BILdate, get_hydroyear
 from pysenorge.converters import nan2fill
 from pysenorge.grid import interpolate
 from pysenorge.functions.lamberts_formula import LambertsFormula
+from pysenorge.tools.instrumentation import instrumented_main, timed, stage, \
+    add_bytes, set_run_date
+from pysenorge.tools.time_windows import parse_timerange, span, window_slices
+from pysenorge.themes.senorge_theme import seNorgeTheme, UM4Input, Output, \
+    register
 
+@timed('model')
 def model(x_wind, y_wind):
     """
     Calculates avg. and max. wind speed and prevailing wind direction from the
@@ -130,6 +128,7 @@ def model(x_wind, y_wind):
 
 
 
+@instrumented_main('wind_10m_daily')
 def main():
     """
     Loads and verifies input data, calls the model, and controls the output stream. 
@@ -149,7 +148,7 @@ def main():
     parser.add_option("-t", "--timerange", 
                       action="store", dest="timerange", type="string",
                       default="[7,31]",
-                      help='''Time-range as "[6,30]"''')
+                      help='''Time-range as "[6,30]" or several as "[[6,30],[30,54]]"''')
     parser.add_option("--no-bil",
                   action="store_false", dest="bil", default=True,
                   help="Set to suppress output in BIL format")
@@ -172,6 +171,7 @@ def main():
     
     # get current datetime
     cdt = iso2datetime(args[0]+" 06:00:00")
+    set_run_date(cdt.date().isoformat())
     ncfilename = "UM4_sf00_%s.nc" % datetime2BILdate(cdt-timedelta(days=1))
     if len(args) != 1:
         parser.error("Please provide an input file!")
@@ -179,149 +179,160 @@ def main():
         # Add full path to the filename
         ncfile = os.path.join(netCDFin, str(cdt.year), ncfilename)
     
-    timerange = eval(options.timerange)
-    print 'Time-range', timerange
+    windows = parse_timerange(options.timerange)
+    timerange = span(windows)
+    print 'Time-range', windows
     if not os.path.exists(ncfile):
         parser.error("%s does not exist!" % ncfile)
     else:
-        if timerange == None:
-            # Load wind data from prognosis (netCDF file) for entire time-range
-            ds = Dataset(ncfile, 'r')
-            wind_time = ds.variables['time'][:]
-            x_wind = ds.variables['x_wind'][:,:,:]
-            y_wind = ds.variables['y_wind'][:,:,:]
-            rlon = ds.variables['rlon'][:]
-            rlat = ds.variables['rlat'][:]
-            ds.close()
-        else:
-            # Load wind data from prognosis (netCDF file) for selected time-range
-            ds = Dataset(ncfile, 'r')
-            wind_time = ds.variables['time'][timerange[0]:timerange[1]]
-            x_wind = ds.variables['x_wind'][timerange[0]:timerange[1],:,:]
-            y_wind = ds.variables['y_wind'][timerange[0]:timerange[1],:,:]
-            rlon = ds.variables['rlon'][:]
-            rlat = ds.variables['rlat'][:]
-            ds.close()
+        with stage('read_um4'):
+            if timerange == None:
+                # Load wind data from prognosis (netCDF file) for entire time-range
+                ds = open_dataset(ncfile, 'r')
+                wind_time = ds.variables['time'][:]
+                x_wind = ds.variables['x_wind'][:,:,:]
+                y_wind = ds.variables['y_wind'][:,:,:]
+                rlon = ds.variables['rlon'][:]
+                rlat = ds.variables['rlat'][:]
+                ds.close()
+            else:
+                # Load wind data from prognosis (netCDF file) for selected time-range
+                ds = open_dataset(ncfile, 'r')
+                wind_time = ds.variables['time'][timerange[0]:timerange[1]]
+                x_wind = ds.variables['x_wind'][timerange[0]:timerange[1],:,:]
+                y_wind = ds.variables['y_wind'][timerange[0]:timerange[1],:,:]
+                rlon = ds.variables['rlon'][:]
+                rlat = ds.variables['rlat'][:]
+                ds.close()
+            add_bytes(read=sum([a.nbytes for a in (wind_time, x_wind, y_wind,
+                                                   rlon, rlat)]))
     
 #    from netCDF4 import num2date
 #    for t in wind_time:
 #        print num2date(t, "seconds since 1970-01-01 00:00:00 +00:00")
     
-    print "Using input data from file %s" % ncfilename
-    
-    # Setup outputs
-    _tstart = time.gmtime(wind_time[0])
-    tstruct = time.gmtime(wind_time[-1]) # or -1 if it should be the average until that date
-    print "For the period %s-%s-%s:%s - %s-%s-%s:%s" % (str(_tstart.tm_year).zfill(4),
-                               str(_tstart.tm_mon).zfill(2),
-                               str(_tstart.tm_mday).zfill(2),
-                               str(_tstart.tm_hour).zfill(2),
-                               str(tstruct.tm_year).zfill(4),
-                               str(tstruct.tm_mon).zfill(2),
-                               str(tstruct.tm_mday).zfill(2),
-                               str(tstruct.tm_hour).zfill(2))
-    outfile1 = '%s_%s_%s_%s' % (themedir1, str(tstruct.tm_year).zfill(4),
-                               str(tstruct.tm_mon).zfill(2),
-                               str(tstruct.tm_mday).zfill(2))
-    outfile2 = '%s_%s_%s_%s' % (themedir2, str(tstruct.tm_year).zfill(4),
-                               str(tstruct.tm_mon).zfill(2),
-                               str(tstruct.tm_mday).zfill(2))
-    
-    outdir1 = os.path.join(BILout, themedir1, str(get_hydroyear(cdt)))
-    if not os.path.exists(outdir1):
-        if not os.path.exists(os.path.join(BILout, themedir1)):
-            os.chdir(BILout)
-            os.system('mkdir %s' % themedir1)
-        os.chdir(os.path.join(BILout, themedir1))
-        os.system('mkdir %s' % str(get_hydroyear(cdt)))
+    # One product per time window - all computed from the single read
+    all_wind_time, all_x_wind, all_y_wind = wind_time, x_wind, y_wind
+    for tslice in window_slices(windows):
+        wind_time = all_wind_time[tslice]
+        x_wind = all_x_wind[tslice]
+        y_wind = all_y_wind[tslice]
+        
+        print "Using input data from file %s" % ncfilename
+    
+        # Setup outputs
+        _tstart = time.gmtime(wind_time[0])
+        tstruct = time.gmtime(wind_time[-1]) # or -1 if it should be the average until that date
+        print "For the period %s-%s-%s:%s - %s-%s-%s:%s" % (str(_tstart.tm_year).zfill(4),
+                                   str(_tstart.tm_mon).zfill(2),
+                                   str(_tstart.tm_mday).zfill(2),
+                                   str(_tstart.tm_hour).zfill(2),
+                                   str(tstruct.tm_year).zfill(4),
+                                   str(tstruct.tm_mon).zfill(2),
+                                   str(tstruct.tm_mday).zfill(2),
+                                   str(tstruct.tm_hour).zfill(2))
+        outfile1 = '%s_%s_%s_%s' % (themedir1, str(tstruct.tm_year).zfill(4),
+                                   str(tstruct.tm_mon).zfill(2),
+                                   str(tstruct.tm_mday).zfill(2))
+        outfile2 = '%s_%s_%s_%s' % (themedir2, str(tstruct.tm_year).zfill(4),
+                                   str(tstruct.tm_mon).zfill(2),
+                                   str(tstruct.tm_mday).zfill(2))
+    
+        outdir1 = os.path.join(BILout, themedir1, str(get_hydroyear(cdt)))
+        if not os.path.exists(outdir1):
+            if not os.path.exists(os.path.join(BILout, themedir1)):
+                os.chdir(BILout)
+                os.system('mkdir %s' % themedir1)
+            os.chdir(os.path.join(BILout, themedir1))
+            os.system('mkdir %s' % str(get_hydroyear(cdt)))
 
-    outdir2 = os.path.join(BILout, themedir2, str(get_hydroyear(cdt)))
-    if not os.path.exists(outdir2):
-        if not os.path.exists(os.path.join(BILout, themedir2)):
-            os.chdir(BILout)
-            os.system('mkdir %s' % themedir2)
-        os.chdir(os.path.join(BILout, themedir2))
-        os.system('mkdir %s' % str(get_hydroyear(cdt)))
+        outdir2 = os.path.join(BILout, themedir2, str(get_hydroyear(cdt)))
+        if not os.path.exists(outdir2):
+            if not os.path.exists(os.path.join(BILout, themedir2)):
+                os.chdir(BILout)
+                os.system('mkdir %s' % themedir2)
+            os.chdir(os.path.join(BILout, themedir2))
+            os.system('mkdir %s' % str(get_hydroyear(cdt)))
 
-    # Calculate the wind speed vector - using model()
-    total_wind_avg, max_wind, wind_dir = model(x_wind, y_wind)
+        # Calculate the wind speed vector - using model()
+        total_wind_avg, max_wind, wind_dir = model(x_wind, y_wind)
     
-    # interpolate total average wind speed to seNorge grid
-    total_wind_avg_intp = interpolate(rlon, rlat, total_wind_avg)
-    max_wind_intp = interpolate(rlon, rlat, max_wind)
-    wind_dir_intp = interpolate(rlon, rlat, wind_dir)
+        # interpolate total average wind speed to seNorge grid
+        total_wind_avg_intp = interpolate(rlon, rlat, total_wind_avg)
+        max_wind_intp = interpolate(rlon, rlat, max_wind)
+        wind_dir_intp = interpolate(rlon, rlat, wind_dir)
     
     
-    # Replace NaN values with the appropriate FillValue
-    total_wind_avg_intp = nan2fill(total_wind_avg_intp)
-    max_wind_intp = nan2fill(max_wind_intp)
-    wind_dir_intp = nan2fill(wind_dir_intp)
+        # Replace NaN values with the appropriate FillValue
+        total_wind_avg_intp = nan2fill(total_wind_avg_intp)
+        max_wind_intp = nan2fill(max_wind_intp)
+        wind_dir_intp = nan2fill(wind_dir_intp)
     
-    if options.bil:
-        from pysenorge.grid import senorge_mask
+        if options.bil:
+            from pysenorge.grid import senorge_mask
         
-        mask = senorge_mask()
+            mask = senorge_mask()
         
-        # Write to BIL file
+            # Write to BIL file
         
-        # avg wind
-        bil_avg_wind = flipud(uint16(total_wind_avg_intp*10.0))
-        bil_avg_wind[mask] = UintFillValue
+            # avg wind
+            bil_avg_wind = flipud(uint16(total_wind_avg_intp*10.0))
+            bil_avg_wind[mask] = UintFillValue
         
-        bilfile = BILdata(os.path.join(outdir1,
-                          outfile1+'.bil'),
-                          datatype='uint16')
-        biltext = bilfile.write(bil_avg_wind.flatten()) # collapsed into one dimension
-        print biltext
+            bilfile = BILdata(os.path.join(outdir1,
+                              outfile1+'.bil'),
+                              datatype='uint16')
+            biltext = bilfile.write(bil_avg_wind.flatten()) # collapsed into one dimension
+            print biltext
         
-        #  max wind
-        bil_max_wind = flipud(uint16(max_wind_intp*10.0))
-        bil_max_wind[mask] = UintFillValue
-        bilfile = BILdata(os.path.join(outdir2,
-                          outfile2+'.bil'),
-                          datatype='uint16')
-        biltext = bilfile.write(bil_max_wind.flatten())
-        print biltext
+            #  max wind
+            bil_max_wind = flipud(uint16(max_wind_intp*10.0))
+            bil_max_wind[mask] = UintFillValue
+            bilfile = BILdata(os.path.join(outdir2,
+                              outfile2+'.bil'),
+                              datatype='uint16')
+            biltext = bilfile.write(bil_max_wind.flatten())
+            print biltext
         
-#        # wind direction
-#        bil_dir_wind = flipud(uint16(wind_dir_intp))
-#        bil_dir_wind[mask] = UintFillValue
-#        bilfile = BILdata(os.path.join(outdir,
-##                          'wind_direction_10m'+'_'+dtstr+'.bil'),
-#                          outfile+'.bil'),
-#                          datatype='uint16')
-#        biltext = bilfile.write(bil_dir_wind.flatten())
-#        print biltext
-    
-    if options.nc:
-        # Write to NC file
-        ncfile = NCdata(os.path.join(outdir1, outfile1+'.nc'))
-#        ncfile.rootgrp.info = themename
-        ncfile.new(wind_time[-1])
+    #        # wind direction
+    #        bil_dir_wind = flipud(uint16(wind_dir_intp))
+    #        bil_dir_wind[mask] = UintFillValue
+    #        bilfile = BILdata(os.path.join(outdir,
+    ##                          'wind_direction_10m'+'_'+dtstr+'.bil'),
+    #                          outfile+'.bil'),
+    #                          datatype='uint16')
+    #        biltext = bilfile.write(bil_dir_wind.flatten())
+    #        print biltext
+    
+        if options.nc:
+            # Write to NC file
+            ncfile = NCdata(os.path.join(outdir1, outfile1+'.nc'))
+    #        ncfile.rootgrp.info = themename
+            ncfile.new(wind_time[-1])
         
-        ncfile.add_variable('avg_wind_speed', total_wind_avg.dtype.str, "m s-1",
-                            'Average wind speed last 24h', total_wind_avg_intp)
-        ncfile.add_variable('max_wind_speed', max_wind.dtype.str, "m s-1",
-                            'Maximum wind gust last 24h', max_wind_intp)
-        ncfile.add_variable('wind_direction', wind_dir.dtype.str,
-                            "cardinal direction",
-                            'Prevailing wind direction last 24h', wind_dir_intp)
-        ncfile.close()
+            ncfile.add_variable('avg_wind_speed', total_wind_avg.dtype.str, "m s-1",
+                                'Average wind speed last 24h', total_wind_avg_intp)
+            ncfile.add_variable('max_wind_speed', max_wind.dtype.str, "m s-1",
+                                'Maximum wind gust last 24h', max_wind_intp)
+            ncfile.add_variable('wind_direction', wind_dir.dtype.str,
+                                "cardinal direction",
+                                'Prevailing wind direction last 24h', wind_dir_intp)
+            ncfile.close()
         
-    if options.png:
-        # Write to PNG file
-        writePNG(total_wind_avg_intp[0,:,:],
-                 os.path.join(outdir1, outfile1),
-                 cltfile=r"Z:\tmp\wind_10m_daily\avg_wind_speed_10_no.clt"
-                 )
-        writePNG(max_wind_intp[0,:,:],
-                 os.path.join(outdir2, outfile2),
-                 cltfile=r"Z:\tmp\wind_10m_daily\max_wind_speed_10_no.clt"
-                 )
-#        writePNG(wind_dir_intp[0,:,:],
-#                 os.path.join(outdir, 'wind_direction'+'_'+dt),
-#                 cltfile=r"Z:\tmp\wind_10m_daily\wind_direction_10_no.clt"
-#                 )
+        if options.png:
+            # Write to PNG file
+            writePNG(total_wind_avg_intp[0,:,:],
+                     os.path.join(outdir1, outfile1),
+                     cltfile=r"Z:\tmp\wind_10m_daily\avg_wind_speed_10_no.clt"
+                     )
+            writePNG(max_wind_intp[0,:,:],
+                     os.path.join(outdir2, outfile2),
+                     cltfile=r"Z:\tmp\wind_10m_daily\max_wind_speed_10_no.clt"
+                     )
+    #        writePNG(wind_dir_intp[0,:,:],
+    #                 os.path.join(outdir, 'wind_direction'+'_'+dt),
+    #                 cltfile=r"Z:\tmp\wind_10m_daily\wind_direction_10_no.clt"
+    #                 )
     
     # At last - cross fingers it all worked out!
     print "\n*** Finished successfully ***\n"
@@ -492,7 +503,32 @@ def __test():
              os.path.join(testdir, 'max_wind_speed_10_no.clt'))
     writePNG(wind_dir_cat, os.path.join(testdir, 'test_dir'),
              os.path.join(testdir, 'wind_direction_10_no.clt'))
-    
+
+
+class Wind10mDaily(seNorgeTheme):
+    '''
+    Wind 10m daily as plugin for *run_themes.py*.
+    '''
+    name = 'wind_10m_daily'
+    inputs = [UM4Input('um4', "%(netCDFin)s/%(year)s/UM4_sf00_%(yesterday)s.nc",
+                       ['x_wind', 'y_wind'])]
+    outputs = [Output('wind_speed_avg_10m', scale=0.1, unit="m s-1",
+                      long_name='Average wind speed last 24h',
+                      cltfile=r"Z:\tmp\wind_10m_daily\avg_wind_speed_10_no.clt",
+                      southup=True),
+               Output('wind_speed_max_10m', scale=0.1, unit="m s-1",
+                      long_name='Maximum wind gust last 24h',
+                      cltfile=r"Z:\tmp\wind_10m_daily\max_wind_speed_10_no.clt",
+                      southup=True)]
+
+    def model(self, um4):
+        total_wind_avg, max_wind, wind_dir = model(um4['x_wind'], um4['y_wind'])
+        rlon, rlat = um4['rlon'], um4['rlat']
+        return {'wind_speed_avg_10m': interpolate(rlon, rlat, total_wind_avg),
+                'wind_speed_max_10m': interpolate(rlon, rlat, max_wind)}
+
+register(Wind10mDaily)
+
 
 if __name__ == '__main__':
     main()
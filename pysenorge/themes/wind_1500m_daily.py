@@ -14,37 +14,32 @@ __docformat__ = 'reStructuredtext'
 
 ''' IMPORTS '''
 # Built-in
-import os, time
+import os
 import math
-from datetime import timedelta
+from copy import copy
 from optparse import OptionParser
 
 # Adds folder containing the "pysenorge" package to the PYTHONPATH
 execfile(os.path.join(os.path.dirname(__file__), "set_pysenorge_path.py"))  
 
 # Additional
-try:
-    from netCDF4 import Dataset
-except ImportError:
-    try:
-        from Scientific.IO.NetCDF import NetCDFFile as Dataset
-    except ImportError:
-        print '''WARNING: Can not find module "netCDF4" or "Scientific.IO.NetCDF"!
-        Please install for netCDF file support.'''
-from numpy import sqrt, mean, flipud, zeros_like, arctan2, zeros, uint16
+from numpy import sqrt, mean, zeros_like, arctan2, zeros
 
 # Own
-from pysenorge.set_environment import netCDFin, BILout, \
-                                      FloatFillValue, UintFillValue
-from pysenorge.io.bil import BILdata
-from pysenorge.io.nc import NCdata
+from pysenorge.set_environment import BILout, FloatFillValue, UintFillValue
 from pysenorge.io.png import writePNG
-from pysenorge.tools.date_converters import iso2datetime, datetime2BILdate, get_hydroyear
+from pysenorge.tools.date_converters import iso2datetime
 from pysenorge.converters import nan2fill
 from pysenorge.grid import interpolate
 from pysenorge.functions.lamberts_formula import LambertsFormula
+from pysenorge.tools.instrumentation import instrumented_main, timed, \
+    set_run_date
+from pysenorge.tools.time_windows import parse_timerange
+from pysenorge.themes.senorge_theme import UM4WindowTheme, Output, \
+    register
 
 
+@timed('model')
 def model(x_wind, y_wind):
     """
     Calculates the average and maximum wind speed and the prevailing wind direction
@@ -117,9 +112,11 @@ def model(x_wind, y_wind):
     return total_wind_avg, max_wind, wind_dir_cat
 
 
+@instrumented_main('wind_1500m_daily')
 def main():
     '''
-    Loads and verifies input data, calls the model, and controls the output stream. 
+    Parses the command line and runs the theme plugin *Wind1500mDaily* for
+    each time window.
     
     Command line usage::
     
@@ -135,11 +132,11 @@ def main():
     parser.add_option("-o", "--outdir", 
                       action="store", dest="outdir", type="string",
                       default=os.path.join(BILout, themedir),
-                      help="Output directory for netCDF file - default: $netCDFout/%s/$YEAR" % themedir)
+                      help="Output directory - default: $BILout/%s/$HYDROYEAR" % themedir)
     parser.add_option("-t", "--timerange", 
                       action="store", dest="timerange", type="string",
-                      default="[2,8]",
-                      help='''Time-range as "[6,30]"''')
+                      default="[%i,%i]" % Wind1500mDaily.timerange,
+                      help='''Time-range as "[6,30]" or several as "[[6,30],[30,54]]"''')
     parser.add_option("--no-bil",
                       action="store_false", dest="bil", default=True,
                       help="Set to suppress output in BIL format")
@@ -160,149 +157,25 @@ def main():
         parser.error("Please provide the date in ISO format YYYY-MM-DD!")
         parser.print_help() 
     
-    # get current datetime
-    
-    #############
-    
-    
     ### different for prognosis files
     ### date corresponds to start, not end as in my convention
-    
-    
-    #############
     cdt = iso2datetime(args[0]+" 06:00:00")
-    ncfilename = "UM4_ml00_%s.nc" % datetime2BILdate(cdt-timedelta(days=1)) # e.g. UM4_ml_2010_11_28.nc
-    
-    if len(args) != 1:
-        parser.error("Please provide an input file!")
-    else:
-        # Add full path to the filename
-        ncfile = os.path.join(netCDFin, str(cdt.year), ncfilename)
-    
-    timerange = eval(options.timerange)
+    set_run_date(cdt.date().isoformat())
+    windows = parse_timerange(options.timerange)
     
+    theme = Wind1500mDaily()
+    ncfile = theme.input_files(cdt)[0]
     if not os.path.exists(ncfile):
         parser.error("%s does not exist!" % ncfile)
-    else:
-        if timerange == None:
-            # Load wind data from prognosis (netCDF file) for entire time-range
-            ds = Dataset(ncfile, 'r')
-            wind_time = ds.variables['time'][:]
-            x_wind = ds.variables['x_wind_1500m'][:,:,:]
-            y_wind = ds.variables['y_wind_1500m'][:,:,:]
-            rlon = ds.variables['rlon'][:]
-            rlat = ds.variables['rlat'][:]
-            ds.close()
-        else:
-            # Load wind data from prognosis (netCDF file) for selected time-range
-            ds = Dataset(ncfile, 'r')
-            wind_time = ds.variables['time'][timerange[0]:timerange[1]]
-            x_wind = ds.variables['x_wind_1500m'][timerange[0]:timerange[1],:,:]
-            y_wind = ds.variables['y_wind_1500m'][timerange[0]:timerange[1],:,:]
-            rlon = ds.variables['rlon'][:]
-            rlat = ds.variables['rlat'][:]
-            ds.close()
-            
-#    from netCDF4 import num2date
-#    for t in wind_time:
-#        print num2date(t, "seconds since 1970-01-01 00:00:00 +00:00")
-    
-    print "Using input data from file %s" % ncfilename
-    
-    # Setup outputs
-    tstruct = time.gmtime(wind_time[-1]) # or -1 if it should be the average until that date
-    outfile = '%s_%s_%s_%s' % (themedir, str(tstruct.tm_year).zfill(4),
-                               str(tstruct.tm_mon).zfill(2),
-                               str(tstruct.tm_mday).zfill(2))
-    
-    outdir = os.path.join(options.outdir, str(get_hydroyear(cdt)))
-    if not os.path.exists(outdir):
-        if not os.path.exists(options.outdir):
-            os.chdir(BILout)
-            os.system('mkdir %s' % themedir)
-        os.chdir(options.outdir)
-        os.system('mkdir %s' % str(get_hydroyear(cdt)))
-
-    # Calculate the wind speed vector - using model()
-    total_wind_avg, max_wind, wind_dir = model(x_wind, y_wind)
-    
-    # interpolate total average wind speed to seNorge grid
-    total_wind_avg_intp = interpolate(rlon, rlat, total_wind_avg)
-    max_wind_intp = interpolate(rlon, rlat, max_wind)
-    wind_dir_intp = interpolate(rlon, rlat, wind_dir)
-    
-    
-    # Replace NaN values with the appropriate FillValue
-    total_wind_avg_intp = nan2fill(total_wind_avg_intp)
-    max_wind_intp = nan2fill(max_wind_intp)
-    wind_dir_intp = nan2fill(wind_dir_intp)
-    
-    if options.bil:
-        from pysenorge.grid import senorge_mask
-        
-        mask = senorge_mask()
-        
-        # Write to BIL file
-#        dtstr = datetime2BILdate(cdt)
-        
-#        # avg wind
-#        bil_avg_wind = flipud(uint16(total_wind_avg_intp*10.0))
-#        bil_avg_wind[mask] = UintFillValue
-#        bilfile = BILdata(os.path.join(BILout, themedir,
-#                          'avg_wind_speed'+'_'+dtstr+'.bil'),
-#                          datatype='uint16')
-#        biltext = bilfile.write(bil_avg_wind.flatten())
-#        print biltext
-#        
-#        #  max wind
-#        bil_max_wind = flipud(uint16(max_wind_intp*10.0))
-#        bil_max_wind[mask] = UintFillValue
-#        bilfile = BILdata(os.path.join(BILout, themedir,
-#                          'max_wind_speed'+'_'+dtstr+'.bil'),
-#                          datatype='uint16')
-#        biltext = bilfile.write(bil_max_wind.flatten())
-#        print biltext
-        
-        # wind direction
-        bil_dir_wind = flipud(uint16(wind_dir_intp))
-        bil_dir_wind[mask] = UintFillValue
-        bilfile = BILdata(os.path.join(outdir,
-#                          'wind_direction_1500m'+'_'+dtstr+'.bil'),
-                          outfile+'.bil'),
-                          datatype='uint16')
-        biltext = bilfile.write(bil_dir_wind.flatten())
-        print biltext
-    
-    if options.nc:
-        # Write to NC file
-        ncfile = NCdata(os.path.join(outdir, outfile+'.nc'))
-#        ncfile.rootgrp.info = themename
-        ncfile.new(wind_time[-1])
-        
-        ncfile.add_variable('avg_wind_speed', total_wind_avg.dtype.str, "m s-1",
-                            'Average wind speed last 24h', total_wind_avg_intp)
-        ncfile.add_variable('max_wind_speed', max_wind.dtype.str, "m s-1",
-                            'Maximum wind gust last 24h', max_wind_intp)
-        ncfile.add_variable('wind_direction_1500m', wind_dir.dtype.str,
-                            "cardinal direction",
-                            'Prevailing wind direction last 24h', wind_dir_intp)
-        ncfile.close()
-        
-    if options.png:
-        # Write to PNG file
-        dtstr = datetime2BILdate(cdt)
-        writePNG(total_wind_avg_intp[0,:,:],
-                 os.path.join(outdir, 'avg_wind_speed'+'_'+dtstr),
-                 cltfile=r"Z:\tmp\wind_1500m_daily\avg_wind_speed_1500_no.clt"
-                 )
-        writePNG(max_wind_intp[0,:,:],
-                 os.path.join(outdir, 'max_wind_speed'+'_'+dtstr),
-                 cltfile=r"Z:\tmp\wind_1500m_daily\max_wind_speed_1500_no.clt"
-                 )
-        writePNG(wind_dir_intp[0,:,:],
-                 os.path.join(outdir, 'wind_direction'+'_'+dtstr),
-                 cltfile=r"Z:\tmp\wind_1500m_daily\wind_direction_1500_no.clt"
-                 )
+    if os.path.normpath(options.outdir) != \
+            os.path.normpath(os.path.join(BILout, themedir)):
+        output = copy(theme.outputs[0])
+        output.template = os.path.join(options.outdir.replace('%', '%%'),
+                                       "%(hydroyear)s",
+                                       themedir + "_%(date)s.bil")
+        theme.outputs = [output]
+    print "Using input data from file %s" % ncfile
+    theme.runWindows(cdt, windows, options.bil, options.nc, options.png)
     
     # At last - cross fingers it all worked out!
     print "\n*** Finished successfully ***\n"
@@ -456,6 +329,28 @@ def _test():
              os.path.join(testdir, 'wind_direction_1500_no.clt'))
 
 
+class Wind1500mDaily(UM4WindowTheme):
+    '''
+    Wind 1500m daily as plugin for *run_themes.py*.
+    '''
+    name = 'wind_1500m_daily'
+    template = "%(netCDFin)s/%(year)s/UM4_ml00_%(yesterday)s.nc"
+    variables = ['x_wind_1500m', 'y_wind_1500m']
+    timerange = (2, 8)
+    timestep = 6 # ml00 files are 6-hourly
+    outputs = [Output('wind_direction_1500m', scale=1.0, unit="cardinal direction",
+                      long_name='Prevailing wind direction last 24h',
+                      cltfile=r"Z:\tmp\wind_1500m_daily\wind_direction_1500_no.clt",
+                      southup=True)]
+
+    def model(self, um4):
+        total_wind_avg, max_wind, wind_dir = model(um4['x_wind_1500m'], um4['y_wind_1500m'])
+        rlon, rlat = um4['rlon'], um4['rlat']
+        return {'wind_direction_1500m': interpolate(rlon, rlat, wind_dir)}
+
+register(Wind1500mDaily)
+
+
 if __name__ == '__main__':
     main()
 
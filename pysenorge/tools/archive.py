@@ -0,0 +1,451 @@
+__docformat__ = "reStructuredText"
+'''
+Chunked, compressed archive of seNorge products for pixel histories.
+
+Answering "how did the depth hoar index evolve at this cell over 20 seasons"
+from the daily BIL files means opening thousands of files. The archive
+ingests the daily grids of a product once into two chunked arrays:
+
+    - *series*: chunks of *TIME_CHUNK* days x *SPACE_CHUNK* x *SPACE_CHUNK*
+      cells - the history of a cell is read from a few chunks
+    - *map*: one chunk per day - a map is read from a single chunk
+
+The arrays are stored in the Zarr (version 2) directory format with zlib
+compressed chunks, so they can also be opened with the *zarr* package, which
+is not needed here::
+
+    ARCHIVEdir/<product>/.zgroup
+    ARCHIVEdir/<product>/series/.zarray    shape, chunks, dtype, fill value
+    ARCHIVEdir/<product>/series/.zattrs    origin, scale, offset, unit
+    ARCHIVEdir/<product>/series/<t>.<row>.<col>
+    ARCHIVEdir/<product>/map/...
+
+The first axis is the day since *ORIGIN*, rows and columns are in BIL
+orientation (first row in the north). Values are stored raw in the data-type
+of the BIL files with their no-data value; the read API returns physical
+values with NaN as no-data. Missing files are stored as no-data. Ingesting
+the same dates again overwrites them.
+
+The chunks are read and written on a pool of threads; each task writes its
+own chunks only.
+
+Command line usage::
+
+    python archive.py PRODUCT YYYY-MM-DD YYYY-MM-DD [options]
+
+Example::
+
+    python archive.py depth_hoar_index_2 1990-09-01 2010-08-31 -j 8
+
+Reading::
+
+    from pysenorge.tools.archive import ProductArchive
+    archive = ProductArchive('depth_hoar_index_2')
+    dates, values = archive.series(700, 300)
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import json
+import zlib
+from datetime import date, timedelta
+from itertools import product
+from optparse import OptionParser
+from multiprocessing.pool import ThreadPool
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+import numpy as np
+from numpy import float32, nan
+
+# Own
+from pysenorge.set_environment import BILout, default_senorge_width, \
+    default_senorge_height
+from pysenorge.converters import get_FillValue
+from pysenorge.io.bil import atomic_write
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.instrumentation import stage, add_bytes
+from pysenorge.tools.point_extraction import get_source, source_filename
+from pysenorge.tools.tiling import n_threads
+from pysenorge.themes.senorge_theme import DATATYPES
+
+ARCHIVEdir = os.path.join(BILout, 'archive')
+
+# Day 0 of the time axis - start of the seNorge period
+ORIGIN = date(1957, 9, 1)
+# Days per chunk of the series array
+TIME_CHUNK = 128
+# Rows and columns per chunk of the series array
+SPACE_CHUNK = 64
+# zlib compression level
+LEVEL = 5
+
+
+class ZarrArray(object):
+    '''
+    Minimal Zarr (version 2) array in a directory with zlib compressed chunks.
+    '''
+
+    def __init__(self, path):
+        '''
+        Opens the existing array in folder *path*.
+        '''
+        self.path = path
+        fid = open(os.path.join(path, '.zarray'), 'r')
+        meta = json.load(fid)
+        fid.close()
+        self.shape = tuple(meta['shape'])
+        self.chunks = tuple(meta['chunks'])
+        self.dtype = np.dtype(meta['dtype'])
+        self.fill_value = meta['fill_value']
+        self.level = meta['compressor']['level']
+        self.attrs = {}
+        attrsfile = os.path.join(path, '.zattrs')
+        if os.path.exists(attrsfile):
+            fid = open(attrsfile, 'r')
+            self.attrs = json.load(fid)
+            fid.close()
+
+    @classmethod
+    def create(cls, path, shape, chunks, dt, fill_value, attrs=None,
+               level=LEVEL):
+        '''
+        Creates a new array in folder *path* and returns it.
+        '''
+        if not os.path.exists(path):
+            os.makedirs(path)
+        dt = np.dtype(dt)
+        meta = {'zarr_format': 2, 'shape': list(shape), 'chunks': list(chunks),
+                'dtype': dt.str, 'fill_value': fill_value.item(),
+                'compressor': {'id': 'zlib', 'level': level},
+                'order': 'C', 'filters': None}
+        atomic_write(os.path.join(path, '.zarray'),
+                     json.dumps(meta, indent=1, sort_keys=True))
+        atomic_write(os.path.join(path, '.zattrs'),
+                     json.dumps(attrs or {}, indent=1, sort_keys=True))
+        return cls(path)
+
+    def resize(self, shape):
+        '''
+        Changes the shape - chunks outside the new shape are not removed.
+        '''
+        metafile = os.path.join(self.path, '.zarray')
+        fid = open(metafile, 'r')
+        meta = json.load(fid)
+        fid.close()
+        meta['shape'] = list(shape)
+        atomic_write(metafile, json.dumps(meta, indent=1, sort_keys=True))
+        self.shape = tuple(shape)
+
+    def _chunkfile(self, idx):
+        return os.path.join(self.path, '.'.join([str(i) for i in idx]))
+
+    def _empty(self, shape):
+        data = np.empty(shape, dtype=self.dtype)
+        data[:] = self.fill_value
+        return data
+
+    def read_chunk(self, idx):
+        '''
+        Returns the chunk *idx* - filled with the fill value if missing.
+        '''
+        filename = self._chunkfile(idx)
+        if not os.path.exists(filename):
+            return self._empty(self.chunks)
+        fid = open(filename, 'rb')
+        raw = fid.read()
+        fid.close()
+        add_bytes(read=len(raw))
+        data = np.frombuffer(zlib.decompress(raw), dtype=self.dtype)
+        return data.reshape(self.chunks).copy()
+
+    def write_chunk(self, idx, data):
+        raw = zlib.compress(np.ascontiguousarray(data, self.dtype).tostring(),
+                            self.level)
+        atomic_write(self._chunkfile(idx), raw, fsync=False)
+        add_bytes(written=len(raw))
+
+    def _overlaps(self, start, shape):
+        '''
+        Yields the chunks overlapping the region at *start* of *shape* with
+        the slices of the region and of the chunk.
+        '''
+        ranges = [xrange(s // c, (s + n - 1) // c + 1)
+                  for s, n, c in zip(start, shape, self.chunks)]
+        for idx in product(*ranges):
+            c0 = [i * c for i, c in zip(idx, self.chunks)]
+            lo = [max(s, c) for s, c in zip(start, c0)]
+            hi = [min(s + n, c + k) for s, n, c, k in
+                  zip(start, shape, c0, self.chunks)]
+            region = tuple([slice(l - s, h - s)
+                            for l, h, s in zip(lo, hi, start)])
+            chunk = tuple([slice(l - c, h - c) for l, h, c in zip(lo, hi, c0)])
+            yield idx, region, chunk
+
+    def read(self, start, stop):
+        '''
+        Returns the region from the indices *start* to *stop* (exclusive).
+        '''
+        shape = [b - a for a, b in zip(start, stop)]
+        data = self._empty(shape)
+        for idx, region, chunk in self._overlaps(start, shape):
+            if os.path.exists(self._chunkfile(idx)):
+                data[region] = self.read_chunk(idx)[chunk]
+        return data
+
+    def write(self, start, data):
+        '''
+        Writes *data* at the indices *start*. Partly covered chunks are read
+        and updated.
+        '''
+        for idx, region, chunk in self._overlaps(start, data.shape):
+            covered = [s.start == 0 and s.stop == c
+                       for s, c in zip(chunk, self.chunks)]
+            if all(covered):
+                block = data[region]
+            else:
+                block = self.read_chunk(idx)
+                block[chunk] = data[region]
+            self.write_chunk(idx, block)
+
+
+def read_rows(filename, datatype, r0, r1, name=None,
+              nrows=default_senorge_height, ncols=default_senorge_width):
+    '''
+    Reads the rows *r0* to *r1* (BIL orientation) of a BIL or netCDF file.
+
+    :Parameters:
+        - filename: BIL file or netCDF file as written by *Output.write*
+        - datatype: Data-type of the BIL file
+        - name: Variable name in the netCDF file
+    '''
+    if os.path.splitext(filename)[1] == '.nc':
+        from pysenorge.io.nc import open_dataset
+        ds = open_dataset(filename, 'r')
+        # netCDF files have the first row in the south
+        data = np.asarray(ds.variables[name][0, nrows-r1:nrows-r0])[::-1]
+        ds.close()
+        return data.astype(DATATYPES[datatype])
+    mm = np.memmap(filename, dtype=DATATYPES[datatype], mode='r',
+                   shape=(nrows, ncols))
+    data = np.array(mm[r0:r1])
+    del mm
+    return data
+
+
+class ProductArchive(object):
+    '''
+    The archive of one product.
+    '''
+
+    def __init__(self, name, archivedir=ARCHIVEdir):
+        '''
+        :Parameters:
+            - name: Product as accepted by *point_extraction.get_source*
+            - archivedir: Root folder of the archive
+        '''
+        self.name = name
+        self.source = get_source(name)
+        self.path = os.path.join(archivedir, name.split(':')[-1])
+        self.series_array = None
+        self.map_array = None
+        if os.path.exists(os.path.join(self.path, 'series', '.zarray')):
+            self.series_array = ZarrArray(os.path.join(self.path, 'series'))
+            self.map_array = ZarrArray(os.path.join(self.path, 'map'))
+
+    @property
+    def origin(self):
+        if self.series_array is None:
+            return ORIGIN
+        return date(*[int(i) for i in
+                      self.series_array.attrs['origin'].split('-')])
+
+    def _create(self, origin=ORIGIN):
+        dt = DATATYPES[self.source.datatype]
+        attrs = {'name': self.name, 'origin': origin.isoformat(),
+                 'scale': self.source.scale, 'offset': self.source.offset,
+                 'unit': getattr(self.source, 'unit', '')}
+        shape = (0, default_senorge_height, default_senorge_width)
+        fill = get_FillValue(dt)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        atomic_write(os.path.join(self.path, '.zgroup'),
+                     json.dumps({'zarr_format': 2}))
+        self.series_array = ZarrArray.create(
+            os.path.join(self.path, 'series'), shape,
+            (TIME_CHUNK, SPACE_CHUNK, SPACE_CHUNK), dt, fill, attrs)
+        self.map_array = ZarrArray.create(
+            os.path.join(self.path, 'map'), shape, (1,) + shape[1:], dt, fill,
+            attrs)
+
+    def day(self, cdt):
+        '''
+        Returns the index of date *cdt* on the time axis.
+        '''
+        if hasattr(cdt, 'date'):
+            cdt = cdt.date()
+        return (cdt - self.origin).days
+
+    def date(self, t):
+        return self.origin + timedelta(days=t)
+
+    def _filename(self, cdt, netcdf):
+        filename = source_filename(self.source, cdt)
+        if netcdf:
+            filename = os.path.splitext(filename)[0] + '.nc'
+        return filename
+
+    def ingest(self, start_date, end_date, threads=None, netcdf=False):
+        '''
+        Ingests the files of the dates *start_date* to *end_date*.
+
+        :Parameters:
+            - start_date, end_date: *datetime*
+            - threads: Number of parallel tasks - default: see *n_threads*
+            - netcdf: Read the netCDF instead of the BIL files
+
+        :Returns:
+            - Number of files ingested
+        '''
+        if self.series_array is None:
+            self._create()
+        if threads is None:
+            threads = n_threads()
+        t0 = self.day(start_date)
+        t1 = self.day(end_date) + 1
+        if t0 < 0:
+            raise ValueError("%s is before the origin %s of the archive" %
+                             (start_date, self.origin))
+        files = {}
+        for t in xrange(t0, t1):
+            filename = self._filename(self.date(t), netcdf)
+            if os.path.exists(filename):
+                files[t] = filename
+            else:
+                print "%s does not exist - stored as no-data" % filename
+        nt = max(self.series_array.shape[0], t1)
+        shape = (nt,) + self.series_array.shape[1:]
+        self.series_array.resize(shape)
+        self.map_array.resize(shape)
+
+        nrows = shape[1]
+        tasks = [('map', t, t + 1, 0, nrows) for t in sorted(files)]
+        for tb in xrange(t0 // TIME_CHUNK, (t1 - 1) // TIME_CHUNK + 1):
+            for r in xrange(0, nrows, SPACE_CHUNK):
+                tasks.append(('series', max(tb * TIME_CHUNK, t0),
+                              min((tb + 1) * TIME_CHUNK, t1),
+                              r, min(r + SPACE_CHUNK, nrows)))
+
+        def ingest_task(task):
+            layout, ta, tb, ra, rb = task
+            array = self.map_array if layout == 'map' else self.series_array
+            data = array._empty((tb - ta, rb - ra, shape[2]))
+            for t in xrange(ta, tb):
+                if t in files:
+                    data[t - ta] = read_rows(files[t], self.source.datatype,
+                                             ra, rb, self.source.name)
+            array.write((ta, ra, 0), data)
+
+        with stage('archive_ingest'):
+            if threads > 1 and len(tasks) > 1:
+                pool = ThreadPool(threads)
+                try:
+                    pool.map(ingest_task, tasks)
+                finally:
+                    pool.close()
+            else:
+                map(ingest_task, tasks)
+        return len(files)
+
+    def _physical(self, raw, physical):
+        if not physical:
+            return raw
+        data = raw.astype(float32) * self.source.scale + self.source.offset
+        data[raw == self.series_array.fill_value] = nan
+        return data
+
+    def _range(self, start_date, end_date):
+        if self.series_array is None:
+            raise IOError("No archive of %s in %s" % (self.name, self.path))
+        t0 = 0 if start_date is None else max(self.day(start_date), 0)
+        t1 = self.series_array.shape[0] if end_date is None else \
+            min(self.day(end_date) + 1, self.series_array.shape[0])
+        return t0, max(t1, t0)
+
+    def series(self, rows, cols, start_date=None, end_date=None,
+               physical=True):
+        '''
+        Returns the history of a cell or a window of cells.
+
+        :Parameters:
+            - rows, cols: BIL cell indices as integers or (start, stop)
+                tuples for a window
+            - start_date, end_date: Period - default: the entire archive
+            - physical: Return physical values with NaN as no-data instead
+                of the raw values
+
+        :Returns:
+            - List of dates and array of shape (dates,) for a cell or
+                (dates, rows, cols) for a window
+        '''
+        t0, t1 = self._range(start_date, end_date)
+        point = isinstance(rows, (int, long)) and isinstance(cols, (int, long))
+        if isinstance(rows, (int, long)):
+            rows = (rows, rows + 1)
+        if isinstance(cols, (int, long)):
+            cols = (cols, cols + 1)
+        with stage('archive_read'):
+            raw = self.series_array.read((t0, rows[0], cols[0]),
+                                         (t1, rows[1], cols[1]))
+        data = self._physical(raw, physical)
+        if point:
+            data = data[:, 0, 0]
+        return [self.date(t) for t in xrange(t0, t1)], data
+
+    def map(self, cdt, physical=True):
+        '''
+        Returns the grid of date *cdt* or *None* if it is not archived.
+        '''
+        t = self.day(cdt)
+        if self.map_array is None or not 0 <= t < self.map_array.shape[0]:
+            return None
+        with stage('archive_read'):
+            raw = self.map_array.read((t, 0, 0), (t + 1,) +
+                                      self.map_array.shape[1:])[0]
+        return self._physical(raw, physical)
+
+
+def main():
+    usage = "usage: python archive.py PRODUCT YYYY-MM-DD YYYY-MM-DD [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-d", "--archivedir",
+                      action="store", dest="archivedir", type="string",
+                      metavar="DIR", default=ARCHIVEdir,
+                      help="Archive folder - default: %s" % ARCHIVEdir)
+    parser.add_option("-j", "--threads",
+                      action="store", dest="threads", type="int", default=None,
+                      help="Number of parallel tasks - default: $PYSENORGE_THREADS or number of CPUs")
+    parser.add_option("--netcdf",
+                      action="store_true", dest="netcdf", default=False,
+                      help="Ingest the netCDF instead of the BIL files")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) != 3:
+        parser.error("Please provide the product, start and end date!")
+    name, start, end = args
+
+    archive = ProductArchive(name, options.archivedir)
+    n = archive.ingest(iso2datetime(start+" 06:00:00"),
+                       iso2datetime(end+" 06:00:00"),
+                       options.threads, options.netcdf)
+    print "%i files of %s ingested into %s" % (n, name, archive.path)
+
+
+if __name__ == "__main__":
+    main()
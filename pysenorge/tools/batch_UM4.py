@@ -0,0 +1,323 @@
+# -*- coding:iso-8859-10 -*-
+__docformat__ = "reStructuredText"
+'''
+Batch decompression and recompression of the met.no UM4 prognosis archive.
+
+The *ml00* and *sf00* files of every day between a start and an end date are
+processed on a pool of worker processes. Each worker streams its file in
+blocks of *CHUNKSIZE* bytes, so the memory use is bounded by
+*processes x CHUNKSIZE* regardless of the file sizes.
+
+Supported archive codecs (all from the standard library):
+    - gz: gzip (default)
+    - bz2: bzip2
+    - xz: lzma (Python >= 3.3 or the *backports.lzma* module)
+
+Command line usage::
+
+    python batch_UM4.py YYYY-MM-DD YYYY-MM-DD [options]
+
+Examples::
+
+    # unzip all files of January 2011 on 8 processes
+    python batch_UM4.py 2011-01-01 2011-01-31 -p 8
+    # recompress a winter from gzip to xz at level 9 for archival
+    python batch_UM4.py 2010-09-01 2011-08-31 -a recompress -c xz -l 9
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import sys
+import time
+import gzip
+import bz2
+import zlib
+import struct
+import datetime
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Own
+from pysenorge.set_environment import netCDFin
+from pysenorge.tools.date_converters import iso2datetime, datetime2BILdate
+
+# Size of the blocks read/written at a time by each worker [bytes]
+CHUNKSIZE = 4 * 1024 * 1024
+
+# File name extension for each codec
+EXTENSIONS = {'gz': '.gz', 'bz2': '.bz2', 'xz': '.xz'}
+
+# Errors of a single file (e.g. corrupt or truncated archives) - reported per
+# file without stopping the batch
+FILE_ERRORS = (IOError, OSError, EOFError, ValueError, zlib.error,
+               struct.error)
+if lzma is not None:
+    FILE_ERRORS += (lzma.LZMAError,)
+
+
+def copen(filename, mode='rb', codec='gz', level=6):
+    """
+    Opens a compressed file with the given codec.
+
+    :Parameters:
+        - filename: Compressed file
+        - mode: "rb" or "wb"
+        - codec: "gz", "bz2" or "xz"
+        - level: Compression level (1-9), only used when writing
+    """
+    if codec == 'gz':
+        return gzip.open(filename, mode, level)
+    elif codec == 'bz2':
+        return bz2.BZ2File(filename, mode, compresslevel=level)
+    elif codec == 'xz':
+        if lzma is None:
+            raise ValueError('Codec "xz" requires the "lzma" module!')
+        if 'w' in mode:
+            return lzma.LZMAFile(filename, mode, preset=level)
+        return lzma.LZMAFile(filename, mode)
+    else:
+        raise ValueError('Unknown codec "%s"!' % codec)
+
+
+def get_codec(filename):
+    """
+    Returns the codec belonging to the extension of *filename* or *None* if
+    the file is not compressed.
+    """
+    ext = os.path.splitext(filename)[1]
+    for codec in EXTENSIONS:
+        if EXTENSIONS[codec] == ext:
+            return codec
+    return None
+
+
+def _stream(fin, fout, chunksize=CHUNKSIZE):
+    """
+    Copies *fin* to *fout* in blocks and returns the number of bytes copied.
+    """
+    nbytes = 0
+    while True:
+        chunk = fin.read(chunksize)
+        if not chunk:
+            break
+        fout.write(chunk)
+        nbytes += len(chunk)
+    return nbytes
+
+
+def _process(job):
+    """
+    Worker function run in the process pool.
+
+    :Parameters:
+        - job: Tuple (action, src, codec, level, remove)
+
+    :Returns:
+        - Tuple (src, dst, bytes read, bytes written, uncompressed bytes,
+            seconds, error message)
+    """
+    action, src, codec, level, remove = job
+    t0 = time.time()
+    dst = None
+    fin = fout = None
+    complete = False
+    try:
+        nin = os.path.getsize(src)
+        incodec = get_codec(src)
+        if action == 'decompress':
+            dst = os.path.splitext(src)[0]
+            fin = copen(src, 'rb', incodec)
+            fout = open(dst, 'wb')
+        elif action == 'compress':
+            dst = src + EXTENSIONS[codec]
+            fin = open(src, 'rb')
+            fout = copen(dst, 'wb', codec, level)
+        else: # recompress
+            dst = os.path.splitext(src)[0] + EXTENSIONS[codec]
+            if dst == src:
+                # same codec and name - write next to it and swap afterwards
+                dst = src + '.tmp'
+            fin = copen(src, 'rb', incodec)
+            fout = copen(dst, 'wb', codec, level)
+        nstream = _stream(fin, fout)
+        fin.close()
+        fin = None
+        fout.close()
+        fout = None
+        complete = True
+        if dst.endswith('.tmp'):
+            os.remove(src)
+            os.rename(dst, src)
+            dst = src
+        elif remove:
+            os.remove(src)
+        return (src, dst, nin, os.path.getsize(dst), nstream, time.time()-t0,
+                None)
+    except FILE_ERRORS, e:
+        return (src, dst, 0, 0, 0, time.time()-t0,
+                "%s: %s" % (e.__class__.__name__, e))
+    finally:
+        for f in (fin, fout):
+            if f is not None:
+                try:
+                    f.close()
+                except FILE_ERRORS:
+                    pass
+        # never leave a truncated output behind
+        if not complete and dst is not None and dst != src and \
+                os.path.exists(dst):
+            os.remove(dst)
+
+
+def find_files(period, basedir=netCDFin, action='decompress',
+               prefixes=('UM4_ml00', 'UM4_sf00')):
+    """
+    Lists the UM4 files for each day in *period* that the action applies to.
+
+    :Parameters:
+        - period: List with start and end date in ISO format YYYY-MM-DD
+        - basedir: Folder containing one sub-folder per year
+        - action: "decompress", "compress" or "recompress"
+        - prefixes: Leading part of the file names to include
+    """
+    startdate = iso2datetime(period[0]+" 06:00:00")
+    enddate = iso2datetime(period[1]+" 06:00:00")
+    dt = datetime.timedelta(days=1)
+    files = []
+    cdate = startdate
+    while cdate <= enddate:
+        workdir = os.path.join(basedir, str(cdate.year))
+        for prefix in prefixes:
+            name = os.path.join(workdir, "%s_%s.nc" % (prefix,
+                                                       datetime2BILdate(cdate)))
+            if action == 'compress':
+                if os.path.exists(name):
+                    files.append(name)
+            else:
+                for ext in EXTENSIONS.values():
+                    if os.path.exists(name+ext):
+                        files.append(name+ext)
+                        break
+        cdate = cdate+dt
+    return files
+
+
+def batch(files, action='decompress', codec='gz', level=6, processes=None,
+          remove=False):
+    """
+    Processes *files* on a pool of worker processes and prints a throughput
+    report.
+
+    :Parameters:
+        - files: List of files
+        - action: "decompress", "compress" or "recompress"
+        - codec: Codec used for writing ("gz", "bz2" or "xz")
+        - level: Compression level (1-9)
+        - processes: Number of worker processes - default: number of CPUs
+        - remove: If *True* the input files are deleted after processing
+
+    :Returns:
+        - List of result tuples as returned by the worker
+    """
+    if processes is None:
+        processes = cpu_count()
+    jobs = [(action, f, codec, level, remove) for f in files]
+
+    t0 = time.time()
+    pool = Pool(processes, maxtasksperchild=10)
+    results = []
+    for result in pool.imap_unordered(_process, jobs):
+        src, dst, nin, nout, nstream, secs, err = result
+        if err is None:
+            print "%s -> %s (%.1f s)" % (os.path.basename(src),
+                                         os.path.basename(dst), secs)
+        else:
+            print "FAILED %s: %s" % (src, err)
+        results.append(result)
+    pool.close()
+    pool.join()
+
+    report(results, time.time()-t0, processes)
+    return results
+
+
+def report(results, wall, processes):
+    """
+    Prints the throughput of a batch run to the command line.
+    """
+    done = [r for r in results if r[6] is None]
+    nin = sum([r[2] for r in done])
+    nout = sum([r[3] for r in done])
+    uncompressed = sum([r[4] for r in done]) / 1048576.0
+    busy = sum([r[5] for r in done]) # sum of the wall times of the jobs
+    print "\nFiles processed: %i (%i failed)" % (len(done),
+                                                 len(results)-len(done))
+    print "Processes: %i" % processes
+    print "Read: %.1f MB\tWritten: %.1f MB\tUncompressed: %.1f MB" % \
+        (nin/1048576.0, nout/1048576.0, uncompressed)
+    if nin > 0:
+        print "Written/read: %.2f" % (float(nout)/nin)
+    if wall > 0:
+        print "Wall time: %.1f s\tRead: %.1f MB/s\tWritten: %.1f MB/s" % \
+            (wall, nin/1048576.0/wall, nout/1048576.0/wall)
+    if busy > 0:
+        print "Sum of worker wall times: %.1f s\tPer worker: %.1f MB/s read, " \
+            "%.1f MB/s written" % (busy, nin/1048576.0/busy,
+                                   nout/1048576.0/busy)
+
+
+def main():
+    usage = "usage: python batch_UM4.py YYYY-MM-DD YYYY-MM-DD [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-d", "--dir",
+                      action="store", dest="basedir", type="string",
+                      metavar="DIR", default=netCDFin,
+                      help="Folder with the yearly UM4 folders - default: $netCDFin")
+    parser.add_option("-a", "--action",
+                      action="store", dest="action", type="choice",
+                      choices=["decompress", "compress", "recompress"],
+                      default="decompress",
+                      help="decompress (default), compress or recompress")
+    parser.add_option("-c", "--codec",
+                      action="store", dest="codec", type="choice",
+                      choices=EXTENSIONS.keys(), default="gz",
+                      help="Codec used for writing: gz (default), bz2 or xz")
+    parser.add_option("-l", "--level",
+                      action="store", dest="level", type="int", default=6,
+                      help="Compression level 1-9 (default=6)")
+    parser.add_option("-p", "--processes",
+                      action="store", dest="processes", type="int",
+                      default=None,
+                      help="Number of worker processes - default: number of CPUs")
+    parser.add_option("--remove",
+                      action="store_true", dest="remove", default=False,
+                      help="Delete the input files after processing")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) != 2:
+        parser.error("Please provide start and end date in ISO format YYYY-MM-DD!")
+
+    files = find_files(args, options.basedir, options.action)
+    if len(files) == 0:
+        print "No files found for the period %s - %s" % (args[0], args[1])
+        sys.exit(0)
+    batch(files, options.action, options.codec, options.level,
+          options.processes, options.remove)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+__docformat__ = 'reStructuredText'
+'''
+Skip-if-unchanged build cache for theme products.
+
+For every output file the cache records a signature built from
+
+    - the input files (size and modification time, or their content),
+    - the theme parameters (e.g. the command line options) and
+    - the theme code version (a hash of the theme script) and
+    - the version of the *pysenorge* package (a hash of all its modules, see
+      *package_version*), so that changes to e.g. *functions*, *grid.py*,
+      *io* or the theme base class invalidate the products as well.
+
+A product is only recomputed if its signature changed or one of its output
+files is missing - similar to *make*.
+
+Usage::
+
+    cache = BuildCache(os.path.join(LOGdir, 'build_cache.json'))
+    sig = cache.signature(inputs, params="-t [7,31]", code=scriptfile)
+    if not cache.is_current(outputs, sig):
+        ... run the theme ...
+        cache.update(outputs, sig)
+        cache.save()
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import json
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import md5
+
+# Size of the blocks read when hashing file content [bytes]
+CHUNKSIZE = 4 * 1024 * 1024
+
+# Root folder of the pysenorge package
+PACKAGEDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Folders of the package not affecting the products
+EXCLUDED = ('benchmark', 'verify')
+
+# Package version by process (see package_version)
+_VERSION = []
+
+
+def file_hash(filename, content=False):
+    """
+    Returns a string identifying the state of *filename*.
+
+    :Parameters:
+        - filename: File to be hashed
+        - content: If *True* the md5 sum of the file content is used,
+            otherwise size and modification time.
+    """
+    if not os.path.exists(filename):
+        return 'missing'
+    if not content:
+        st = os.stat(filename)
+        return '%i:%i' % (st.st_size, int(st.st_mtime))
+    h = md5()
+    fid = open(filename, 'rb')
+    while True:
+        chunk = fid.read(CHUNKSIZE)
+        if not chunk:
+            break
+        h.update(chunk)
+    fid.close()
+    return h.hexdigest()
+
+
+def package_version():
+    """
+    Returns a hash of the source of all *pysenorge* modules, computed once per
+    process.
+    """
+    if not _VERSION:
+        h = md5()
+        for root, dirs, files in os.walk(PACKAGEDIR):
+            dirs[:] = sorted([d for d in dirs if d not in EXCLUDED])
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    filename = os.path.join(root, name)
+                    h.update('%s=%s\n' % (os.path.relpath(filename, PACKAGEDIR),
+                                          file_hash(filename, True)))
+        _VERSION.append(h.hexdigest())
+    return _VERSION[0]
+
+
+class BuildCache(object):
+    '''
+    Records the signature of the inputs of each output file in a JSON file.
+    '''
+
+    def __init__(self, cachefile, content=False):
+        '''
+        :Parameters:
+            - cachefile: JSON file holding the cache - created if not existent
+            - content: If *True* input files are hashed by content instead of
+                size and modification time
+        '''
+        self.cachefile = cachefile
+        self.content = content
+        self.entries = {}
+        if os.path.exists(cachefile):
+            fid = open(cachefile, 'r')
+            try:
+                self.entries = json.load(fid)
+            except ValueError:
+                print "Corrupt build cache %s - starting empty" % cachefile
+            fid.close()
+
+    def signature(self, inputs, params=None, code=None):
+        '''
+        Creates the signature of a product.
+
+        :Parameters:
+            - inputs: List of input files
+            - params: String (or any object with a stable *repr*) holding the
+                theme parameters
+            - code: Theme script (or list of files) defining the code version
+        '''
+        h = md5()
+        for filename in sorted(inputs):
+            h.update('%s=%s\n' % (filename, file_hash(filename, self.content)))
+        h.update('params=%r\n' % (params,))
+        h.update('package=%s\n' % package_version())
+        if code is not None:
+            if isinstance(code, basestring):
+                code = [code]
+            for filename in code:
+                # always hash the code by content - mtime changes on checkout
+                h.update('code=%s\n' % file_hash(filename, True))
+        return h.hexdigest()
+
+    def is_current(self, outputs, signature):
+        '''
+        Returns *True* if all *outputs* exist and were built with *signature*.
+        '''
+        if len(outputs) == 0:
+            return False
+        for filename in outputs:
+            if not os.path.exists(filename):
+                return False
+            if self.entries.get(filename) != signature:
+                return False
+        return True
+
+    def update(self, outputs, signature):
+        '''
+        Stores *signature* for all existing *outputs*.
+        '''
+        for filename in outputs:
+            if os.path.exists(filename):
+                self.entries[filename] = signature
+            elif filename in self.entries:
+                del self.entries[filename]
+
+    def save(self):
+        '''
+        Writes the cache to disk (via a temporary file).
+        '''
+        tmpfile = self.cachefile + '.tmp'
+        fid = open(tmpfile, 'w')
+        json.dump(self.entries, fid, indent=0, sort_keys=True)
+        fid.close()
+        if os.path.exists(self.cachefile):
+            os.remove(self.cachefile) # os.rename does not overwrite on win32
+        os.rename(tmpfile, self.cachefile)
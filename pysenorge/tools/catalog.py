@@ -0,0 +1,354 @@
+__docformat__ = "reStructuredText"
+'''
+SQLite catalog of the seNorge products and inputs.
+
+Instead of building paths and checking them with *os.path.exists*, globbing
+for UM4 files or opening netCDF files to learn their content, the archive
+folders (*BILout*, *METdir* and *netCDFin*) are scanned once into a SQLite
+database. Files are recognised by the date at the end of their name, e.g.::
+
+    BILout/wind_10m_daily/2010/wind_speed_avg_10m_2011_02_01.bil
+        -> product "wind_speed_avg_10m", date 2011-02-01
+    netCDFin/2011/UM4_sf00_2011_02_01.nc
+        -> product "UM4_sf00", date 2011-02-01
+
+For every file the path, folder, product, date, size and modification time
+are recorded; for netCDF files also the time range and the variables. A
+repeated scan only inspects new or changed files and removes deleted ones.
+
+The queries (*dates*, *gaps*, *find*, *missing*, ...) are used by the runners
+to plan their work, e.g. *run_themes.py --catalog*.
+
+Command line usage::
+
+    python catalog.py scan [options]
+    python catalog.py products [options]
+    python catalog.py gaps PRODUCT YYYY-MM-DD YYYY-MM-DD [options]
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from optparse import OptionParser
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Own
+from pysenorge.set_environment import BILout, METdir, netCDFin, LOGdir, \
+    timeunit
+
+CATALOGfile = os.path.join(LOGdir, 'catalog.sqlite')
+
+# Folders scanned by default
+ROOTS = [BILout, METdir, netCDFin]
+
+# <product>_YYYY_MM_DD.<extension(s)>
+NAME = re.compile(r'^(?P<product>.+?)_(?P<year>\d{4})_(?P<month>\d{2})_'
+                  r'(?P<day>\d{2})\.(?P<kind>bil|nc|nc\.gz|png)$')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT,
+    product TEXT,
+    kind TEXT,
+    date TEXT,
+    size INTEGER,
+    mtime REAL,
+    time_start TEXT,
+    time_end TEXT,
+    ntimes INTEGER,
+    variables TEXT
+);
+CREATE INDEX IF NOT EXISTS files_product_date ON files (product, date);
+CREATE INDEX IF NOT EXISTS files_root ON files (root);
+'''
+
+
+def parse_name(filename):
+    '''
+    Returns the product, date (*datetime.date*) and kind ("bil", "nc",
+    "nc.gz" or "png") of *filename* or *None* if the name has no date.
+    '''
+    m = NAME.match(os.path.basename(filename))
+    if m is None:
+        return None
+    try:
+        cdt = date(int(m.group('year')), int(m.group('month')),
+                   int(m.group('day')))
+    except ValueError:
+        return None
+    return m.group('product'), cdt, m.group('kind')
+
+
+def inspect_netcdf(filename):
+    '''
+    Returns the start and end time (ISO strings), the number of time steps
+    and the variable names of the netCDF file *filename*. The times are
+    *None* if the file has no time axis or no netCDF library is available.
+    '''
+    try:
+        from pysenorge.io.nc import open_dataset, _netcdf
+        ds = open_dataset(filename, 'r')
+    except (ImportError, IOError, RuntimeError), e:
+        print "Could not open %s: %s" % (filename, e)
+        return None, None, None, None
+    try:
+        variables = sorted([str(v) for v in ds.variables.keys()])
+        if 'time' not in ds.variables:
+            return None, None, None, variables
+        time = ds.variables['time']
+        values = time[:]
+        if len(values) == 0:
+            return None, None, 0, variables
+        num2date = _netcdf()[1]
+        units = getattr(time, 'units', timeunit)
+        if num2date is None:
+            return None, None, len(values), variables
+        t0, t1 = num2date([values[0], values[-1]], units)
+        return t0.isoformat(), t1.isoformat(), len(values), variables
+    finally:
+        ds.close()
+
+
+class Catalog(object):
+    '''
+    The catalog database.
+    '''
+
+    def __init__(self, dbfile=CATALOGfile):
+        '''
+        :Parameters:
+            - dbfile: SQLite database - created if not existent
+        '''
+        self.dbfile = dbfile
+        folder = os.path.dirname(os.path.abspath(dbfile))
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.db = sqlite3.connect(dbfile)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _record(self, path, root, st):
+        product, cdt, kind = parse_name(path)
+        time_start = time_end = ntimes = variables = None
+        if kind == 'nc':
+            time_start, time_end, ntimes, variables = inspect_netcdf(path)
+            if variables is not None:
+                variables = ','.join(variables)
+        return (path, root, product, kind, cdt.isoformat(), st.st_size,
+                st.st_mtime, time_start, time_end, ntimes, variables)
+
+    def scan(self, roots=ROOTS):
+        '''
+        Brings the catalog of the folders *roots* up to date.
+
+        :Returns:
+            - Number of files added or updated and number of files removed
+        '''
+        updated = removed = 0
+        for root in roots:
+            root = os.path.normpath(root)
+            known = dict([(p, (size, mtime)) for p, size, mtime in
+                          self.db.execute("SELECT path, size, mtime FROM "
+                                          "files WHERE root=?", (root,))])
+            seen = set()
+            rows = []
+            for folder, dirs, files in os.walk(root):
+                dirs.sort()
+                for name in files:
+                    if parse_name(name) is None:
+                        continue
+                    path = os.path.join(folder, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue # removed meanwhile
+                    seen.add(path)
+                    if known.get(path) == (st.st_size, st.st_mtime):
+                        continue
+                    rows.append(self._record(path, root, st))
+                    if len(rows) >= 1000:
+                        updated += self._insert(rows)
+                        rows = []
+            updated += self._insert(rows)
+            gone = [(p,) for p in known if p not in seen]
+            self.db.executemany("DELETE FROM files WHERE path=?", gone)
+            self.db.commit()
+            removed += len(gone)
+        return updated, removed
+
+    def _insert(self, rows):
+        self.db.executemany("INSERT OR REPLACE INTO files VALUES "
+                            "(?,?,?,?,?,?,?,?,?,?,?)", rows)
+        self.db.commit()
+        return len(rows)
+
+    def add(self, paths, root=''):
+        '''
+        Records the files *paths*, e.g. outputs just written, without a scan.
+        Files which do not exist or have no date in their name are ignored.
+        '''
+        rows = []
+        for path in paths:
+            path = os.path.normpath(path)
+            if parse_name(path) is None or not os.path.exists(path):
+                continue
+            folder = root
+            for r in ROOTS:
+                if path.startswith(os.path.normpath(r) + os.sep):
+                    folder = os.path.normpath(r)
+            rows.append(self._record(path, folder, os.stat(path)))
+        return self._insert(rows)
+
+    def products(self):
+        '''
+        Returns (product, kind, number of files, first date, last date) of
+        all products.
+        '''
+        return self.db.execute(
+            "SELECT product, kind, COUNT(*), MIN(date), MAX(date) FROM files "
+            "GROUP BY product, kind ORDER BY product, kind").fetchall()
+
+    def files(self, product, start_date=None, end_date=None, kind='bil'):
+        '''
+        Returns the (date, path) of *product* between the dates (inclusive).
+        '''
+        sql = "SELECT date, path FROM files WHERE product=? AND kind=?"
+        args = [product, kind]
+        if start_date is not None:
+            sql += " AND date>=?"
+            args.append(_isodate(start_date))
+        if end_date is not None:
+            sql += " AND date<=?"
+            args.append(_isodate(end_date))
+        return self.db.execute(sql + " ORDER BY date", args).fetchall()
+
+    def dates(self, product, start_date=None, end_date=None, kind='bil'):
+        '''
+        Returns the set of ISO dates available for *product*.
+        '''
+        return set([d for d, p in self.files(product, start_date, end_date,
+                                             kind)])
+
+    def gaps(self, product, start_date, end_date, kind='bil'):
+        '''
+        Returns the ISO dates between *start_date* and *end_date* (inclusive)
+        without a file of *product*.
+        '''
+        available = self.dates(product, start_date, end_date, kind)
+        cdt = _date(start_date)
+        end = _date(end_date)
+        missing = []
+        while cdt <= end:
+            if cdt.isoformat() not in available:
+                missing.append(cdt.isoformat())
+            cdt += timedelta(days=1)
+        return missing
+
+    def find(self, product, cdt, kind='bil'):
+        '''
+        Returns the path of *product* on date *cdt* or *None*.
+        '''
+        row = self.db.execute("SELECT path FROM files WHERE product=? AND "
+                              "kind=? AND date=?",
+                              (product, kind, _isodate(cdt))).fetchone()
+        return row and row[0]
+
+    def missing(self, paths):
+        '''
+        Returns the files of *paths* which are not in the catalog.
+        '''
+        missing = []
+        for path in paths:
+            row = self.db.execute("SELECT 1 FROM files WHERE path=?",
+                                  (os.path.normpath(path),)).fetchone()
+            if row is None:
+                missing.append(path)
+        return missing
+
+    def covering(self, cdt, variable=None, product=None):
+        '''
+        Returns the netCDF files whose time range contains the time *cdt*
+        (*datetime*), optionally containing *variable* or of *product*.
+        '''
+        sql = "SELECT path, variables FROM files WHERE kind='nc' AND " \
+            "time_start<=? AND time_end>=?"
+        args = [cdt.isoformat(), cdt.isoformat()]
+        if product is not None:
+            sql += " AND product=?"
+            args.append(product)
+        rows = self.db.execute(sql + " ORDER BY date", args).fetchall()
+        return [p for p, v in rows
+                if variable is None or variable in (v or '').split(',')]
+
+    def variables(self, path):
+        '''
+        Returns the variable names of the netCDF file *path* or *None*.
+        '''
+        row = self.db.execute("SELECT variables FROM files WHERE path=?",
+                              (os.path.normpath(path),)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return row[0].split(',')
+
+
+def _date(d):
+    if isinstance(d, datetime):
+        return d.date()
+    if isinstance(d, date):
+        return d
+    return date(*[int(i) for i in d[:10].split('-')])
+
+
+def _isodate(d):
+    return _date(d).isoformat()
+
+
+def main():
+    usage = """usage: python catalog.py scan [FOLDER ...] [options]
+       python catalog.py products [options]
+       python catalog.py gaps PRODUCT YYYY-MM-DD YYYY-MM-DD [options]"""
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-c", "--catalog",
+                      action="store", dest="dbfile", type="string",
+                      metavar="FILE", default=CATALOGfile,
+                      help="SQLite database - default: %s" % CATALOGfile)
+    parser.add_option("-k", "--kind",
+                      action="store", dest="kind", type="string",
+                      default="bil",
+                      help="File kind for gaps: bil, nc, nc.gz or png (default=bil)")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) == 0:
+        parser.error("Please provide a command: scan, products or gaps!")
+    command = args[0]
+    catalog = Catalog(options.dbfile)
+    try:
+        if command == 'scan':
+            roots = args[1:] or ROOTS
+            updated, removed = catalog.scan(roots)
+            print "%i files added or updated, %i removed" % (updated, removed)
+        elif command == 'products':
+            for row in catalog.products():
+                print "%-40s %-6s %7i %s - %s" % row
+        elif command == 'gaps' and len(args) == 4:
+            for d in catalog.gaps(args[1], args[2], args[3], options.kind):
+                print d
+        else:
+            parser.error("Unknown command or wrong arguments!")
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
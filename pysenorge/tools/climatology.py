@@ -0,0 +1,379 @@
+__docformat__ = "reStructuredText"
+'''
+Per-pixel day-of-year climatologies and percentiles of seNorge products.
+
+Anomaly maps ("today's maximum wind compared to the 1990-2020 percentiles
+for this date") need for every cell and day of the year the distribution of
+the values of that day over decades. The statistics are computed from the
+product archive (see *archive.py*, which must be ingested first) in two
+passes:
+
+    1. The grid is split into tiles of *TILE* x *TILE* cells, aligned with
+       the archive chunks. A pool of processes reads the full history of a
+       tile, computes the statistics of each day of the year from the
+       values within +- *WINDOW* days over all years and saves them to a
+       temporary file. Tiles outside Norway are skipped. The memory per
+       process is bounded by the history of one tile (about 90 MB for 30
+       years of uint16 values).
+    2. The tile results are combined into one compressed chunk per day of
+       the year holding all statistics of the entire grid.
+
+Statistics: "mean", "std" and percentiles as "p<q>", e.g. "p90". They are
+stored in the data-type and units of the BIL files (rounded) in a Zarr
+(version 2) array of shape (365, statistics, rows, cols)::
+
+    CLIMATOLOGYdir/<product>_<first year>_<last year>/
+
+29 February is counted as 28 February. A theme looks up the statistics of
+a date with one read::
+
+    clim = Climatology('wind_10m_daily:wind_speed_max_10m', 1990, 2020)
+    p90 = clim.lookup(cdt)['p90']
+
+Command line usage::
+
+    python climatology.py PRODUCT FIRST_YEAR LAST_YEAR [options]
+
+Example::
+
+    python climatology.py wind_10m_daily:wind_speed_max_10m 1990 2020 -s mean,p50,p90,p99 -j 8
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import shutil
+import calendar
+import tempfile
+from datetime import date
+from optparse import OptionParser
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+import numpy as np
+from numpy import float32, float64, nan
+
+# Own
+from pysenorge.set_environment import BILout
+from pysenorge.tools.archive import ARCHIVEdir, SPACE_CHUNK, ProductArchive, \
+    ZarrArray
+from pysenorge.tools.tiling import n_threads
+
+CLIMATOLOGYdir = os.path.join(BILout, 'climatology')
+
+DEFAULT_STATS = ['mean', 'p10', 'p50', 'p90']
+# Tile size in cells - equal to the chunks of the archive
+TILE = SPACE_CHUNK
+# Days before and after the day of the year included in its statistics
+WINDOW = 7
+# Number of days of the year
+NDOY = 365
+
+
+def doy_index(cdt):
+    '''
+    Returns the day of the year of *cdt* as index 0..364; 29 February has
+    the index of 28 February.
+    '''
+    d = cdt.timetuple().tm_yday - 1
+    if calendar.isleap(cdt.year) and d >= 59:
+        d -= 1
+    return d
+
+
+def check_stats(stats):
+    for stat in stats:
+        if stat in ('mean', 'std'):
+            continue
+        try:
+            q = float(stat[1:])
+        except ValueError:
+            q = -1.0
+        if not stat.startswith('p') or not 0.0 <= q <= 100.0:
+            raise ValueError("Unknown statistic '%s'" % stat)
+
+
+def doy_statistics(values, doys, stats, window=WINDOW):
+    '''
+    Computes the statistics of every day of the year.
+
+    :Parameters:
+        - values: (days, rows, cols) array with NaN as no-data
+        - doys: Day of the year index of every day
+        - stats: Names of the statistics
+        - window: Days before and after each day included
+
+    :Returns:
+        - float32 array (365, statistics, rows, cols) - NaN where no value
+    '''
+    result = np.empty((NDOY, len(stats)) + values.shape[1:], dtype=float32)
+    I, J = np.indices(values.shape[1:])
+    for d in xrange(NDOY):
+        dist = np.abs(doys - d)
+        dist = np.minimum(dist, NDOY - dist)
+        sample = values[dist <= window]
+        finite = np.isfinite(sample)
+        count = finite.sum(axis=0)
+        empty = count == 0
+        safe = np.maximum(count, 1)
+        total = np.where(finite, sample, 0.0).sum(axis=0, dtype=float64)
+        ordered = None
+        for s, stat in enumerate(stats):
+            if stat == 'mean':
+                value = total / safe
+            elif stat == 'std':
+                sq = np.where(finite, sample, 0.0)**2
+                mean = total / safe
+                value = np.sqrt(np.maximum(sq.sum(axis=0, dtype=float64) /
+                                           safe - mean**2, 0.0))
+            else:
+                if ordered is None:
+                    ordered = np.sort(sample, axis=0) # NaN go last
+                q = float(stat[1:]) / 100.0
+                pos = q * (safe - 1)
+                lo = np.floor(pos).astype(int)
+                hi = np.minimum(lo + 1, safe - 1)
+                frac = pos - lo
+                value = ordered[lo, I, J]*(1.0-frac) + ordered[hi, I, J]*frac
+            value = np.asarray(value, dtype=float32)
+            value[empty] = nan
+            result[d, s] = value
+    return result
+
+
+def _tile_task(args):
+    '''
+    Computes the statistics of one tile and saves them as *.npy* file in
+    the data-type of the archive (pass 1). Runs in a worker process.
+    '''
+    name, archivedir, rows, cols, start, end, stats, window, tmpfile = args
+    archive = ProductArchive(name, archivedir)
+    dates, raw = archive.series(rows, cols, start, end, physical=False)
+    values = raw.astype(float32)
+    del raw
+    values[values == archive.series_array.fill_value] = nan
+    doys = np.array([doy_index(d) for d in dates])
+    result = doy_statistics(values, doys, stats, window)
+    del values
+    dt = archive.series_array.dtype
+    nodata = np.isnan(result)
+    if dt.kind in 'iu':
+        info = np.iinfo(dt)
+        result = np.clip(np.round(result), info.min, info.max)
+    result = result.astype(dt)
+    result[nodata] = archive.series_array.fill_value
+    np.save(tmpfile, result)
+    return rows, cols, tmpfile
+
+
+def compute_climatology(name, first_year, last_year, stats=DEFAULT_STATS,
+                        window=WINDOW, processes=None, archivedir=ARCHIVEdir,
+                        outdir=CLIMATOLOGYdir, mask=None):
+    '''
+    Computes the climatology of *name* from the archive and stores it.
+
+    :Parameters:
+        - name: Product as accepted by *point_extraction.get_source*
+        - first_year, last_year: Period (calendar years)
+        - stats: Names of the statistics
+        - window: Days before and after each day of the year included
+        - processes: Size of the process pool - default: see *n_threads*
+        - archivedir: Root folder of the archive
+        - outdir: Root folder of the climatologies
+        - mask: seNorge no-data mask - default: *grid.senorge_mask*
+
+    :Returns:
+        - The *Climatology*
+    '''
+    check_stats(stats)
+    archive = ProductArchive(name, archivedir)
+    if archive.series_array is None:
+        raise IOError("No archive of %s in %s - run archive.py first" %
+                      (name, archivedir))
+    if mask is None:
+        from pysenorge.grid import senorge_mask
+        mask = senorge_mask()
+    if processes is None:
+        processes = n_threads()
+    start = date(first_year, 1, 1)
+    end = date(last_year, 12, 31)
+    nrows, ncols = archive.series_array.shape[1:]
+
+    tmpdir = tempfile.mkdtemp(prefix='climatology_')
+    try:
+        tasks = []
+        for r in xrange(0, nrows, TILE):
+            for c in xrange(0, ncols, TILE):
+                if mask[r:r+TILE, c:c+TILE].all():
+                    continue # outside Norway
+                rows = (r, min(r + TILE, nrows))
+                cols = (c, min(c + TILE, ncols))
+                tasks.append((name, archivedir, rows, cols, start, end,
+                              stats, window,
+                              os.path.join(tmpdir, "%i_%i.npy" % (r, c))))
+        # pass 1: statistics of the tiles
+        if processes > 1 and len(tasks) > 1:
+            pool = Pool(processes)
+            try:
+                tiles = pool.map(_tile_task, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            tiles = map(_tile_task, tasks)
+
+        # pass 2: one chunk per day of the year
+        clim = Climatology(name, first_year, last_year, outdir)
+        attrs = {'name': name, 'years': [first_year, last_year],
+                 'window': window, 'stats': stats,
+                 'scale': archive.source.scale,
+                 'offset': archive.source.offset}
+        array = ZarrArray.create(clim.path, (NDOY, len(stats), nrows, ncols),
+                                 (1, len(stats), nrows, ncols),
+                                 archive.series_array.dtype,
+                                 np.asarray(archive.series_array.fill_value,
+                                            archive.series_array.dtype),
+                                 attrs)
+
+        def write_doy(d):
+            chunk = array._empty((1, len(stats), nrows, ncols))
+            for rows, cols, tmpfile in tiles:
+                tile = np.load(tmpfile, mmap_mode='r')
+                chunk[0, :, rows[0]:rows[1], cols[0]:cols[1]] = tile[d]
+                del tile
+            array.write_chunk((d, 0, 0, 0), chunk)
+
+        pool = ThreadPool(max(processes, 1))
+        try:
+            pool.map(write_doy, range(NDOY))
+        finally:
+            pool.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return Climatology(name, first_year, last_year, outdir)
+
+
+class Climatology(object):
+    '''
+    Lookup of the stored statistics of a product.
+    '''
+
+    def __init__(self, name, first_year, last_year, outdir=CLIMATOLOGYdir):
+        self.name = name
+        self.path = os.path.join(outdir, "%s_%i_%i" % (name.split(':')[-1],
+                                                       first_year, last_year))
+        self.array = None
+        self._last = (None, None)
+
+    def _array(self):
+        if self.array is None:
+            if not os.path.exists(os.path.join(self.path, '.zarray')):
+                raise IOError("No climatology in %s - run climatology.py "
+                              "first" % self.path)
+            self.array = ZarrArray(self.path)
+        return self.array
+
+    @property
+    def stats(self):
+        return self._array().attrs['stats']
+
+    def lookup(self, cdt, physical=True):
+        '''
+        Returns the statistics of the day of the year of *cdt* as dictionary
+        of grids (BIL orientation). One chunk is read per day of the year.
+
+        :Parameters:
+            - cdt: *date* or *datetime*
+            - physical: Return physical values with NaN as no-data instead
+                of the raw values
+        '''
+        array = self._array()
+        d = doy_index(cdt)
+        if self._last[0] != d:
+            self._last = (d, array.read_chunk((d, 0, 0, 0))[0])
+        raw = self._last[1]
+        scale = array.attrs['scale']
+        offset = array.attrs['offset']
+        result = {}
+        for s, stat in enumerate(array.attrs['stats']):
+            if not physical:
+                result[stat] = raw[s].copy()
+                continue
+            data = raw[s].astype(float32) * scale
+            if stat != 'std':
+                data += offset
+            data[raw[s] == array.fill_value] = nan
+            result[stat] = data
+        return result
+
+    def anomaly(self, data, cdt, stat='mean'):
+        '''
+        Returns *data* (physical values) minus the statistic *stat* of the
+        day of the year of *cdt*.
+        '''
+        return data - self.lookup(cdt)[stat]
+
+    def exceedance(self, data, cdt):
+        '''
+        Returns the highest stored percentile exceeded by *data* at every
+        cell, 0 if none, NaN where *data* or the climatology is no-data.
+        '''
+        clim = self.lookup(cdt)
+        result = np.zeros(np.shape(data), dtype=float32)
+        qs = sorted([(float(s[1:]), s) for s in clim if s.startswith('p')])
+        for q, stat in qs:
+            p = clim[stat]
+            result[data > p] = q
+            result[np.isnan(p)] = nan
+        result[np.isnan(data)] = nan
+        return result
+
+
+def main():
+    usage = "usage: python climatology.py PRODUCT FIRST_YEAR LAST_YEAR [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-s", "--stats",
+                      action="store", dest="stats", type="string",
+                      default=",".join(DEFAULT_STATS),
+                      help="Comma separated list of statistics - default: %s" %
+                      ",".join(DEFAULT_STATS))
+    parser.add_option("-w", "--window",
+                      action="store", dest="window", type="int",
+                      default=WINDOW,
+                      help="Days before and after each day of the year included (default=%i)" % WINDOW)
+    parser.add_option("-j", "--processes",
+                      action="store", dest="processes", type="int", default=None,
+                      help="Number of processes - default: $PYSENORGE_THREADS or number of CPUs")
+    parser.add_option("-a", "--archivedir",
+                      action="store", dest="archivedir", type="string",
+                      metavar="DIR", default=ARCHIVEdir,
+                      help="Archive folder - default: %s" % ARCHIVEdir)
+    parser.add_option("-o", "--outdir",
+                      action="store", dest="outdir", type="string",
+                      metavar="DIR", default=CLIMATOLOGYdir,
+                      help="Output folder - default: %s" % CLIMATOLOGYdir)
+
+    (options, args) = parser.parse_args()
+
+    if len(args) != 3:
+        parser.error("Please provide the product, first and last year!")
+    stats = [s.strip() for s in options.stats.split(',')]
+    try:
+        check_stats(stats)
+    except ValueError, e:
+        parser.error(str(e))
+
+    clim = compute_climatology(args[0], int(args[1]), int(args[2]), stats,
+                               options.window, options.processes,
+                               options.archivedir, options.outdir)
+    print "Climatology written to %s" % clim.path
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 '''
-Doc...
+Cloning of met.no UM4 netCDF files and insertion of data from other UM4 files.
 
 @author: kmu
 @since: 16. nov. 2010
@@ -8,29 +8,53 @@ Doc...
 import time
 import datetime
 # Additional
-from numpy import arange
+from numpy import arange, asarray, diff
 from netCDF4 import Dataset, num2date, date2num
 # Own
 from pysenorge.tools.date_converters import iso2datetime
 from pysenorge.set_environment import timeunit, default_UM4_width,\
                     default_UM4_height
+from pysenorge.tools.gcompression import gopen
 
-def cloneUM4(masterfile, newfile, startdate='copy', tn=24, dt=3600.0):
+def _copy_attrs(source, target):
+    """
+    Copies all netCDF attributes except I{_FillValue} from I{source} to
+    I{target}.
+    """
+    for attr in source.ncattrs():
+        if attr != '_FillValue':
+            target.setncattr(attr, source.getncattr(attr))
+
+
+def cloneUM4(masterfile, newfile, startdate='copy', tn=24, dt=3600.0,
+             variables=None, zlib=False, complevel=4):
     """
     Creates a new UM4 netCDF file based on a master file.
     
     Convention: Climate and Forecast (CF) version 1.4
     
-    @param secs: in seconds since 1970-01-01 00:00:00
+    @param masterfile: UM4 file serving as template - may be gzipped.
+    @param newfile: Name of the new file.
+    @param startdate: End date of the new time axis in ISO format or "copy" to
+        use 06:00 UTC of the first date in the master file.
+    @param tn: Number of time steps.
+    @param dt: Time step in seconds.
+    @param variables: List of the variables to clone - default: all.
+    @param zlib: If I{True} the file is stored as compressed NETCDF4_CLASSIC
+        instead of NETCDF3_CLASSIC.
+    @param complevel: zlib compression level (1-9).
     """
     print "Started cloning %s as %s" % (masterfile, newfile)
     
     # open master file
-    master = Dataset(masterfile, 'r')
+    master = gopen(masterfile)
     Mdimensions = master.dimensions.keys()         
         
     # create new file
-    rootgrp = Dataset(newfile, 'w', format='NETCDF3_CLASSIC')
+    if zlib:
+        rootgrp = Dataset(newfile, 'w', format='NETCDF4_CLASSIC')
+    else:
+        rootgrp = Dataset(newfile, 'w', format='NETCDF3_CLASSIC')
     
     # add root dimensions
     rootgrp.createDimension('time', size=tn)
@@ -90,17 +114,67 @@ def cloneUM4(masterfile, newfile, startdate='copy', tn=24, dt=3600.0):
     
     for var in master.variables.keys():
         # exclude the variables referring to dimensions
-        if var not in Mdimensions:
-            exec("M%s = master.variables['%s']" % (var, var))
-            exec("print 'Cloning %s', master.variables['%s'].dimensions" % (var, var))
-            exec("_%s = rootgrp.createVariable('%s', M%s.dtype, M%s.dimensions)" % (var, var, var, var))
-            exec("""for attr in M%s.ncattrs():\n\t_%s.setncattr(attr, M%s.getncattr(attr))""" % (var, var, var))
+        if var in Mdimensions:
+            continue
+        if variables is not None and var not in variables:
+            continue
+        Mvar = master.variables[var]
+        print 'Cloning %s' % var, Mvar.dimensions
+        if '_FillValue' in Mvar.ncattrs():
+            fill_value = Mvar.getncattr('_FillValue')
+        else:
+            fill_value = None
+        _var = rootgrp.createVariable(var, Mvar.dtype, Mvar.dimensions,
+                                      zlib=zlib, complevel=complevel,
+                                      fill_value=fill_value)
+        _copy_attrs(Mvar, _var)
 
     rootgrp.close()
     master.close()
     print "Cloning completed!"
 
 
+def _as_slice(ndx):
+    """
+    Returns a slice if the integer index array I{ndx} is contiguous and
+    increasing, otherwise the index array itself.
+    """
+    ndx = asarray(ndx, int)
+    if len(ndx) > 0 and (diff(ndx) == 1).all():
+        return slice(ndx[0], ndx[-1]+1)
+    return ndx
+
+
+def insertUM4(target, master, mndx, tndx, variables=None):
+    """
+    Inserts data from a master file into a cloned UM4 file.
+    
+    Each variable is copied with one read and one write (a slab of
+    contiguous time steps) instead of hour by hour.
+    
+    @param target: netCDF4 I{Dataset} opened in append mode (see L{cloneUM4}).
+    @param master: netCDF4 I{Dataset} containing the prognosis.
+    @param mndx: Time indices of the master file.
+    @param tndx: Time indices of the target file, same length as I{mndx}.
+    @param variables: List of the variables to copy - default: all variables
+        with dimensions (time, rlat, rlon) present in both files.
+    """
+    if len(mndx) == 0:
+        return
+    msl = _as_slice(mndx)
+    tsl = _as_slice(tndx)
+    
+    for var in target.variables.keys():
+        if variables is not None and var not in variables:
+            continue
+        if var not in master.variables:
+            continue
+        if target.variables[var].dimensions != ("time", "rlat", "rlon"):
+            continue
+        print "Inserting %s data" % var
+        target.variables[var][tsl,:,:] = master.variables[var][msl,:,:]
+
+
 
 if __name__ == '__main__':
     pass
\ No newline at end of file
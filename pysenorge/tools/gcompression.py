@@ -8,23 +8,32 @@ De/Compress files using the gzip library.
 import os
 import gzip
 import time
+import struct
+import shutil
 
+# Size of the blocks read from/written to the gzip streams [bytes]
+CHUNKSIZE = 4 * 1024 * 1024
+# Largest uncompressed file that will be kept in memory [bytes]
+MEMLIMIT = 1024 * 1024 * 1024
 
-def gdecompress(filename, gzremove=False):
+
+def gdecompress(filename, gzremove=False, chunksize=CHUNKSIZE):
     """
     Unzips the file I{filename}.
     
+    The file is streamed in blocks of I{chunksize} bytes, so the memory use
+    does not depend on the size of the file.
+    
     @param filename: Gzipped file
     @param gzremove: Boolean, if I{True} the original zip file will be deleted. 
+    @param chunksize: Size of the blocks copied at a time [bytes].
     """
     fileObj = gzip.GzipFile(filename, 'rb');
-    fileContent = fileObj.readlines();
-    fileObj.close()
-    
     newname = filename.replace('.gz','')
     fileObjOut = file(newname, 'wb');
-    fileObjOut.writelines(fileContent)
+    shutil.copyfileobj(fileObj, fileObjOut, chunksize)
     fileObjOut.close()
+    fileObj.close()
     
     statinfo = os.stat(newname)
     print "Unzipped file: %s" % os.path.abspath(filename)
@@ -32,23 +41,109 @@ def gdecompress(filename, gzremove=False):
     print "Time of last access:", time.ctime(statinfo.st_atime)
     
     if gzremove:
-        os.system("rm %s" % filename)
+        os.remove(filename)
         
     return newname
     
     
-def gcompress(filename, outdir=os.getcwd()):
+def gsize(filename):
+    """
+    Returns the uncompressed size of the gzipped file I{filename}.
+
+    The size is read from the ISIZE field at the end of the file and is only
+    correct modulo 2**32, i.e. it should be treated as a hint.
+
+    @param filename: Gzipped file
+    @return: Uncompressed size [bytes]
+    """
+    fid = open(filename, 'rb')
+    fid.seek(-4, os.SEEK_END)
+    isize = struct.unpack('<I', fid.read(4))[0]
+    fid.close()
+    return isize
+
+
+def gread(filename, memlimit=MEMLIMIT, chunksize=CHUNKSIZE):
+    """
+    Decompresses the file I{filename} into memory.
+
+    The data is read into a buffer allocated once with the size given by the
+    gzip trailer (see L{gsize}), so the peak memory use is the size of the
+    uncompressed data.
+
+    @param filename: Gzipped file
+    @param memlimit: Maximum number of uncompressed bytes kept in memory.
+    @param chunksize: Size of the blocks read at a time [bytes].
+
+    @return: I{bytearray} containing the uncompressed data or I{None} if the
+        data exceeds I{memlimit}.
+    """
+    size = gsize(filename)
+    if size > memlimit:
+        return None
+
+    buf = bytearray(size)
+    fileObj = gzip.GzipFile(filename, 'rb')
+    nbytes = 0
+    try:
+        while True:
+            chunk = fileObj.read(chunksize)
+            if not chunk:
+                break
+            if nbytes + len(chunk) > size:
+                # ISIZE wrapped around - the file is larger than 4 GB
+                return None
+            buf[nbytes:nbytes+len(chunk)] = chunk
+            nbytes += len(chunk)
+    finally:
+        fileObj.close()
+    if nbytes != size:
+        raise IOError("%s: %i of %i bytes decompressed" %
+                      (filename, nbytes, size))
+    return buf
+
+
+def gopen(filename, memlimit=MEMLIMIT, chunksize=CHUNKSIZE):
+    """
+    Opens a gzipped netCDF file without writing the uncompressed file to disk.
+
+    The file is decompressed into memory and handed to I{netCDF4.Dataset}.
+    Files larger than I{memlimit} are decompressed to disk next to the
+    gzipped file using L{gdecompress} and opened from there.
+
+    @param filename: Gzipped netCDF file
+    @param memlimit: Maximum number of uncompressed bytes kept in memory.
+    @param chunksize: Size of the blocks read at a time [bytes].
+
+    @return: I{netCDF4.Dataset} opened in read mode.
+
+    @requires: netCDF4 module built with in-memory support.
+    """
+    from netCDF4 import Dataset
+
+    if not filename.endswith('.gz'):
+        return Dataset(filename, 'r')
+
+    buf = gread(filename, memlimit, chunksize)
+    if buf is None:
+        print "%s exceeds the memory limit - unzipping to disk..." % filename
+        return Dataset(gdecompress(filename, chunksize=chunksize), 'r')
+    return Dataset(filename.replace('.gz',''), 'r', memory=buf)
+
+
+def gcompress(filename, outdir=os.getcwd(), chunksize=CHUNKSIZE):
     """
     Gzips the file I{filename}.
     
     @param filename: The file(path) to be gzipped.
     @param outdir: Folder where the zipped file is stored - default=current.
+    @param chunksize: Size of the blocks copied at a time [bytes].
     """
     fileObj = open(filename, 'rb')
     fileObjOut = gzip.open(os.path.join(outdir,
                                         os.path.basename(filename)+'.gz'),
                                         'wb')
-    fileObjOut.writelines(fileObj)
+    shutil.copyfileobj(fileObj, fileObjOut, chunksize)
     fileObjOut.close()
     fileObj.close()
     
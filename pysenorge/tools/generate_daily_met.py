@@ -5,12 +5,12 @@ The script scans through the met input folder and gets a list of netcdf files
 with data in the valid time frame.
 It determines the earliest date and 06:00 UTC timestamp (- spin-up).
 If no output netcdf file exist it clones the structure of the input file.
-It fills all variables for the given time range and proceeds to the next input
-file.
+It fills all variables (or the subset given by I{--variables}) for the given
+time range with one slab copy per variable and proceeds to the next input file.
 When 24 h are filled the process starts over again.
 
-@note: The name of the .gz files differs from the unzipped file name.\
-Use L{gdecompress} to extract the zipped files!
+@note: Gzipped files (.nc.gz) are read from memory without unzipping them
+to disk - see L{gopen}.
 
 @author: kmu
 @since: 28. okt. 2010
@@ -28,10 +28,10 @@ from netCDF4 import Dataset, date2num, num2date
 from numpy import arange, where, asarray
 # Own
 from pysenorge.set_environment import timeunit, netCDFout
-from pysenorge.tools.clone_netCDF import cloneUM4
-from pysenorge.tools.gcompression import gdecompress
+from pysenorge.tools.clone_netCDF import cloneUM4, insertUM4
+from pysenorge.tools.gcompression import gopen
 from pysenorge.tools.date_converters import iso2datetime, datetime2UMdate
-from pysenorge.io.nc import UM4Dataset, NCreport
+from pysenorge.io.nc import NCreport
 # Setup input parser
 usage = "usage: python generate_daily_met.py YYYY-MM-DD [options]"
 
@@ -64,6 +64,16 @@ parser.add_option("--clone",
                   action="store_true", dest="clone", default=False,
                   help="Clone the last netCDF file and fill with 24h of data")
 
+parser.add_option("-v", "--variables", 
+                  action="store", dest="variables", type="string",
+                  default=None,
+                  help="Comma separated list of variables to be extracted,\
+                  e.g. x_wind,y_wind - default: all")
+
+parser.add_option("--zip",
+                  action="store_true", dest="zip", default=False,
+                  help="Store the output as compressed NETCDF4_CLASSIC file")
+
 (options, args) = parser.parse_args()
 
 #===============================================================================
@@ -87,6 +97,9 @@ else:
     options.idstr = "sf"
     print """Unknown ID string - using default "sf" """
 
+if options.variables is not None:
+    options.variables = [v.strip() for v in options.variables.split(',')]
+
 if options.wdir != os.getcwd():
     os.chdir(options.wdir)
 
@@ -130,25 +143,27 @@ for file in gzum4files:
         if ncdate in file:
             gzmetfiles.append(file)
 print metfiles, gzmetfiles
-# unzip if necessary
+# use the gzipped file if there is no unzipped one
 for file in gzmetfiles:
     if os.path.splitext(file)[0] not in metfiles:
-        print "Unzipping %s..." % file 
-        metfiles.append(gdecompress(file))
+        metfiles.append(file)
         
 metfiles.sort(key=lambda file: file[9:19]) # sorts the file by date only
-print metfiles[-1][:6]+metfiles[-1][8:]    
+lastfile = metfiles[-1].replace('.gz', '')
+print lastfile[:6]+lastfile[8:]    
 
 
 if options.clone:
     # Create 24h data file from most up-to-date data in the metfiles.   
-    clonefile = metfiles[-1][:6]+metfiles[-1][8:]
+    clonefile = lastfile[:6]+lastfile[8:]
     if not os.path.isfile(clonefile):
         if options.idstr == 'ml':
-            cloneUM4(metfiles[-1], clonefile, tn=4, dt=21600.0)
+            cloneUM4(metfiles[-1], clonefile, tn=4, dt=21600.0,
+                     variables=options.variables, zlib=options.zip)
         else:
-            cloneUM4(metfiles[-1], clonefile)
-    ncdata = UM4Dataset(clonefile, 'a')
+            cloneUM4(metfiles[-1], clonefile,
+                     variables=options.variables, zlib=options.zip)
+    ncdata = Dataset(clonefile, 'a')
     newtimes = num2date(ncdata.variables['time'][:], timeunit)#.tolist()
     print newtimes
     
@@ -161,7 +176,7 @@ if options.clone:
     
     for file in metfiles:
         # read the prognosis file
-        ds = Dataset(file, 'r')
+        ds = gopen(file)
         # get relevant times
         dst = ds.variables['time'][i:j]
         # convert to datetime for comparison
@@ -179,6 +194,7 @@ if options.clone:
         mndx = asarray(mndx, int)
         print mndx, tndx
         # requires index for target file and index for master files
-        ncdata.insert(ds, mndx, tndx)
+        insertUM4(ncdata, ds, mndx, tndx, options.variables)
+        ds.close()
     
     ncdata.close()
\ No newline at end of file
@@ -0,0 +1,260 @@
+__docformat__ = 'reStructuredText'
+'''
+Per-stage timing and memory instrumentation of theme runs.
+
+A *run* is started for a theme and a date. While a run is active every
+*stage* records
+
+    - wall time and CPU time (user + system) [s],
+    - bytes read and written (reported by the I/O classes via *add_bytes*),
+    - the peak resident set size of the process at the end of the stage [MB].
+
+Stages can be nested; the report lists them in the order they finished
+together with their parent. When the run finishes a JSON report is written
+to *REPORTdir/<theme>/<theme>_<date>.json*.
+
+Outside a run all functions are no-ops, so instrumented library code (e.g.
+*grid.interpolate* or *BILdata.read*) costs nothing when used interactively.
+
+Usage in a theme script::
+
+    from pysenorge.tools.instrumentation import instrumented_main, stage, timed
+
+    @timed('model')
+    def model(x_wind, y_wind):
+        ...
+
+    @instrumented_main('wind_10m_daily')
+    def main():
+        (options, args) = parser.parse_args()
+        set_run_date(args[0])
+        with stage('read_um4'):
+            ...
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import sys
+import time
+import json
+import socket
+import threading
+
+# Own
+from pysenorge.set_environment import LOGdir
+from pysenorge.tools.profiler import profile_enabled, profile_call
+
+# Default folder of the run reports
+REPORTdir = os.path.join(LOGdir, 'reports')
+
+# The active run (None if no run is active)
+_run = None
+
+
+def _active():
+    '''
+    Returns the active run if called from the thread that started it. Stages
+    in worker threads (e.g. tiles, see *tiling*) are not recorded.
+    '''
+    if _run is not None and _run.thread is threading.currentThread():
+        return _run
+    return None
+
+
+def _cpu_time():
+    t = os.times()
+    return t[0] + t[1]
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None # not available on Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss / 1048576.0
+    return rss / 1024.0
+
+
+class Stage(object):
+    '''
+    Context manager measuring one stage of a run.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        run = _active()
+        if run is not None:
+            run.stack.append(self)
+        self.cpu0 = _cpu_time()
+        self.t0 = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        wall = time.time() - self.t0
+        cpu = _cpu_time() - self.cpu0
+        run = _active()
+        if run is None or self not in run.stack:
+            return False
+        run.stack.remove(self)
+        if len(run.stack) > 0:
+            parent = run.stack[-1]
+            parent.bytes_read += self.bytes_read
+            parent.bytes_written += self.bytes_written
+            parent_name = parent.name
+        else:
+            parent_name = None
+        run.stages.append({'stage': self.name,
+                            'parent': parent_name,
+                            'wall_seconds': round(wall, 6),
+                            'cpu_seconds': round(cpu, 6),
+                            'bytes_read': self.bytes_read,
+                            'bytes_written': self.bytes_written,
+                            'peak_rss_mb': _peak_rss_mb(),
+                            'failed': exc_type is not None})
+        return False
+
+
+class Run(object):
+    '''
+    Collects the stages of one theme run.
+    '''
+
+    def __init__(self, theme, date):
+        self.theme = theme
+        self.date = date
+        self.stages = []
+        self.stack = []
+        self.thread = threading.currentThread()
+        self.started = time.time()
+
+    def report(self):
+        '''
+        Returns the run report as dictionary.
+        '''
+        return {'theme': self.theme,
+                'date': self.date,
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                         time.localtime(self.started)),
+                'argv': sys.argv,
+                'stages': self.stages}
+
+
+def stage(name):
+    '''
+    Returns a context manager measuring the stage *name*.
+    '''
+    return Stage(name)
+
+
+def timed(name):
+    '''
+    Decorator measuring each call of the decorated function as stage *name*.
+    '''
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            if _active() is None:
+                return func(*args, **kwargs)
+            with Stage(name):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__module__ = func.__module__
+        return wrapper
+    return decorator
+
+
+def add_bytes(read=0, written=0):
+    '''
+    Adds I/O volume to the innermost active stage.
+    '''
+    run = _active()
+    if run is not None and len(run.stack) > 0:
+        run.stack[-1].bytes_read += read
+        run.stack[-1].bytes_written += written
+
+
+def start_run(theme, date):
+    '''
+    Starts recording a run of *theme* for *date* (ISO string).
+    '''
+    global _run
+    _run = Run(theme, date)
+    return _run
+
+
+def set_run_date(date):
+    '''
+    Sets the date (ISO string) of the active run, e.g. once a theme script
+    has parsed its command line.
+    '''
+    if _run is not None:
+        _run.date = date
+
+
+def finish_run(reportdir=None):
+    '''
+    Stops recording and writes the JSON report.
+
+    :Returns:
+        - Path of the report file or *None* if no run was active
+    '''
+    global _run
+    if _run is None:
+        return None
+    run = _run
+    _run = None
+    if reportdir is None:
+        reportdir = os.path.join(REPORTdir, run.theme)
+    try:
+        if not os.path.exists(reportdir):
+            os.makedirs(reportdir)
+        filename = os.path.join(reportdir, '%s_%s.json' %
+                                (run.theme, str(run.date).replace('-', '_')))
+        fid = open(filename, 'w')
+        json.dump(run.report(), fid, indent=1)
+        fid.close()
+    except (IOError, OSError), e:
+        print "Could not write run report: %s" % e
+        return None
+    return filename
+
+
+def instrumented_main(theme):
+    '''
+    Decorator for the *main()* function of a theme script.
+
+    Starts a run for *theme*, measures *main()* as stage "main" and writes
+    the report when *main()* returns, raises or exits. *main()* sets the date
+    of the run with *set_run_date* after parsing its command line - the
+    report and profile are "undated" otherwise. If profiling is requested
+    (see *tools.profiler*) *main()* runs under the profiler.
+    '''
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            profile = profile_enabled()
+            run = start_run(theme, 'undated')
+            try:
+                with Stage('main'):
+                    if profile:
+                        return profile_call(theme, lambda: run.date, func,
+                                            *args, **kwargs)
+                    return func(*args, **kwargs)
+            finally:
+                filename = finish_run()
+                if filename is not None:
+                    print "Run report written to %s" % filename
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__module__ = func.__module__
+        return wrapper
+    return decorator
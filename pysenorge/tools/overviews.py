@@ -0,0 +1,227 @@
+__docformat__ = "reStructuredText"
+'''
+Overviews and thumbnails of seNorge products.
+
+The 1 km grid is reduced to coarser levels (default 2, 5 and 10 km) by
+reducing blocks of *factor* x *factor* cells with a strided reshape - no loop
+over the blocks. Methods:
+
+    - mean: average of the valid cells
+    - max: maximum of the valid cells (e.g. wind gusts)
+    - mode: most frequent value (classified themes, e.g. wind direction)
+
+Blocks without valid cells are NaN. The overviews are cached as
+*<BIL file>_ov<factor>km_<method>.npy* next to the BIL file and recomputed
+only if the BIL file is newer. Thumbnails are rendered through the colour
+look-up table (CLT) of the product into
+*<BIL file>_thumb<factor>km_<method>.png* without *Matplotlib*.
+
+Command line usage::
+
+    python overviews.py PRODUCT YYYY-MM-DD [YYYY-MM-DD] [options]
+
+Example::
+
+    python overviews.py wind_1500m_daily 2011-02-01 -f 5,10 --thumbnails
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+from datetime import timedelta
+from optparse import OptionParser
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+import numpy as np
+from numpy import nan, inf, float32
+
+# Own
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.point_extraction import get_source, read_grid, \
+    source_filename
+
+# Reduction factors (cell size in km) built by default
+FACTORS = [2, 5, 10]
+
+METHODS = ('mean', 'max', 'mode')
+
+
+def default_method(name):
+    '''
+    Returns the reduction method suited for the product *name*.
+    '''
+    if 'direction' in name:
+        return 'mode'
+    if 'max' in name:
+        return 'max'
+    return 'mean'
+
+
+def _blocks(data, factor):
+    '''
+    Returns *data* as (rows, cols, factor*factor) array of blocks. The grid is
+    padded with NaN to a multiple of *factor*.
+    '''
+    rows = -(-data.shape[0] // factor)
+    cols = -(-data.shape[1] // factor)
+    padded = np.empty((rows*factor, cols*factor), dtype=float32)
+    padded[:] = nan
+    padded[:data.shape[0], :data.shape[1]] = data
+    blocks = padded.reshape((rows, factor, cols, factor)).swapaxes(1, 2)
+    return blocks.reshape((rows, cols, factor*factor))
+
+
+def block_reduce(data, factor, method='mean'):
+    '''
+    Reduces the grid *data* (NaN as no-data) by *factor* in both directions.
+
+    :Parameters:
+        - data: 2-D array
+        - factor: Number of cells per block side
+        - method: One of *METHODS*
+
+    :Returns:
+        - float32 array of shape ceil(data.shape / factor)
+    '''
+    blocks = _blocks(data, factor)
+    valid = np.isfinite(blocks)
+    count = valid.sum(axis=-1)
+    if method == 'mean':
+        total = np.where(valid, blocks, 0.0).sum(axis=-1)
+        result = total / np.maximum(count, 1)
+    elif method == 'max':
+        result = np.where(valid, blocks, -inf).max(axis=-1)
+    elif method == 'mode':
+        result = np.zeros(blocks.shape[:2], dtype=float32)
+        best = np.zeros(blocks.shape[:2], dtype=int)
+        # one pass per class - classified themes have few classes
+        for c in np.unique(blocks[valid]):
+            n = (blocks == c).sum(axis=-1)
+            better = n > best
+            result[better] = c
+            best[better] = n[better]
+    else:
+        raise ValueError("Unknown method '%s'" % method)
+    result = result.astype(float32)
+    result[count == 0] = nan
+    return result
+
+
+def overview_filename(bilfile, factor, method='mean'):
+    return "%s_ov%ikm_%s.npy" % (os.path.splitext(bilfile)[0], factor, method)
+
+
+def thumbnail_filename(bilfile, factor, method='mean'):
+    return "%s_thumb%ikm_%s.png" % (os.path.splitext(bilfile)[0], factor,
+                                    method)
+
+
+def is_cached(bilfile, factor, method='mean'):
+    '''
+    Returns *True* if the cached overview of *bilfile* reduced by *method*
+    is up to date.
+    '''
+    ovfile = overview_filename(bilfile, factor, method)
+    return os.path.exists(ovfile) and \
+        os.path.getmtime(ovfile) >= os.path.getmtime(bilfile)
+
+
+def get_overview(source, cdt, factor, method='mean', data=None):
+    '''
+    Returns the overview of *source* on date *cdt* - from the cache next to
+    the BIL file if it is up to date.
+
+    :Parameters:
+        - source: *BILInput* or *Output* (see *point_extraction.get_source*)
+        - cdt: *datetime*
+        - factor: Reduction factor
+        - method: One of *METHODS*
+        - data: The full grid if already loaded
+
+    :Returns:
+        - The overview or *None* if the product does not exist
+    '''
+    bilfile = source_filename(source, cdt)
+    if not os.path.exists(bilfile):
+        return None
+    ovfile = overview_filename(bilfile, factor, method)
+    if is_cached(bilfile, factor, method):
+        return np.load(ovfile)
+    if data is None:
+        data = read_grid(source, cdt)
+    overview = block_reduce(data, factor, method)
+    try:
+        np.save(ovfile, overview)
+    except (IOError, OSError), e:
+        print "Could not cache overview: %s" % e
+    return overview
+
+
+def write_thumbnail(overview, cltfile, filename):
+    '''
+    Renders *overview* through the colour look-up table *cltfile* into the
+    PNG file *filename*.
+    '''
+    from pysenorge.io.png import load_clt, writeRGBA
+    writeRGBA(load_clt(cltfile).colorize(overview), filename)
+
+
+def main():
+    usage = "usage: python overviews.py PRODUCT YYYY-MM-DD [YYYY-MM-DD] [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-f", "--factors",
+                      action="store", dest="factors", type="string",
+                      default=",".join([str(f) for f in FACTORS]),
+                      help="Comma separated reduction factors - default: %s" %
+                      ",".join([str(f) for f in FACTORS]))
+    parser.add_option("-m", "--method",
+                      action="store", dest="method", type="choice",
+                      choices=list(METHODS), default=None,
+                      help="mean, max or mode - default: by product name")
+    parser.add_option("--thumbnails",
+                      action="store_true", dest="thumbnails", default=False,
+                      help="Set to render PNG thumbnails")
+    parser.add_option("-c", "--clt",
+                      action="store", dest="cltfile", type="string",
+                      default=None,
+                      help="Colour look-up table - default: the one of the theme output")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) not in (2, 3):
+        parser.error("Please provide the product and the date(s) in ISO format YYYY-MM-DD!")
+    name = args[0]
+    source = get_source(name)
+    method = options.method or default_method(source.name)
+    factors = [int(f) for f in options.factors.split(',')]
+    cltfile = options.cltfile or getattr(source, 'cltfile', None)
+    if options.thumbnails and (cltfile is None or not os.path.exists(cltfile)):
+        parser.error("Colour look-up table %s does not exist!" % cltfile)
+
+    cdt = iso2datetime(args[1]+" 06:00:00")
+    end = iso2datetime(args[-1]+" 06:00:00")
+    while cdt <= end:
+        bilfile = source_filename(source, cdt)
+        data = None
+        if os.path.exists(bilfile) and \
+           [f for f in factors if not is_cached(bilfile, f, method)]:
+            data = read_grid(source, cdt) # read once for all factors
+        for factor in factors:
+            overview = get_overview(source, cdt, factor, method, data)
+            if overview is None:
+                print "No %s on %s" % (name, cdt.date())
+                break
+            if options.thumbnails:
+                thumbfile = thumbnail_filename(bilfile, factor, method)
+                write_thumbnail(overview, cltfile, thumbfile)
+                print "%s written" % thumbfile
+        cdt += timedelta(days=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+__docformat__ = "reStructuredText"
+'''
+Extraction of time series at stations from the daily BIL archive.
+
+The stations are converted to seNorge cells once. From each daily file only
+the values at these cells are read through a memory map, i.e. a few pages of
+the file instead of the entire grid. The files are read on a pool of threads.
+The result is a table with one row per date and one column per station.
+
+Variables are either "sd", "tm" (see *VARIABLES*), the name of a registered
+theme (see *themes.senorge_theme*), whose first output is read, or
+"THEME:OUTPUT", e.g. "wind_10m_daily:wind_speed_max_10m". Values are
+converted to physical units; no-data values, missing files and stations
+outside the grid give NaN.
+
+Station file (one station per line - "#" starts a comment)::
+
+    # id  lat      lon
+    18700 59.9423  10.7200
+    50540 60.3830  5.3327
+
+Command line usage::
+
+    python point_extraction.py STATIONFILE VARIABLE YYYY-MM-DD YYYY-MM-DD [options]
+
+Example::
+
+    python point_extraction.py stations.txt sd 1990-09-01 2010-08-31 -o sd.csv
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+from datetime import timedelta
+from optparse import OptionParser
+from multiprocessing.pool import ThreadPool
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+from numpy import array, asarray, memmap, float32, int64, nan, empty, isnan
+# Own
+from pysenorge.set_environment import default_senorge_width, \
+    default_senorge_height
+from pysenorge.grid import utm_to_index, latlon_to_index
+from pysenorge.converters import get_FillValue
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.instrumentation import stage, add_bytes
+from pysenorge.themes.senorge_theme import BILInput, Output, DATATYPES, \
+    date_keys, get_theme
+
+# Meteorological inputs by name
+VARIABLES = {
+    'sd': BILInput('sd', "%(BILin)s/sd/%(hydroyear)s/sd_%(date)s.bil",
+                   scale=0.001),
+    'tm': BILInput('tm', "%(METdir)s/tm/%(year)s/tm_%(date)s.bil",
+                   scale=0.1, offset=-273.1,
+                   fallback="%(PROGdir)s/%(year)s/tm_%(date)s.bil"),
+    }
+
+
+def get_source(name):
+    '''
+    Returns the *BILInput* or *Output* describing the files of variable
+    *name*.
+    '''
+    if name in VARIABLES:
+        return VARIABLES[name]
+    theme, output = (name.split(':') + [None])[:2]
+    try:
+        outputs = get_theme(theme).outputs
+        if output is None:
+            return outputs[0]
+        return [o for o in outputs if o.name == output][0]
+    except (ImportError, KeyError, IndexError):
+        print "%s is no registered theme - reading uint16 from $BILout/%s" % \
+            (name, name)
+        return Output(name)
+
+
+def source_filename(source, cdt):
+    '''
+    Returns the file of *source* (*BILInput* or *Output*) on date *cdt*.
+    '''
+    keys = date_keys(cdt)
+    filename = os.path.normpath(source.template % keys)
+    fallback = getattr(source, 'fallback', None)
+    if fallback is not None and not os.path.exists(filename):
+        filename = os.path.normpath(fallback % keys)
+    return filename
+
+
+def read_grid(source, cdt):
+    '''
+    Returns the entire grid of *source* on date *cdt* in physical units with
+    NaN as no-data value or *None* if the file does not exist.
+    '''
+    from pysenorge.io.bil import BILdata
+    filename = source_filename(source, cdt)
+    if not os.path.exists(filename):
+        return None
+    bil = BILdata(filename, source.datatype)
+    bil.read()
+    data = bil.data.astype(float32) * source.scale + source.offset
+    data[bil.data == bil.nodata] = nan
+    return data
+
+
+def read_points(filename, datatype, offsets, ncells=None):
+    '''
+    Reads the values at the flat indices *offsets* from the BIL file
+    *filename* without reading the entire grid.
+
+    :Returns:
+        - Array of *datatype* or *None* if the file does not exist
+    '''
+    if not os.path.exists(filename):
+        return None
+    if ncells is None:
+        ncells = default_senorge_width * default_senorge_height
+    dt = DATATYPES[datatype]
+    with stage('point_read'):
+        mm = memmap(filename, dtype=dt, mode='r', shape=(ncells,))
+        values = array(mm[offsets])
+        del mm
+        add_bytes(read=values.nbytes)
+    return values
+
+
+class PointExtractor(object):
+    '''
+    Reads the values of a variable at fixed seNorge cells from many files.
+    '''
+
+    def __init__(self, rows, cols, source, ncols=default_senorge_width,
+                 nrows=default_senorge_height):
+        '''
+        :Parameters:
+            - rows, cols: BIL cell indices of the stations (-1 if outside)
+            - source: *BILInput* or *Output* describing the files
+            - ncols, nrows: Grid size
+        '''
+        self.rows = asarray(rows)
+        self.cols = asarray(cols)
+        self.inside = self.rows >= 0
+        self.offsets = (self.rows[self.inside].astype(int64) * ncols +
+                        self.cols[self.inside])
+        self.ncells = ncols * nrows
+        self.source = source
+
+    def extract(self, cdt):
+        '''
+        Returns the physical values at the stations on date *cdt*.
+        '''
+        values = empty(len(self.rows), dtype=float32)
+        values[:] = nan
+        raw = read_points(source_filename(self.source, cdt),
+                          self.source.datatype, self.offsets, self.ncells)
+        if raw is None:
+            return values
+        data = raw.astype(float32) * self.source.scale + self.source.offset
+        data[raw == get_FillValue(DATATYPES[self.source.datatype])] = nan
+        values[self.inside] = data
+        return values
+
+    def extract_period(self, start_date, end_date, threads=8):
+        '''
+        Returns the dates from *start_date* to *end_date* (*datetime*) and a
+        (dates, stations) array of the values.
+        '''
+        dates = []
+        cdt = start_date
+        while cdt <= end_date:
+            dates.append(cdt)
+            cdt += timedelta(days=1)
+        if threads > 1:
+            pool = ThreadPool(threads)
+            try:
+                rows = pool.map(self.extract, dates)
+            finally:
+                pool.close()
+        else:
+            rows = map(self.extract, dates)
+        table = empty((len(dates), len(self.rows)), dtype=float32)
+        for i, row in enumerate(rows):
+            table[i] = row
+        return dates, table
+
+
+def read_stations(filename):
+    '''
+    Reads a station file.
+
+    :Returns:
+        - List of station ids and two arrays with the coordinates
+    '''
+    ids, a, b = [], [], []
+    fid = open(filename, 'r')
+    for line in fid:
+        line = line.split('#')[0].replace(',', ' ').split()
+        if len(line) < 3:
+            continue
+        ids.append(line[0])
+        a.append(float(line[1]))
+        b.append(float(line[2]))
+    fid.close()
+    return ids, array(a), array(b)
+
+
+def write_table(filename, ids, dates, table, fmt="%.3f"):
+    '''
+    Writes the table as CSV file with one row per date and one column per
+    station.
+    '''
+    fid = open(filename, 'w')
+    fid.write("date,%s\n" % ",".join(ids))
+    for cdt, row in zip(dates, table):
+        values = ["" if isnan(v) else fmt % v for v in row]
+        fid.write("%s,%s\n" % (cdt.date().isoformat(), ",".join(values)))
+    fid.close()
+
+
+def main():
+    usage = "usage: python point_extraction.py STATIONFILE VARIABLE YYYY-MM-DD YYYY-MM-DD [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-o", "--outfile",
+                      action="store", dest="outfile", type="string",
+                      default=None,
+                      help="CSV output file - default: VARIABLE_START_END.csv")
+    parser.add_option("--utm",
+                      action="store_true", dest="utm", default=False,
+                      help="Station coordinates are UTM 33 x, y instead of lat, lon")
+    parser.add_option("-j", "--threads",
+                      action="store", dest="threads", type="int", default=8,
+                      help="Number of files read in parallel (default=8)")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) != 4:
+        parser.error("Please provide the station file, variable, start and end date!")
+    stationfile, name, start, end = args
+
+    ids, a, b = read_stations(stationfile)
+    if options.utm:
+        rows, cols = utm_to_index(a, b)
+    else:
+        rows, cols = latlon_to_index(a, b)
+    for i in (rows < 0).nonzero()[0]:
+        print "Station %s is outside the seNorge grid" % ids[i]
+
+    extractor = PointExtractor(rows, cols, get_source(name))
+    dates, table = extractor.extract_period(iso2datetime(start+" 06:00:00"),
+                                            iso2datetime(end+" 06:00:00"),
+                                            options.threads)
+    outfile = options.outfile
+    if outfile is None:
+        outfile = "%s_%s_%s.csv" % (name, start, end)
+    write_table(outfile, ids, dates, table)
+    print "%i dates x %i stations written to %s" % (len(dates), len(ids),
+                                                     outfile)
+
+
+if __name__ == "__main__":
+    main()
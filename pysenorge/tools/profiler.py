@@ -0,0 +1,116 @@
+__docformat__ = 'reStructuredText'
+'''
+Opt-in profiling of theme runs.
+
+Profiling is switched on for any theme script using *instrumented_main* by
+
+    - the command line flag *--profile* (removed from *sys.argv* before the
+      theme parses its options), or
+    - the environment variable *PYSENORGE_PROFILE* set to a non-empty value
+      other than "0".
+
+The number of functions listed in the text summary can be set with
+*PYSENORGE_PROFILE_TOP* (default 40). The profile is written next to the run
+logs as *PROFILEdir/<theme>/<theme>_<date>.prof* (readable with *pstats* or
+e.g. *snakeviz*) together with a text summary *<theme>_<date>.txt* sorted by
+cumulative and by internal time.
+
+Example::
+
+    python wind_10m_daily.py --profile 2011-02-01 --nc
+
+    PYSENORGE_PROFILE=1 python run_period.py wind_10m_daily.py 2011-02-01 2011-02-07
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import sys
+import pstats
+try:
+    from cProfile import Profile
+except ImportError:
+    from profile import Profile
+
+# Own
+from pysenorge.set_environment import LOGdir
+
+# Default folder of the profiles
+PROFILEdir = os.path.join(LOGdir, 'profiles')
+
+# Command line flag and environment variables switching the profiler on
+FLAG = '--profile'
+ENVVAR = 'PYSENORGE_PROFILE'
+TOPVAR = 'PYSENORGE_PROFILE_TOP'
+
+
+def profile_enabled(argv=None):
+    '''
+    Returns *True* if profiling is requested. A *--profile* flag is removed
+    from *argv* (default: *sys.argv*).
+    '''
+    if argv is None:
+        argv = sys.argv
+    enabled = False
+    while FLAG in argv:
+        argv.remove(FLAG)
+        enabled = True
+    if os.environ.get(ENVVAR, '') not in ('', '0'):
+        enabled = True
+    return enabled
+
+
+def top_n():
+    '''
+    Returns the number of functions listed in the text summary.
+    '''
+    try:
+        return int(os.environ.get(TOPVAR, 40))
+    except ValueError:
+        return 40
+
+
+def write_profile(prof, theme, date, profiledir=None):
+    '''
+    Writes the profile *prof* and its text summary.
+
+    :Returns:
+        - Path of the .prof file or *None* on failure
+    '''
+    if profiledir is None:
+        profiledir = os.path.join(PROFILEdir, theme)
+    try:
+        if not os.path.exists(profiledir):
+            os.makedirs(profiledir)
+        basename = os.path.join(profiledir, '%s_%s' %
+                                (theme, str(date).replace('-', '_')))
+        prof.dump_stats(basename + '.prof')
+        fid = open(basename + '.txt', 'w')
+        stats = pstats.Stats(basename + '.prof', stream=fid)
+        stats.strip_dirs()
+        for key in ('cumulative', 'time'):
+            fid.write("Sorted by %s time\n\n" % key)
+            stats.sort_stats(key).print_stats(top_n())
+        fid.close()
+    except (IOError, OSError), e:
+        print "Could not write profile: %s" % e
+        return None
+    return basename + '.prof'
+
+
+def profile_call(theme, date, func, *args, **kwargs):
+    '''
+    Calls *func(\*args, \*\*kwargs)* under the profiler and writes the profile
+    when it returns, raises or exits. *date* may be a function returning the
+    date, which is then called at the end.
+    '''
+    prof = Profile()
+    try:
+        return prof.runcall(func, *args, **kwargs)
+    finally:
+        if callable(date):
+            date = date()
+        filename = write_profile(prof, theme, date)
+        if filename is not None:
+            print "Profile written to %s" % filename
@@ -0,0 +1,299 @@
+__docformat__ = "reStructuredText"
+'''
+Rolling N-day aggregates of daily seNorge products.
+
+Products such as the 3-day new snow or the 7-day maximum wind would read N
+daily files every day. A *RollingWindow* keeps the last N daily grids as
+land vectors (the cells inside Norway only) in a ring buffer together with
+the running sum and count of valid values. Each new day replaces the oldest
+slot and updates the sum incrementally; maximum and minimum are computed
+from the buffer in memory. A *RollingAccumulator* stores the buffer of a
+product in a compressed state file between runs, so after the first N days
+an update reads one daily file only.
+
+Days without a file are stored as no-data and ignored by the aggregates.
+Updating a day within the window again replaces its values.
+
+Command line usage::
+
+    python rolling.py PRODUCT NDAYS YYYY-MM-DD [YYYY-MM-DD] [options]
+
+Example::
+
+    python rolling.py wind_10m_daily:wind_speed_max_10m 7 2011-02-01 -s max
+
+writes *BILout/wind_speed_max_10m_7d_max/<hydroyear>/wind_speed_max_10m_7d_max_2011_02_01.bil*.
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+from StringIO import StringIO
+from datetime import timedelta
+from optparse import OptionParser
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+import numpy as np
+from numpy import float32, float64, nan, inf
+
+# Own
+from pysenorge.set_environment import BILout
+from pysenorge.io.bil import atomic_write
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.point_extraction import get_source, read_grid
+from pysenorge.themes.senorge_theme import Output, date_keys
+
+ROLLINGdir = os.path.join(BILout, 'rolling')
+
+STATS = ('sum', 'mean', 'max', 'min', 'count')
+
+
+def _day(cdt):
+    if hasattr(cdt, 'date'):
+        cdt = cdt.date()
+    return cdt.toordinal()
+
+
+class RollingWindow(object):
+    '''
+    Ring buffer of the daily land vectors of the last *ndays* days.
+    '''
+
+    def __init__(self, ndays, ncells):
+        '''
+        :Parameters:
+            - ndays: Length of the window in days
+            - ncells: Number of cells of a land vector
+        '''
+        self.ndays = ndays
+        self.ncells = ncells
+        self.buffer = np.empty((ndays, ncells), dtype=float32)
+        self.buffer[:] = nan
+        self.total = np.zeros(ncells, dtype=float64)
+        self.count = np.zeros(ncells, dtype=int)
+        self.last = None # ordinal of the latest day
+
+    def _set(self, slot, values):
+        old = self.buffer[slot]
+        valid = np.isfinite(old)
+        self.total -= np.where(valid, old, 0.0)
+        self.count -= valid
+        self.buffer[slot] = values
+        valid = np.isfinite(self.buffer[slot])
+        self.total += np.where(valid, self.buffer[slot], 0.0)
+        self.count += valid
+
+    def _recompute(self):
+        valid = np.isfinite(self.buffer)
+        self.total = np.where(valid, self.buffer, 0.0).sum(axis=0,
+                                                            dtype=float64)
+        self.count = valid.sum(axis=0)
+
+    def update(self, cdt, values):
+        '''
+        Adds the land vector *values* (NaN as no-data) of date *cdt*. Days
+        between the latest day and *cdt* are set to no-data.
+        '''
+        day = _day(cdt)
+        if self.last is None:
+            self.last = day - 1
+        if day <= self.last - self.ndays:
+            raise ValueError("%s is older than the window" % cdt)
+        if day - self.last >= self.ndays:
+            # the whole window expires
+            self.buffer[:] = nan
+            self._recompute()
+        else:
+            for d in xrange(self.last + 1, day):
+                self._set(d % self.ndays, nan)
+        self._set(day % self.ndays, values)
+        self.last = max(self.last, day)
+
+    def days(self):
+        '''
+        Returns the ordinals of the days in the window.
+        '''
+        if self.last is None:
+            return []
+        return range(self.last - self.ndays + 1, self.last + 1)
+
+    def aggregate(self, stat):
+        '''
+        Returns *stat* ("sum", "mean", "max", "min" or "count") over the
+        window as land vector - NaN where no day has a valid value.
+        '''
+        empty = self.count == 0
+        if stat == 'count':
+            return self.count.astype(float32)
+        elif stat == 'sum':
+            result = self.total
+        elif stat == 'mean':
+            result = self.total / np.maximum(self.count, 1)
+        elif stat in ('max', 'min'):
+            valid = np.isfinite(self.buffer)
+            if stat == 'max':
+                result = np.where(valid, self.buffer, -inf).max(axis=0)
+            else:
+                result = np.where(valid, self.buffer, inf).min(axis=0)
+        else:
+            raise ValueError("Unknown statistic '%s'" % stat)
+        result = result.astype(float32)
+        result[empty] = nan
+        return result
+
+    def save(self, filename):
+        '''
+        Stores the window compressed in the *.npz* file *filename*. The
+        running sums are recomputed on loading.
+        '''
+        buf = StringIO()
+        np.savez_compressed(buf, buffer=self.buffer, ndays=self.ndays,
+                            last=self.last)
+        folder = os.path.dirname(filename)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        atomic_write(filename, buf.getvalue())
+
+    @classmethod
+    def load(cls, filename):
+        state = np.load(filename)
+        buffer = state['buffer']
+        window = cls(int(state['ndays']), buffer.shape[1])
+        window.buffer[:] = buffer
+        window.last = int(state['last'])
+        window._recompute()
+        return window
+
+
+class RollingAccumulator(object):
+    '''
+    Rolling window of a product kept up to date from the daily files.
+    '''
+
+    def __init__(self, name, ndays, statedir=ROLLINGdir, mask=None):
+        '''
+        :Parameters:
+            - name: Product as accepted by *point_extraction.get_source*
+            - ndays: Length of the window in days
+            - statedir: Folder of the state files
+            - mask: seNorge no-data mask - default: *grid.senorge_mask*
+        '''
+        if mask is None:
+            from pysenorge.grid import senorge_mask
+            mask = senorge_mask()
+        self.name = name
+        self.label = name.split(':')[-1]
+        self.ndays = ndays
+        self.source = get_source(name)
+        self.mask = mask
+        self.land = ~mask
+        self.statefile = os.path.join(statedir, "%s_%id.npz" %
+                                      (self.label, ndays))
+        self.window = None
+        if os.path.exists(self.statefile):
+            window = RollingWindow.load(self.statefile)
+            if window.ncells == self.land.sum() and window.ndays == ndays:
+                self.window = window
+            else:
+                print "State %s does not fit - starting empty" % self.statefile
+        if self.window is None:
+            self.window = RollingWindow(ndays, int(self.land.sum()))
+
+    def advance(self, cdt):
+        '''
+        Brings the window up to date *cdt* reading only the daily files not
+        yet in the window, and saves the state.
+
+        :Returns:
+            - Number of files read
+        '''
+        day = _day(cdt)
+        if self.window.last is not None and day < self.window.last:
+            print "%s is before the state of %s - starting empty" % \
+                (cdt.date(), self.statefile)
+            self.window = RollingWindow(self.ndays, self.window.ncells)
+        first = day - self.ndays + 1
+        if self.window.last is not None and self.window.last >= first:
+            first = self.window.last + 1
+        nread = 0
+        for d in xrange(first, day + 1):
+            ddt = cdt - timedelta(days=day - d)
+            data = read_grid(self.source, ddt)
+            if data is None:
+                print "No %s on %s - stored as no-data" % (self.name,
+                                                          ddt.date())
+                values = nan
+            else:
+                values = data[self.land]
+                nread += 1
+            self.window.update(ddt, values)
+        self.window.save(self.statefile)
+        return nread
+
+    def grid(self, stat):
+        '''
+        Returns *stat* over the window as seNorge grid (NaN as no-data).
+        '''
+        data = np.empty(self.mask.shape, dtype=float32)
+        data[:] = nan
+        data[self.land] = self.window.aggregate(stat)
+        return data
+
+    def output(self, stat):
+        '''
+        Returns the *Output* describing the files of *stat*.
+        '''
+        datatype = self.source.datatype
+        scale = self.source.scale
+        if stat == 'count':
+            datatype, scale = 'uint8', 1.0
+        return Output("%s_%id_%s" % (self.label, self.ndays, stat),
+                      datatype=datatype, scale=scale,
+                      offset=0.0 if stat == 'count' else self.source.offset,
+                      cltfile=getattr(self.source, 'cltfile', None))
+
+
+def main():
+    usage = "usage: python rolling.py PRODUCT NDAYS YYYY-MM-DD [YYYY-MM-DD] [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-s", "--stats",
+                      action="store", dest="stats", type="string",
+                      default="sum",
+                      help="Comma separated list of sum, mean, max, min, count (default=sum)")
+    parser.add_option("-d", "--statedir",
+                      action="store", dest="statedir", type="string",
+                      metavar="DIR", default=ROLLINGdir,
+                      help="Folder of the state files - default: %s" % ROLLINGdir)
+    parser.add_option("--png",
+                      action="store_true", dest="png", default=False,
+                      help="Set to store output as PNG image")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) not in (3, 4):
+        parser.error("Please provide the product, the number of days and the date(s)!")
+    stats = [s.strip() for s in options.stats.split(',')]
+    for stat in stats:
+        if stat not in STATS:
+            parser.error("Unknown statistic '%s'" % stat)
+
+    acc = RollingAccumulator(args[0], int(args[1]), options.statedir)
+    cdt = iso2datetime(args[2]+" 06:00:00")
+    end = iso2datetime(args[-1]+" 06:00:00")
+    while cdt <= end:
+        nread = acc.advance(cdt)
+        for stat in stats:
+            out = acc.output(stat)
+            raw = out.convert(acc.grid(stat), acc.mask)
+            out.write(raw, cdt, date_keys(cdt), bil=True, png=options.png)
+        print "%s: %i file(s) read" % (cdt.date(), nread)
+        cdt += timedelta(days=1)
+
+
+if __name__ == "__main__":
+    main()
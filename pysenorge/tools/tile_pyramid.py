@@ -0,0 +1,229 @@
+__docformat__ = "reStructuredText"
+'''
+Tile pyramid of seNorge products for web maps.
+
+A product is rendered through its colour look-up table (CLT) into square PNG
+tiles on several zoom levels::
+
+    OUTDIR/<product>/<z>/<x>/<y>.png
+
+The tiles are in the seNorge grid (UTM 33, origin in the north-west corner
+at E -75000, N 8000000) - web clients such as OpenLayers or Leaflet use it
+with a custom projection and the resolutions returned by *resolutions()*.
+At zoom level *NATIVE_ZOOM* one pixel is one seNorge cell (1 km). Lower
+levels show every 2nd, 4th, ... cell, higher levels repeat each cell 2, 4, ...
+times.
+
+A manifest (*OUTDIR/<product>/manifest.json*) holds a checksum of the data
+of every tile. A tile is rendered only if its data or the CLT changed since
+the previous run, so a new date re-renders only the areas that changed.
+Tiles are rendered on a pool of threads.
+
+Command line usage::
+
+    python tile_pyramid.py PRODUCT YYYY-MM-DD [options]
+
+Example::
+
+    python tile_pyramid.py wind_10m_daily:wind_speed_max_10m 2011-02-01 -o /var/www/tiles
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+import json
+import hashlib
+from optparse import OptionParser
+from multiprocessing.pool import ThreadPool
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+import numpy as np
+
+# Own
+from pysenorge.io.png import load_clt, writeRGBA
+from pysenorge.tools.date_converters import iso2datetime
+from pysenorge.tools.point_extraction import get_source, read_grid
+
+# Tile size in pixels
+TILESIZE = 256
+# Zoom level with one pixel per seNorge cell
+NATIVE_ZOOM = 3
+# seNorge cell size in m
+CELLSIZE = 1000.0
+
+
+def resolutions(zooms):
+    '''
+    Returns the resolution in m per pixel of the zoom levels *zooms*.
+    '''
+    return [CELLSIZE * 2.0**(NATIVE_ZOOM - z) for z in zooms]
+
+
+def zoom_level(data, z):
+    '''
+    Returns the grid *data* resampled to the zoom level *z*.
+    '''
+    if z < NATIVE_ZOOM:
+        step = 2**(NATIVE_ZOOM - z)
+        return data[::step, ::step]
+    if z > NATIVE_ZOOM:
+        n = 2**(z - NATIVE_ZOOM)
+        return np.repeat(np.repeat(data, n, axis=0), n, axis=1)
+    return data
+
+
+def tiles(level):
+    '''
+    Returns the (x, y, tile data) of the resampled grid *level*.
+    '''
+    rows, cols = level.shape
+    for y in range(0, (rows + TILESIZE - 1) // TILESIZE):
+        for x in range(0, (cols + TILESIZE - 1) // TILESIZE):
+            yield x, y, level[y*TILESIZE:(y+1)*TILESIZE,
+                              x*TILESIZE:(x+1)*TILESIZE]
+
+
+class TilePyramid(object):
+    '''
+    Renders the tiles of one product and keeps track of their content.
+    '''
+
+    def __init__(self, outdir, cltfile, zooms=range(0, NATIVE_ZOOM+2),
+                 threads=8):
+        '''
+        :Parameters:
+            - outdir: Folder of the product tiles
+            - cltfile: Colour look-up table
+            - zooms: Zoom levels
+            - threads: Number of tiles rendered in parallel
+        '''
+        self.outdir = outdir
+        self.cltfile = cltfile
+        self.zooms = zooms
+        self.threads = threads
+        self.manifestfile = os.path.join(outdir, 'manifest.json')
+        self.manifest = {}
+        if os.path.exists(self.manifestfile):
+            fid = open(self.manifestfile, 'r')
+            try:
+                self.manifest = json.load(fid)
+            except ValueError:
+                print "Corrupt manifest %s - rendering all tiles" % \
+                    self.manifestfile
+            fid.close()
+
+    def _checksum(self, tile):
+        md5 = hashlib.md5(str(os.path.getmtime(self.cltfile)))
+        md5.update(str(tile.shape))
+        md5.update(np.ascontiguousarray(tile).tostring())
+        return md5.hexdigest()
+
+    def _render(self, job):
+        key, tile = job
+        filename = os.path.join(self.outdir, key + '.png')
+        if not np.isfinite(tile).any():
+            # nothing but no-data - the client shows an empty tile
+            if os.path.exists(filename):
+                os.remove(filename)
+            return
+        rgba = np.zeros((TILESIZE, TILESIZE, 4), dtype=np.uint8)
+        rgba[:tile.shape[0], :tile.shape[1]] = \
+            load_clt(self.cltfile).colorize(tile)
+        folder = os.path.dirname(filename)
+        if not os.path.exists(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                pass # created by another thread meanwhile
+        writeRGBA(rgba, filename)
+
+    def update(self, data):
+        '''
+        Renders the tiles of *data* (grid in BIL orientation, physical units,
+        NaN as no-data) that changed since the previous update.
+
+        :Returns:
+            - Number of tiles rendered and total number of tiles
+        '''
+        load_clt(self.cltfile) # read once before the threads start
+        jobs = []
+        manifest = {}
+        for z in self.zooms:
+            for x, y, tile in tiles(zoom_level(data, z)):
+                key = "%i/%i/%i" % (z, x, y)
+                manifest[key] = self._checksum(tile)
+                if self.manifest.get(key) != manifest[key]:
+                    jobs.append((key, tile))
+        if self.threads > 1 and len(jobs) > 1:
+            pool = ThreadPool(self.threads)
+            try:
+                pool.map(self._render, jobs)
+            finally:
+                pool.close()
+        else:
+            map(self._render, jobs)
+        self.manifest = manifest
+        self.save()
+        return len(jobs), len(manifest)
+
+    def save(self):
+        if not os.path.exists(self.outdir):
+            os.makedirs(self.outdir)
+        tmpfile = self.manifestfile + '.tmp'
+        fid = open(tmpfile, 'w')
+        json.dump(self.manifest, fid, indent=0, sort_keys=True)
+        fid.close()
+        if os.path.exists(self.manifestfile):
+            os.remove(self.manifestfile) # os.rename does not overwrite on win32
+        os.rename(tmpfile, self.manifestfile)
+
+
+def main():
+    usage = "usage: python tile_pyramid.py PRODUCT YYYY-MM-DD [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-o", "--outdir",
+                      action="store", dest="outdir", type="string",
+                      metavar="DIR", default=os.getcwd(),
+                      help="Tile folder - default: current directory")
+    parser.add_option("-c", "--clt",
+                      action="store", dest="cltfile", type="string",
+                      default=None,
+                      help="Colour look-up table - default: the one of the theme output")
+    parser.add_option("-z", "--zooms",
+                      action="store", dest="zooms", type="string",
+                      default="0-%i" % (NATIVE_ZOOM+1),
+                      help="Zoom levels as FIRST-LAST - default: 0-%i" %
+                      (NATIVE_ZOOM+1))
+    parser.add_option("-j", "--threads",
+                      action="store", dest="threads", type="int", default=8,
+                      help="Number of tiles rendered in parallel (default=8)")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) != 2:
+        parser.error("Please provide the product and the date in ISO format YYYY-MM-DD!")
+    name = args[0]
+    source = get_source(name)
+    cltfile = options.cltfile or getattr(source, 'cltfile', None)
+    if cltfile is None or not os.path.exists(cltfile):
+        parser.error("Colour look-up table %s does not exist!" % cltfile)
+    first, last = [int(z) for z in options.zooms.split('-')]
+
+    cdt = iso2datetime(args[1]+" 06:00:00")
+    data = read_grid(source, cdt)
+    if data is None:
+        parser.error("No %s on %s" % (name, args[1]))
+
+    pyramid = TilePyramid(os.path.join(options.outdir, name.split(':')[-1]),
+                          cltfile, range(first, last+1), options.threads)
+    rendered, total = pyramid.update(data)
+    print "%i of %i tiles rendered" % (rendered, total)
+
+
+if __name__ == "__main__":
+    main()
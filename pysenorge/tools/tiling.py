@@ -0,0 +1,145 @@
+__docformat__ = 'reStructuredText'
+'''
+Tiled multi-threaded execution of theme models.
+
+Most theme models work cell by cell on seNorge grids. *run_tiled* splits the
+grids into bands of rows, runs the model for each band on a pool of threads
+and writes the results into output arrays allocated once for the whole grid.
+NumPy releases the GIL inside its array operations, so the bands are computed
+in parallel. Models looping over cells in Python gain nothing from it.
+
+An input is split if its last two dimensions equal the grid shape, e.g. a
+(1550, 1195) grid or a (24, 1550, 1195) time stack. All other inputs
+(scalars, *None*, grids of other shapes) are passed unchanged to every tile.
+The model may return an array, a tuple of arrays or a dict of arrays. Each
+returned array must have the shape of the tile in its last two dimensions.
+
+The number of threads is taken from the environment variable
+*PYSENORGE_THREADS* and defaults to the number of CPUs.
+
+Example::
+
+    from pysenorge.tools.tiling import run_tiled
+    tds = run_tiled(model, tm=tm, sd=sd, tds=None)
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+# Additional
+from numpy import empty, ndarray
+
+# Environment variable setting the number of threads
+THREADVAR = 'PYSENORGE_THREADS'
+
+# Pools are expensive to start - one is kept per number of threads
+_POOLS = {}
+
+
+def n_threads():
+    '''
+    Returns the number of threads used by *run_tiled*.
+    '''
+    try:
+        return max(1, int(os.environ.get(THREADVAR, cpu_count())))
+    except (ValueError, NotImplementedError):
+        return 1
+
+
+def _pool(threads):
+    if threads not in _POOLS:
+        _POOLS[threads] = ThreadPool(threads)
+    return _POOLS[threads]
+
+
+def row_tiles(nrows, ntiles):
+    '''
+    Returns *ntiles* (first, last+1) row ranges of almost equal size covering
+    *nrows* rows.
+    '''
+    ntiles = max(1, min(ntiles, nrows))
+    bounds = [nrows*i//ntiles for i in range(ntiles+1)]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def _grid_shape(inputs):
+    for value in inputs.values():
+        if isinstance(value, ndarray) and value.ndim >= 2:
+            return value.shape[-2:]
+    raise ValueError("No input grid to split into tiles")
+
+
+def _split(inputs, shape, rows):
+    tile = {}
+    for key, value in inputs.items():
+        if isinstance(value, ndarray) and value.ndim >= 2 and \
+           value.shape[-2:] == shape:
+            tile[key] = value[..., rows[0]:rows[1], :]
+        else:
+            tile[key] = value
+    return tile
+
+
+def _flatten(result):
+    '''
+    Returns the arrays of a model result as list of (key, array) tuples.
+    '''
+    if isinstance(result, dict):
+        return result.items()
+    if isinstance(result, tuple):
+        return list(enumerate(result))
+    return [(None, result)]
+
+
+def _pack(result, outputs):
+    if isinstance(result, dict):
+        return outputs
+    if isinstance(result, tuple):
+        return tuple([outputs[i] for i in range(len(result))])
+    return outputs[None]
+
+
+def run_tiled(func, shape=None, ntiles=None, threads=None, **inputs):
+    '''
+    Runs *func(\*\*inputs)* tile by tile and returns the stitched result.
+
+    :Parameters:
+        - func: Model working independently on each grid cell
+        - shape: (rows, cols) of the grid - default: the last two dimensions
+            of the first input with at least two dimensions
+        - ntiles: Number of bands - default: four per thread
+        - threads: Number of threads - default: *n_threads()*
+        - inputs: Keyword arguments of *func*
+
+    :Returns:
+        - The result of *func* for the entire grid
+    '''
+    if shape is None:
+        shape = _grid_shape(inputs)
+    shape = tuple(shape)
+    if threads is None:
+        threads = n_threads()
+    if ntiles is None:
+        ntiles = 4*threads
+    tiles = row_tiles(shape[0], ntiles)
+
+    # The first tile gives the types and shapes of the outputs
+    first = func(**_split(inputs, shape, tiles[0]))
+    outputs = {}
+    for key, value in _flatten(first):
+        outputs[key] = empty(value.shape[:-2] + shape, dtype=value.dtype)
+        outputs[key][..., tiles[0][0]:tiles[0][1], :] = value
+
+    def work(rows):
+        for key, value in _flatten(func(**_split(inputs, shape, rows))):
+            outputs[key][..., rows[0]:rows[1], :] = value
+
+    if threads == 1:
+        map(work, tiles[1:])
+    else:
+        _pool(threads).map(work, tiles[1:])
+    return _pack(first, outputs)
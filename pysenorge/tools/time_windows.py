@@ -0,0 +1,101 @@
+__docformat__ = 'reStructuredText'
+'''
+Time windows of a UM4 prognosis.
+
+A UM4 prognosis covers 66 h. Daily products are made from windows of it, e.g.
+[7,31] for today and [31,55] for tomorrow. The theme scripts accept one or
+several windows on the command line::
+
+    -t [7,31]
+    -t [[7,31],[31,55]]
+    -t None
+
+All windows are read from the prognosis file at once (see *span*) and the
+products are computed per window from slices of the loaded data (see
+*window_slices*). A product is dated by the last time step of its window
+(see *step_date*), as the former theme scripts did with
+*time.gmtime(time[-1])*.
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import json
+from datetime import datetime, timedelta
+
+
+def parse_timerange(s):
+    '''
+    Converts the *-t/--timerange* option into a list of windows.
+
+    :Parameters:
+        - s: String like "[7,31]", "[[7,31],[31,55]]" or "None"
+
+    :Returns:
+        - List of (first, last+1) time index tuples; *None* stands for the
+            entire prognosis
+    '''
+    value = json.loads(s.replace('None', 'null'))
+    if value is None:
+        return [None]
+    if len(value) == 2 and not isinstance(value[0], list):
+        value = [value]
+    windows = []
+    for w in value:
+        if w is None:
+            windows.append(None)
+        elif len(w) != 2 or w[0] >= w[1]:
+            raise ValueError("Invalid time window %s" % w)
+        else:
+            windows.append((int(w[0]), int(w[1])))
+    return windows
+
+
+def span(windows):
+    '''
+    Returns the (first, last+1) time indices covering all *windows* or *None*
+    if the entire prognosis is required.
+    '''
+    if None in windows:
+        return None
+    return (min([w[0] for w in windows]), max([w[1] for w in windows]))
+
+
+def window_slices(windows):
+    '''
+    Returns one *slice* per window into data read for *span(windows)*.
+    '''
+    timerange = span(windows)
+    if timerange is None:
+        return [slice(w[0], w[1]) if w is not None else slice(None)
+                for w in windows]
+    first = timerange[0]
+    return [slice(w[0]-first, w[1]-first) for w in windows]
+
+
+def step_date(cdt, secs):
+    '''
+    Returns *cdt* moved to the (UTC) date of the UM4 time value *secs*
+    [seconds since 1970-01-01].
+    '''
+    valid = datetime.utcfromtimestamp(float(secs))
+    return cdt + timedelta(days=(valid.date() - cdt.date()).days)
+
+
+def window_date(cdt, window, default, timestep=1):
+    '''
+    Returns the date of the products of *window* of the prognosis used for
+    the date *cdt* if the time values are not at hand. The products of the
+    *default* window of a theme are dated *cdt*; the others by the day on
+    which their last step falls relative to the last step of *default*, e.g.
+    [31,55] instead of [7,31] in hourly or [7,12] instead of [2,8] in
+    6-hourly prognoses is dated one day later. The entire prognosis (*None*)
+    is dated *cdt*.
+
+    :Parameters:
+        - timestep: Hours between the time steps of the prognosis
+    '''
+    if window is None or default is None:
+        return cdt
+    last = (window[1] - 1) * timestep // 24
+    return cdt + timedelta(days=last - (default[1] - 1) * timestep // 24)
@@ -17,6 +17,10 @@ import sys
 import os
 import datetime
 import gzip
+import shutil
+
+# Size of the blocks copied from the gzip stream [bytes]
+CHUNKSIZE = 4 * 1024 * 1024
 
 # Define the decompression method
 def gdecompress(filename, gzremove=False):
@@ -27,15 +31,17 @@ def gdecompress(filename, gzremove=False):
     -----------
     - filename: Gzipped file
     - gzremove: Boolean, if I{True} the original zip file will be deleted. 
+
+    Use *gcompression.gopen* to read a gzipped file without unzipping it to
+    disk.
     """
-    fileObj = gzip.GzipFile(filename, 'rb');
-    fileContent = fileObj.readlines();
-    fileObj.close()
-    
     newname = filename.replace('.gz','')
-    fileObjOut = file(newname, 'wb');
-    fileObjOut.writelines(fileContent)
+    fileObj = gzip.GzipFile(filename, 'rb')
+    fileObjOut = open(newname, 'wb')
+    # stream in blocks instead of loading the whole file
+    shutil.copyfileobj(fileObj, fileObjOut, CHUNKSIZE)
     fileObjOut.close()
+    fileObj.close()
     
     print "Unzipped file: %s" % os.path.abspath(filename)
     
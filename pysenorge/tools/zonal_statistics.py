@@ -0,0 +1,250 @@
+__docformat__ = "reStructuredText"
+'''
+Zonal statistics of seNorge products for regions, e.g. avalanche forecasting
+regions or catchments.
+
+The regions are given by a label raster aligned with the seNorge grid (BIL
+orientation, i.e. the first row in the north) with one integer id per region
+and 0 outside all regions. The cells are grouped by region once; the
+statistics of any number of products are then computed by *bincount* and
+segmented reductions over the groups instead of a loop over the regions.
+
+Statistics: "count" (valid cells), "sum", "mean", "std", "min", "max" and
+percentiles as "p<q>", e.g. "p50", "p90". NaN values are ignored.
+
+Command line usage::
+
+    python zonal_statistics.py LABELFILE YYYY-MM-DD [YYYY-MM-DD] [options]
+
+Example::
+
+    python zonal_statistics.py regions.bil 2011-02-01 -v wind_10m_daily:wind_speed_max_10m,depth_hoar_index_2 -s mean,max,p90
+
+One CSV file per date is written with one row per region and one column per
+product and statistic.
+
+:Author: kmu
+:Created: 19. okt. 2026
+'''
+# Built-in
+import os
+from datetime import timedelta
+from optparse import OptionParser
+
+# Adds folder containing the "pysenorge" package to the PYTHONPATH
+execfile(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "themes", "set_pysenorge_path.py"))
+# Additional
+import numpy as np
+from numpy import asarray, nan, inf
+
+# Own
+from pysenorge.tools.date_converters import iso2datetime, datetime2BILdate
+from pysenorge.tools.point_extraction import get_source, read_grid
+
+DEFAULT_STATS = ['count', 'mean', 'max', 'p50', 'p90']
+
+
+def _bincount(index, weights, n):
+    '''
+    *numpy.bincount* with *n* bins.
+    '''
+    result = np.zeros(n)
+    counts = np.bincount(index, weights)
+    result[:len(counts)] = counts
+    return result
+
+
+def load_labels(filename, datatype='uint16'):
+    '''
+    Loads a label raster from a *.npy* or BIL file.
+    '''
+    if os.path.splitext(filename)[1] == '.npy':
+        return np.load(filename)
+    from pysenorge.io.bil import BILdata
+    bil = BILdata(filename, datatype)
+    bil.read()
+    labels = bil.data.copy()
+    labels[labels == bil.nodata] = 0
+    return labels
+
+
+class ZonalStatistics(object):
+    '''
+    Computes statistics per region of seNorge grids.
+    '''
+
+    def __init__(self, labels, nodata=0):
+        '''
+        :Parameters:
+            - labels: Integer array of region ids with the grid shape
+            - nodata: Id of cells outside all regions
+        '''
+        labels = asarray(labels)
+        self.shape = labels.shape
+        labels = labels.ravel()
+        cells = np.nonzero(labels != nodata)[0]
+        # flat indices of the cells sorted by region
+        order = np.argsort(labels[cells], kind='mergesort')
+        self.cells = cells[order]
+        sorted_labels = labels[self.cells]
+        change = np.nonzero(sorted_labels[1:] != sorted_labels[:-1])[0] + 1
+        self.starts = np.concatenate(([0], change)).astype(int)
+        if len(self.cells) == 0:
+            self.starts = self.starts[:0]
+        self.zones = sorted_labels[self.starts]
+        self.sizes = np.diff(np.concatenate((self.starts, [len(self.cells)])))
+        # region number of each sorted cell
+        self.group = np.repeat(np.arange(len(self.zones)), self.sizes)
+
+    def compute(self, data, stats=DEFAULT_STATS):
+        '''
+        Returns the statistics of *data* per region.
+
+        :Parameters:
+            - data: Array with the grid shape in physical units
+            - stats: Names of the statistics
+
+        :Returns:
+            - Dictionary of arrays (one value per region in *zones*) by
+                statistic
+        '''
+        if asarray(data).shape != self.shape:
+            raise ValueError("Data shape %s does not match the labels %s" %
+                             (asarray(data).shape, self.shape))
+        n = len(self.zones)
+        values = asarray(data, dtype=np.float64).ravel()[self.cells]
+        finite = np.isfinite(values)
+        group = self.group[finite]
+        count = _bincount(group, None, n)
+        empty = count == 0
+        safe = np.where(empty, 1, count)
+        total = _bincount(group, values[finite], n)
+        result = {}
+        sorted_values = None
+        for stat in stats:
+            if stat == 'count':
+                value = count.astype(int)
+            elif stat == 'sum':
+                value = total
+            elif stat == 'mean':
+                value = total / safe
+            elif stat == 'std':
+                mean = total / safe
+                sq = _bincount(group, values[finite]**2, n)
+                value = np.sqrt(np.maximum(sq / safe - mean**2, 0.0))
+            elif stat in ('min', 'max'):
+                fill = inf if stat == 'min' else -inf
+                reduce = np.minimum if stat == 'min' else np.maximum
+                if n > 0:
+                    value = reduce.reduceat(np.where(finite, values, fill),
+                                            self.starts)
+                else:
+                    value = np.zeros(0)
+            elif stat.startswith('p'):
+                q = float(stat[1:]) / 100.0
+                if not 0.0 <= q <= 1.0:
+                    raise ValueError("Invalid percentile %s" % stat)
+                if sorted_values is None:
+                    # sort within the regions - NaN (as inf) go last
+                    v = np.where(finite, values, inf)
+                    sorted_values = v[np.lexsort((v, self.group))]
+                k = np.maximum(count.astype(int), 1)
+                pos = self.starts + q * (k - 1)
+                lo = np.floor(pos).astype(int)
+                hi = np.minimum(lo + 1, self.starts + k - 1)
+                frac = pos - lo
+                value = sorted_values[lo]*(1.0-frac) + sorted_values[hi]*frac
+            else:
+                raise ValueError("Unknown statistic '%s'" % stat)
+            if stat not in ('count', 'sum'):
+                value = np.where(empty, nan, value)
+            result[stat] = value
+        return result
+
+
+def write_table(filename, zs, columns):
+    '''
+    Writes one row per region with the columns *columns* - a list of
+    (name, values) tuples.
+    '''
+    fid = open(filename, 'w')
+    fid.write("zone,cells,%s\n" % ",".join([c[0] for c in columns]))
+    for i, zone in enumerate(zs.zones):
+        row = [str(zone), str(zs.sizes[i])]
+        for name, values in columns:
+            v = values[i]
+            row.append("" if v != v else ("%i" % v if name.endswith('_count')
+                                         else "%.4g" % v))
+        fid.write(",".join(row) + "\n")
+    fid.close()
+
+
+def run_date(zs, names, cdt, stats, outdir, prefix):
+    '''
+    Computes the statistics of the products *names* on date *cdt* and writes
+    them to *outdir/prefix_<date>.csv*.
+
+    :Returns:
+        - The name of the file written
+    '''
+    columns = []
+    for name in names:
+        data = read_grid(get_source(name), cdt)
+        if data is None:
+            print "No %s on %s" % (name, cdt.date())
+            result = dict([(s, np.zeros(len(zs.zones)) + nan) for s in stats])
+        else:
+            result = zs.compute(data, stats)
+        label = name.split(':')[-1]
+        columns.extend([("%s_%s" % (label, s), result[s]) for s in stats])
+    filename = os.path.join(outdir, "%s_%s.csv" % (prefix,
+                                                   datetime2BILdate(cdt)))
+    write_table(filename, zs, columns)
+    return filename
+
+
+def main():
+    usage = "usage: python zonal_statistics.py LABELFILE YYYY-MM-DD [YYYY-MM-DD] [options]"
+
+    parser = OptionParser(usage=usage)
+    parser.add_option("-v", "--variables",
+                      action="store", dest="variables", type="string",
+                      help="Comma separated list of products, e.g. sd,depth_hoar_index_2,wind_10m_daily:wind_speed_max_10m")
+    parser.add_option("-s", "--stats",
+                      action="store", dest="stats", type="string",
+                      default=",".join(DEFAULT_STATS),
+                      help="Comma separated list of statistics - default: %s" %
+                      ",".join(DEFAULT_STATS))
+    parser.add_option("-d", "--datatype",
+                      action="store", dest="datatype", type="string",
+                      default="uint16",
+                      help="Data-type of a BIL label file (default=uint16)")
+    parser.add_option("-o", "--outdir",
+                      action="store", dest="outdir", type="string",
+                      metavar="DIR", default=os.getcwd(),
+                      help="Output directory - default: current directory")
+
+    (options, args) = parser.parse_args()
+
+    if len(args) not in (2, 3):
+        parser.error("Please provide the label file and the date(s) in ISO format YYYY-MM-DD!")
+    if options.variables is None:
+        parser.error("Please provide the products!")
+
+    zs = ZonalStatistics(load_labels(args[0], options.datatype))
+    names = [n.strip() for n in options.variables.split(',')]
+    stats = [s.strip() for s in options.stats.split(',')]
+    prefix = "zonal_%s" % os.path.splitext(os.path.basename(args[0]))[0]
+    if not os.path.exists(options.outdir):
+        os.makedirs(options.outdir)
+
+    cdt = iso2datetime(args[1]+" 06:00:00")
+    end = iso2datetime(args[-1]+" 06:00:00")
+    while cdt <= end:
+        print run_date(zs, names, cdt, stats, options.outdir, prefix)
+        cdt += timedelta(days=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,90 @@
 '''
 Tests the BILdata class.
 
+Covers both call styles: *BILdata(filename)* as the former *_io.BILdata*,
+which converts the data on writing, and *BILdata(filename, datatype)*,
+which requires data of the data-type unless *dt* is given.
+
 @author: kmu
 @since: 12. okt. 2010
 '''
-import unittest, sys, os
+import unittest, sys, os, shutil, tempfile
 sys.path.insert(0,os.path.abspath('../..'))
 
-from numpy import uint16, ones
+from numpy import uint16, int16, float32, ones, arange, fromfile
 from pysenorge.io.bil import BILdata
 
 class Test(unittest.TestCase):
 
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "tmp_test.bil")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def testRoundTrip(self):
+        A = arange(1550*1195, dtype=uint16).reshape((1550, 1195))
+        bd = BILdata(self.filename, 'uint16')
+        bd.write(A)
+        bdo = BILdata(self.filename, 'uint16')
+        bdo.read()
+        self.assertTrue((bdo.data == A).all())
+
+    def testLegacyConverts(self):
+        # float data is stored as uint16 as by the former _io.BILdata
+        A = ones((4, 3), dtype=float32) * 2.7
+        bd = BILdata(self.filename)
+        bd.set_dimension(4, 3)
+        self.assertEqual(bd.write(A), "Data written to %s" % self.filename)
+        self.assertEqual(os.path.getsize(self.filename), 4*3*2)
+        self.assertEqual(fromfile(self.filename, uint16).tolist(), [2]*12)
+
+    def testLegacyLsd(self):
+        A = ones((4, 3), dtype=float32) * 2.7
+        bd = BILdata(self.filename)
+        bd.set_dimension(4, 3)
+        bd.write(A, uint16, lsd=1)
+        self.assertEqual(fromfile(self.filename, uint16).tolist(), [27]*12)
+
+    def testDatatypeGiven(self):
+        # dt overrides the data-type of the instance
+        A = -arange(12, dtype=float32).reshape((4, 3))
+        bd = BILdata(self.filename, 'uint16')
+        bd.set_dimension(4, 3)
+        bd.write(A, int16)
+        self.assertEqual(bd.datatype, int16)
+        self.assertEqual(fromfile(self.filename, int16).tolist(),
+                         range(0, -12, -1))
 
-    def testName(self):
-        # Create an array
-#        A = arange(1852250, dtype=uint16)
-        A = ones((1550,1195), dtype=uint16)
-        print A
-        
-        # Store it in .bil format
-        bd = BILdata("tmp_test.bil")
-#        bd.set_dimension(4,3)
+    def testHeader(self):
+        # the header lets a reader without data-type read the file back
+        A = -arange(12, dtype=float32).reshape((4, 3))
+        bd = BILdata(self.filename, 'float32')
+        bd.set_dimension(4, 3)
         bd.write(A)
-        print bd.datatype
-        
-        # Open .bil file
-        bdo = BILdata("tmp_test.bil")
-#        bdo.set_dimension(4,3)
+        hdr = os.path.join(self.tmpdir, "tmp_test.hdr")
+        self.assertTrue(os.path.exists(hdr))
+        bdo = BILdata(self.filename)
         bdo.read()
-        print bdo.data
-        # Assert if data from bil file is equal to the inital array
-        self.assertEqual(A.all, bdo.data.all, "Not equal")
+        self.assertEqual(bdo.data.shape, (4, 3))
+        self.assertEqual(bdo.data.dtype, float32)
+        self.assertTrue((bdo.data == A).all())
+
+    def testStaleHeader(self):
+        bd = BILdata(self.filename, 'uint16')
+        bd.set_dimension(4, 3)
+        bd.write(ones((4, 3), dtype=uint16))
+        ones((5, 3), dtype=uint16).tofile(self.filename)
+        self.assertRaises(IOError, BILdata(self.filename).read)
+
+    def testInconsistent(self):
+        bd = BILdata(self.filename, 'uint16')
+        bd.set_dimension(4, 3)
+        self.assertRaises(ValueError, bd.write, ones((4, 3), dtype=float32))
+        self.assertFalse(os.path.exists(self.filename))
 
 
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
-    unittest.main()
\ No newline at end of file
+    unittest.main()
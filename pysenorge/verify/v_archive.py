@@ -0,0 +1,97 @@
+'''
+Unittest for L{tools.archive}.
+
+Ingests a few synthetic days into an empty archive folder and reads them
+back as pixel series and maps.
+
+@author: kmu
+@since: 19. okt. 2026
+'''
+
+import unittest, sys, os, shutil, tempfile
+sys.path.insert(0,os.path.abspath('../..'))
+
+from datetime import datetime, timedelta
+import numpy as np
+from numpy.random import RandomState
+from pysenorge.tools.archive import ProductArchive
+from pysenorge.themes.senorge_theme import BILInput
+
+NROWS, NCOLS = 1550, 1195
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bildir = os.path.join(self.tmpdir, 'bil')
+        os.makedirs(self.bildir)
+        self.archivedir = os.path.join(self.tmpdir, 'archive')
+        rs = RandomState(0)
+        # start within a time chunk so that the chunks are written partly
+        self.start = datetime(2011, 1, 30, 6)
+        self.grids = {}
+        for n in range(5):
+            cdt = self.start + timedelta(days=n)
+            if n == 2:
+                continue # missing day
+            grid = rs.randint(0, 1000, (NROWS, NCOLS)).astype(np.uint16)
+            grid[:10] = 65535
+            grid.tofile(os.path.join(self.bildir, 'x_%s.bil' %
+                                     cdt.strftime('%Y_%m_%d')))
+            self.grids[n] = grid
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _archive(self):
+        archive = ProductArchive('x', self.archivedir)
+        archive.source = BILInput('x', os.path.join(self.bildir,
+                                                    'x_%(date)s.bil'),
+                                  scale=0.5, offset=1.0)
+        return archive
+
+    def test_ingest(self):
+        archive = self._archive()
+        n = archive.ingest(self.start, self.start + timedelta(days=4),
+                           threads=2)
+        self.assertEqual(n, 4)
+
+        archive = self._archive() # reopen
+        dates, values = archive.series(700, 300, self.start,
+                                       self.start + timedelta(days=4),
+                                       physical=False)
+        self.assertEqual(len(dates), 5)
+        for n in range(5):
+            if n in self.grids:
+                self.assertEqual(values[n], self.grids[n][700, 300])
+            else:
+                self.assertEqual(values[n], 65535)
+
+        # window across chunk boundaries in physical units
+        dates, window = archive.series((60, 70), (120, 130), self.start,
+                                       self.start + timedelta(days=1))
+        expected = self.grids[1][60:70, 120:130] * 0.5 + 1.0
+        self.assertTrue(np.allclose(window[1], expected))
+
+        grid = archive.map(self.start + timedelta(days=3))
+        self.assertTrue(np.isnan(grid[:10]).all())
+        self.assertTrue(np.allclose(grid[10:], self.grids[3][10:]*0.5 + 1.0))
+        self.assertTrue(np.isnan(archive.map(self.start +
+                                             timedelta(days=2))).all())
+
+    def test_append(self):
+        archive = self._archive()
+        archive.ingest(self.start, self.start + timedelta(days=1), threads=1)
+        archive.ingest(self.start + timedelta(days=3),
+                       self.start + timedelta(days=4), threads=1)
+        dates, values = archive.series(1549, 1194, self.start,
+                                       self.start + timedelta(days=4),
+                                       physical=False)
+        self.assertEqual(values.tolist(),
+                         [self.grids[0][1549, 1194], self.grids[1][1549, 1194],
+                          65535, self.grids[3][1549, 1194],
+                          self.grids[4][1549, 1194]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+'''
+Unittest for the multi-band files of L{io.bil}.
+
+Writes a few bands in each layout and reads them back as a whole and band by
+band.
+
+@author: kmu
+@since: 19. okt. 2026
+'''
+
+import unittest, sys, os, shutil, tempfile
+sys.path.insert(0,os.path.abspath('../..'))
+
+import numpy as np
+from numpy.random import RandomState
+from pysenorge.io.bil import BandFile, BILdata, read_hdr, LAYOUTS
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rs = RandomState(0)
+        self.bands = rs.randint(0, 1000, (3, 15, 12)).astype(np.uint16)
+        self.names = ['avg', 'max', 'dir']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, layout, bands=None, names=None):
+        filename = os.path.join(self.tmpdir, 'wind.%s' % layout.lower())
+        bf = BandFile(filename)
+        bf.write(self.bands if bands is None else bands, names, layout)
+        return filename
+
+    def test_round_trip(self):
+        for layout in LAYOUTS:
+            filename = self._write(layout, names=self.names)
+            header = read_hdr(filename)
+            self.assertEqual(header['LAYOUT'], layout)
+            self.assertEqual(os.path.getsize(filename), self.bands.nbytes)
+            bf = BandFile(filename)
+            self.assertEqual(bf.bandnames, self.names)
+            self.assertTrue((bf.read() == self.bands).all(), layout)
+
+    def test_single_band(self):
+        for layout in LAYOUTS:
+            bf = BandFile(self._write(layout, names=self.names))
+            for i, name in enumerate(self.names):
+                self.assertTrue((bf.band(i) == self.bands[i]).all(), layout)
+                self.assertTrue((bf.band(name) == self.bands[i]).all(), layout)
+            self.assertRaises(IndexError, bf.band, 3)
+            self.assertRaises(ValueError, bf.band, 'min')
+
+    def test_float_unnamed(self):
+        bands = self.bands.astype(np.float32) / 10.0
+        bf = BandFile(self._write('BIP', bands))
+        self.assertEqual(bf.bandnames, ['0', '1', '2'])
+        self.assertEqual(bf.band(2).dtype, np.float32)
+        self.assertTrue((bf.band(2) == bands[2]).all())
+
+    def test_bildata_first_band(self):
+        # BILdata reads the first band of a multi-band file
+        bd = BILdata(self._write('BIL'), 'uint16')
+        bd.read()
+        self.assertTrue((bd.data == self.bands[0]).all())
+
+    def test_errors(self):
+        filename = os.path.join(self.tmpdir, 'wind.bil')
+        bf = BandFile(filename)
+        self.assertRaises(ValueError, bf.write, self.bands, None, 'XYZ')
+        self.assertRaises(ValueError, bf.write, self.bands, ['avg'])
+        self.assertRaises(ValueError, bf.write, self.bands[0])
+        np.zeros(5, np.uint16).tofile(filename)
+        self.assertRaises(IOError, bf.band, 0) # no header
+        self._write('BIL')
+        self.bands[:2].tofile(filename) # stale header
+        self.assertRaises(IOError, BandFile(filename).band, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
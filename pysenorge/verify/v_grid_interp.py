@@ -0,0 +1,61 @@
+'''
+Unittest for the irregular-grid branch of L{grid.interp}.
+
+Compares the vectorized L{grid._grid_coords} with the original loop
+L{grid._grid_coords_loop}.
+
+@author: kmu
+@since: 19. okt. 2026
+'''
+
+import unittest, sys, os
+sys.path.insert(0,os.path.abspath('../..'))
+
+import numpy as np
+from numpy.random import RandomState
+from pysenorge.grid import interp, _grid_coords, _grid_coords_loop
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        rs = RandomState(0)
+        # irregular but increasing coordinates
+        self.xin = np.cumsum(rs.uniform(0.5, 1.5, 50)).astype(np.float32)
+        self.yin = np.cumsum(rs.uniform(0.5, 1.5, 40)).astype(np.float32)
+        x = np.linspace(self.xin[0]-5, self.xin[-1]+5, 173)
+        y = np.linspace(self.yin[0]-5, self.yin[-1]+5, 131)
+        self.xout, self.yout = np.meshgrid(x, y)
+
+    def test_coords_equal(self):
+        for xin, xout in ((self.xin, self.xout), (self.yin, self.yout)):
+            vec = _grid_coords(xin, xout)
+            loop = _grid_coords_loop(xin, xout)
+            self.assertEqual(vec.shape, loop.shape)
+            self.assertTrue(np.allclose(vec, loop, rtol=0, atol=1e-12))
+
+    def test_out_of_range(self):
+        xout = np.array([[self.xin[0]-1.0, self.xin[-1]+1.0]])
+        vec = _grid_coords(self.xin, xout)
+        loop = _grid_coords_loop(self.xin, xout)
+        self.assertEqual(vec.tolist(), [[-1, len(self.xin)]])
+        self.assertEqual(vec.tolist(), loop.tolist())
+
+    def test_nodes(self):
+        # points on the input coordinates, incl. both ends
+        xout = self.xin.reshape((5, 10))
+        vec = _grid_coords(self.xin, xout)
+        loop = _grid_coords_loop(self.xin, xout)
+        self.assertEqual(vec.tolist(), loop.tolist())
+
+    def test_interp_linear(self):
+        # bilinear interpolation reproduces a linear field on any grid
+        xg, yg = np.meshgrid(self.xin, self.yin)
+        datain = 2.0*xg - 3.0*yg
+        xout = self.xout[20:-20, 20:-20]
+        yout = self.yout[20:-20, 20:-20]
+        dataout = interp(datain, self.xin, self.yin, xout, yout, order=1)
+        self.assertTrue(np.allclose(dataout, 2.0*xout - 3.0*yout, atol=1e-3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+'''
+Unittest for the cell locator L{grid.utm_to_index} / L{grid.index_to_utm}
+and the station extraction of L{tools.point_extraction}.
+
+@author: kmu
+@since: 19. okt. 2026
+'''
+
+import unittest, sys, os, shutil, tempfile
+sys.path.insert(0,os.path.abspath('../..'))
+
+import numpy as np
+from numpy.random import RandomState
+from datetime import datetime
+from pysenorge.grid import utm_to_index, index_to_utm, latlon_to_index, \
+    index_to_latlon
+from pysenorge.tools.point_extraction import PointExtractor, read_points
+from pysenorge.themes.senorge_theme import BILInput
+
+NROWS, NCOLS = 1550, 1195
+
+class Test(unittest.TestCase):
+
+    def test_corners(self):
+        # cells cover [corner, corner+1000)
+        row, col = utm_to_index([-75000, -74400, -74001, 1119700, 1119999],
+                                [6450000, 6450600, 6450999, 7999700, 7999999],
+                                flipped=False)
+        self.assertEqual(col.tolist(), [0, 0, 0, NCOLS-1, NCOLS-1])
+        self.assertEqual(row.tolist(), [0, 0, 0, NROWS-1, NROWS-1])
+        row, col = utm_to_index(-74400, 7999700)
+        self.assertEqual((row[0], col[0]), (0, 0)) # BIL row 0 is north
+
+    def test_outside(self):
+        row, col = utm_to_index([-75001, 1120000, 0, 0],
+                                [7000000, 7000000, 6449999, 8000000])
+        self.assertEqual(row.tolist(), [-1]*4)
+        self.assertEqual(col.tolist(), [-1]*4)
+
+    def test_round_trip(self):
+        rs = RandomState(0)
+        rows = rs.randint(0, NROWS, 1000)
+        cols = rs.randint(0, NCOLS, 1000)
+        for flipped in (True, False):
+            x, y = index_to_utm(rows, cols, flipped)
+            # centres
+            self.assertTrue(((x + 75000) % 1000 == 500).all())
+            self.assertTrue(((y - 6450000) % 1000 == 500).all())
+            r, c = utm_to_index(x, y, flipped)
+            self.assertEqual(r.tolist(), rows.tolist())
+            self.assertEqual(c.tolist(), cols.tolist())
+            # any point of the cell
+            r, c = utm_to_index(x + rs.uniform(-500, 499.9, 1000),
+                                y + rs.uniform(-500, 499.9, 1000), flipped)
+            self.assertEqual(r.tolist(), rows.tolist())
+            self.assertEqual(c.tolist(), cols.tolist())
+
+    def test_latlon_round_trip(self):
+        rows = np.array([0, 700, 1549, 1000])
+        cols = np.array([0, 300, 1194, 600])
+        lat, lon = index_to_latlon(rows, cols)
+        r, c = latlon_to_index(lat, lon)
+        self.assertEqual(r.tolist(), rows.tolist())
+        self.assertEqual(c.tolist(), cols.tolist())
+
+
+class TestPointExtraction(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rs = RandomState(1)
+        self.grid = rs.randint(0, 1000, (NROWS, NCOLS)).astype(np.uint16)
+        self.grid[0, 0] = 65535
+        self.grid.tofile(os.path.join(self.tmpdir, 'x_2011_02_01.bil'))
+        self.source = BILInput('x', os.path.join(self.tmpdir,
+                                                 'x_%(date)s.bil'),
+                               scale=0.5, offset=1.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read_points(self):
+        offsets = np.array([0, 700*NCOLS+300, NROWS*NCOLS-1])
+        values = read_points(os.path.join(self.tmpdir, 'x_2011_02_01.bil'),
+                             'uint16', offsets)
+        self.assertEqual(values.tolist(), self.grid.flat[offsets].tolist())
+
+    def test_extract(self):
+        x = np.array([-74400, 225500, 1119700, 2000000])
+        y = np.array([7999700, 7299500, 6450100, 7000000])
+        rows, cols = utm_to_index(x, y)
+        self.assertEqual(rows.tolist(), [0, 700, 1549, -1])
+        self.assertEqual(cols.tolist(), [0, 300, 1194, -1])
+        extractor = PointExtractor(rows, cols, self.source)
+        dates, table = extractor.extract_period(datetime(2011, 2, 1, 6),
+                                                datetime(2011, 2, 2, 6),
+                                                threads=2)
+        self.assertEqual(len(dates), 2)
+        self.assertTrue(np.isnan(table[0, 0])) # no-data
+        self.assertEqual(table[0, 1], self.grid[700, 300]*0.5 + 1.0)
+        self.assertEqual(table[0, 2], self.grid[1549, 1194]*0.5 + 1.0)
+        self.assertTrue(np.isnan(table[0, 3])) # outside
+        self.assertTrue(np.isnan(table[1]).all()) # missing file
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+'''
+Unittest for the regridding matrices of L{regrid}.
+
+@author: kmu
+@since: 19. okt. 2026
+'''
+
+import unittest, sys, os
+sys.path.insert(0,os.path.abspath('../..'))
+
+import numpy as np
+from numpy.random import RandomState
+from pysenorge.regrid import regrid_matrix, apply_matrix, SCHEMES
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        # 4 km input cells refined to 1 km as UM4 -> seNorge
+        self.xin = np.arange(2.0, 60.0, 4.0)
+        self.yin = np.arange(2.0, 40.0, 4.0)
+        self.xout = np.arange(0.5, 60.0, 1.0)
+        self.yout = np.arange(0.5, 40.0, 1.0)
+        self.shape = (len(self.yout), len(self.xout))
+
+    def _matrix(self, scheme, xin=None, yin=None, xout=None, yout=None):
+        return regrid_matrix(self.xin if xin is None else xin,
+                             self.yin if yin is None else yin,
+                             self.xout if xout is None else xout,
+                             self.yout if yout is None else yout,
+                             scheme, cachedir=None)
+
+    def test_row_sums(self):
+        rs = RandomState(0)
+        xout = np.sort(rs.uniform(-5.0, 65.0, 50))
+        yout = np.sort(rs.uniform(-5.0, 45.0, 30))
+        for scheme in SCHEMES:
+            for M in (self._matrix(scheme),
+                      self._matrix(scheme, xout=xout, yout=yout)):
+                sums = np.asarray(M.sum(axis=1)).ravel()
+                self.assertTrue(np.allclose(sums, 1.0, atol=1e-6), scheme)
+
+    def test_linear(self):
+        # bilinear reproduces a linear field inside the input grid
+        xg, yg = np.meshgrid(self.xin, self.yin)
+        data = 2.0*xg - 3.0*yg + 1.0
+        result = apply_matrix(self._matrix('bilinear'), data, self.shape)
+        xo, yo = np.meshgrid(self.xout, self.yout)
+        inside = ((xo >= self.xin[0]) & (xo <= self.xin[-1]) &
+                  (yo >= self.yin[0]) & (yo <= self.yin[-1]))
+        self.assertTrue(np.allclose(result[inside],
+                                    (2.0*xo - 3.0*yo + 1.0)[inside],
+                                    atol=1e-4))
+
+    def test_nodes(self):
+        # all schemes reproduce the input at its own cells
+        rs = RandomState(1)
+        data = rs.uniform(0.0, 10.0, (len(self.yin), len(self.xin)))
+        shape = data.shape
+        for scheme in SCHEMES:
+            M = self._matrix(scheme, xout=self.xin, yout=self.yin)
+            result = apply_matrix(M, data, shape)
+            self.assertTrue(np.allclose(result, data, atol=1e-5), scheme)
+
+    def test_area_conserves_mean(self):
+        rs = RandomState(2)
+        data = rs.uniform(0.0, 10.0, (len(self.yin), len(self.xin)))
+        # refining
+        result = apply_matrix(self._matrix('area'), data, self.shape)
+        self.assertAlmostEqual(result.mean(), data.mean(), places=4)
+        # coarsening 1 km -> 4 km
+        fine = rs.uniform(0.0, 10.0, self.shape)
+        M = self._matrix('area', self.xout, self.yout, self.xin, self.yin)
+        coarse = apply_matrix(M, fine, data.shape)
+        self.assertAlmostEqual(coarse.mean(), fine.mean(), places=4)
+        self.assertAlmostEqual(coarse[0, 0], fine[:4, :4].mean(), places=4)
+
+    def test_stack(self):
+        # a (time, y, x) stack gives the same as each step
+        rs = RandomState(3)
+        stack = rs.uniform(0.0, 10.0, (3, len(self.yin), len(self.xin)))
+        for scheme in SCHEMES:
+            M = self._matrix(scheme)
+            result = apply_matrix(M, stack, self.shape)
+            self.assertEqual(result.shape, (3,) + self.shape)
+            for t in range(3):
+                self.assertTrue(np.allclose(result[t],
+                                            apply_matrix(M, stack[t],
+                                                         self.shape)))
+
+
+if __name__ == "__main__":
+    unittest.main()
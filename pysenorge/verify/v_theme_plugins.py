@@ -0,0 +1,141 @@
+'''
+Smoke test of the theme plugins registered for L{themes.run_themes}.
+
+Every plugin is run for two days on synthetic inputs in a temporary folder,
+untiled and - if it reads seNorge grids only - tiled, so that the first day runs without and the second day
+with the optional inputs (yesterday's value of the theme itself). The UM4
+prognoses are put into the theme cache, as netCDF4 may not be available.
+
+@author: kmu
+@since: 19. okt. 2026
+'''
+
+import unittest, sys, os, shutil, tempfile, calendar
+sys.path.insert(0,os.path.abspath('../..'))
+
+from datetime import datetime, timedelta
+import numpy as np
+from numpy.random import RandomState
+from pysenorge.themes import senorge_theme
+from pysenorge.themes.senorge_theme import get_theme, UM4Input, Output, \
+    THEMES
+from pysenorge.benchmark.fixtures import um4_grid, um4_field
+
+PLUGINS = ['depth_hoar_index_1', 'depth_hoar_index_2',
+           'additional_snow_depth_wind', 'additional_snow_depth_wind_varexp',
+           'wind_10m_daily', 'wind_600m_daily', 'wind_1500m_daily']
+
+# Range of the synthetic raw values by BIL data-type
+RAWRANGE = {'uint8': (0, 100), 'int16': (-100, 100), 'uint16': (0, 3000)}
+
+NROWS, NCOLS = 1550, 1195
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = {}
+        for key in ('METdir', 'PROGdir', 'BILin', 'BILout', 'netCDFin'):
+            self.dirs[key] = getattr(senorge_theme, key)
+            setattr(senorge_theme, key, os.path.join(self.tmpdir, key))
+        self.start = datetime(2011, 2, 1, 6)
+        self.rs = RandomState(0)
+
+    def tearDown(self):
+        for key, value in self.dirs.items():
+            setattr(senorge_theme, key, value)
+        shutil.rmtree(self.tmpdir)
+
+    def _write_bil(self, i, keys):
+        filename = i.filename(keys)
+        if os.path.exists(filename):
+            return
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        low, high = RAWRANGE[i.datatype]
+        self.rs.randint(low, high, (NROWS, NCOLS)).astype(i.datatype).\
+            tofile(filename)
+
+    def _put_um4(self, i, keys, cache, cdt, timestep):
+        filename = i.filename(keys)
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        open(filename, 'wb').close()
+        nt = i.timerange[1] - i.timerange[0]
+        rlon, rlat = um4_grid()
+        # the prognosis of yesterday starts at 00 UTC
+        t0 = calendar.timegm((cdt - timedelta(days=1)).date().timetuple())
+        values = {'time': t0 + 3600.0*timestep*np.arange(*i.timerange),
+                  'rlon': rlon, 'rlat': rlat}
+        for n, var in enumerate(i.variables):
+            values[var] = um4_field(nt, seed=n)
+        for var, value in values.items():
+            cache.put(('um4', filename, var, str(i.timerange)), value)
+
+    def _inputs(self, theme, cdt):
+        keys = theme.setup(cdt)
+        for i in theme.inputs:
+            if isinstance(i, UM4Input):
+                self._put_um4(i, keys, theme.cache, cdt,
+                              getattr(theme, 'timestep', 1))
+            elif not i.optional:
+                self._write_bil(i, keys)
+
+    def _run(self, name, tiled):
+        theme = get_theme(name)
+        theme.tiled = tiled
+        for n in range(2):
+            cdt = self.start + timedelta(days=n)
+            self._inputs(theme, cdt)
+            theme.run(cdt)
+            theme.cache.next_date()
+            for filename in theme.output_files(cdt):
+                self.assertTrue(os.path.exists(filename), filename)
+                self.assertEqual(os.path.getsize(filename) % (NROWS*NCOLS), 0)
+
+    def test_window_dates(self):
+        # a prognosis window is dated by its last step (6-hourly ml00 files)
+        theme = get_theme('wind_600m_daily')
+        cdt = self.start
+        windows = [(2, 8), (7, 12)]
+        reader = UM4Input('um4', theme.template, theme.variables, (2, 12))
+        self._put_um4(reader, theme.setup(cdt), theme.cache, cdt,
+                      theme.timestep)
+        theme.runWindows(cdt, windows)
+        for days, window in enumerate(windows):
+            theme.timerange = window
+            filename = theme.output_files(cdt)[0]
+            self.assertTrue(filename.endswith('%s.bil' %
+                (cdt + timedelta(days=days)).strftime('%Y_%m_%d')), filename)
+            self.assertTrue(os.path.exists(filename), filename)
+
+    def test_output_physical(self):
+        # the PNG images get physical values, no-data as NaN
+        output = Output('x', datatype='int16', scale=0.1, offset=-273.1)
+        data = np.array([[-10.0, 0.0], [25.5, np.nan]], np.float32)
+        mask = np.array([[False, False], [False, False]])
+        raw = output.convert(data.copy(), mask)
+        result = output.physical(raw)
+        self.assertTrue(np.allclose(result[~np.isnan(data)],
+                                    data[~np.isnan(data)], atol=0.06))
+        self.assertTrue(np.isnan(result[1, 1]))
+
+    def test_registered(self):
+        for name in PLUGINS:
+            get_theme(name)
+        self.assertEqual(sorted(THEMES.keys()), sorted(PLUGINS))
+
+    def test_untiled(self):
+        for name in PLUGINS:
+            self._run(name, False)
+
+    def test_tiled(self):
+        # UM4 inputs are not grids of the seNorge shape
+        for name in PLUGINS:
+            if not [i for i in get_theme(name).inputs
+                    if isinstance(i, UM4Input)]:
+                self._run(name, True)
+
+
+if __name__ == "__main__":
+    unittest.main()